@@ -4,9 +4,25 @@ AI Assistant API Server
 Runs on port 7000 to provide AI chat functionality
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+from flask_socketio import SocketIO, emit
+from datetime import datetime
+import json
 import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Iterator, Optional
+
+# Shared services live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ai_assistant_api.chat_backends import create_backend
+from services.chat_store import get_store
+from services.realtime import ConnectionTracker, register_connection_tracking
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +31,135 @@ logger = logging.getLogger(__name__)
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
+socketio = SocketIO(app, cors_allowed_origins="*")
+# Per-connection backpressure: a stream waits for a client that is not keeping up
+connection_tracker = ConnectionTracker()
+register_connection_tracking(socketio, connection_tracker)
+
+# Response generator (echo stand-in unless CHAT_BACKEND says otherwise)
+chat_backend = create_backend()
+
+# Conversation persistence (agentic_chatbot.db, group-committed in the background)
+chat_store = get_store()
+
+class ChatMetrics:
+    """Rolling first-token and total generation latencies"""
+    
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self.first_token_ms = deque(maxlen=window)
+        self.total_ms = deque(maxlen=window)
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+    
+    def record(self, first_token_ms: Optional[float], total_ms: float, outcome: str):
+        with self._lock:
+            if first_token_ms is not None:
+                self.first_token_ms.append(first_token_ms)
+            self.total_ms.append(total_ms)
+            setattr(self, outcome, getattr(self, outcome) + 1)
+    
+    @staticmethod
+    def _percentiles(samples) -> Dict:
+        if not samples:
+            return {'p50': None, 'p95': None, 'max': None}
+        ordered = sorted(samples)
+        pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+        return {'p50': pick(0.5), 'p95': pick(0.95), 'max': round(ordered[-1], 2)}
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': chat_backend.name,
+                'completed': self.completed,
+                'cancelled': self.cancelled,
+                'failed': self.failed,
+                'first_token_ms': self._percentiles(self.first_token_ms),
+                'total_ms': self._percentiles(self.total_ms)
+            }
+
+chat_metrics = ChatMetrics()
+
+# (socket sid, request id) -> cancel event for in-flight SocketIO streams
+socket_streams: Dict[tuple, threading.Event] = {}
+socket_streams_lock = threading.Lock()
+
+def generate_chunks(message: str, context: Optional[Dict], cancel: threading.Event,
+                    session: Dict) -> Iterator[str]:
+    """Run the backend, recording first-token latency, the outcome and the turn"""
+    started = time.perf_counter()
+    first_token_ms = None
+    outcome = 'failed'
+    chunks = []
+    try:
+        for chunk in chat_backend.stream(message, context, cancel):
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+            chunks.append(chunk)
+            yield chunk
+            if cancel.is_set():
+                break
+        outcome = 'cancelled' if cancel.is_set() else 'completed'
+    except GeneratorExit:
+        # Consumer went away (e.g. SSE client disconnected)
+        cancel.set()
+        outcome = 'cancelled'
+        raise
+    finally:
+        total_ms = (time.perf_counter() - started) * 1000
+        chat_metrics.record(first_token_ms, total_ms, outcome)
+        chat_store.record_workflow(session['session_id'], 'chat_turn',
+                                   'error' if outcome == 'failed' else outcome,
+                                   metadata={'backend': chat_backend.name, 'first_token_ms': first_token_ms},
+                                   duration_ms=round(total_ms, 2))
+        if outcome != 'failed':
+            chat_store.record_turn(session['session_id'], session['user_id'], message, ''.join(chunks),
+                                   context=context, metadata={
+                                       'backend': chat_backend.name,
+                                       'outcome': outcome,
+                                       'first_token_ms': first_token_ms,
+                                       'total_ms': total_ms
+                                   })
+
+def session_ids(data: Dict) -> Dict:
+    return {
+        'session_id': data.get('session_id') or 'default',
+        'user_id': data.get('user_id') or 'anonymous'
+    }
+
+def sse_event(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_sse(message: str, context: Optional[Dict], session: Dict) -> Response:
+    """Server-Sent Events response streaming the reply chunk by chunk"""
+    request_id = str(uuid.uuid4())
+    cancel = threading.Event()
+    
+    def events():
+        try:
+            yield sse_event('start', {'request_id': request_id})
+            for index, chunk in enumerate(generate_chunks(message, context, cancel, session)):
+                yield sse_event('chunk', {'request_id': request_id, 'index': index, 'chunk': chunk})
+            yield sse_event('done', {
+                'request_id': request_id,
+                'timestamp': datetime.now().isoformat()
+            })
+        except GeneratorExit:
+            cancel.set()
+            logger.info(f"Client disconnected, cancelled chat stream {request_id}")
+            raise
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}")
+            yield sse_event('error', {'request_id': request_id, 'message': str(e)})
+    
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def wants_stream(data: Dict) -> bool:
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -23,23 +168,29 @@ def health_check():
         'status': 'healthy',
         'service': 'AI Assistant',
         'port': 7000,
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'backend': chat_backend.name
     })
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """AI chat endpoint"""
+    """AI chat endpoint (set "stream": true or Accept: text/event-stream for SSE)"""
     try:
         data = request.json
         message = data.get('message', '')
+        context = data.get('context')
+        
+        session = session_ids(data)
+        
+        if wants_stream(data):
+            return stream_sse(message, context, session)
         
-        # Simulate AI response
-        response = f"AI Response to: {message}"
+        response = ''.join(generate_chunks(message, context, threading.Event(), session))
         
         return jsonify({
             'status': 'success',
             'response': response,
-            'timestamp': '2025-09-12T15:15:00'
+            'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
         return jsonify({
@@ -47,11 +198,144 @@ def chat():
             'message': str(e)
         }), 500
 
+@app.route('/api/chat/stream', methods=['GET'])
+def chat_stream():
+    """SSE chat endpoint for EventSource clients (?message=...)"""
+    message = request.args.get('message', '')
+    if not message:
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing message parameter'
+        }), 400
+    return stream_sse(message, None, session_ids(request.args))
+
+@app.route('/api/chat/history', methods=['GET'])
+def chat_history():
+    """Paginated conversation history (newest first; pass next_cursor as ?before=)"""
+    try:
+        page = chat_store.history(
+            user_id=request.args.get('user_id'),
+            session_id=request.args.get('session_id'),
+            limit=request.args.get('limit', 50, type=int),
+            before_id=request.args.get('before', type=int))
+        return jsonify({
+            'status': 'success',
+            **page
+        })
+    except Exception as e:
+        logger.error(f"Error reading chat history: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to read chat history: {str(e)}'
+        }), 500
+
+@app.route('/api/chat/search', methods=['GET'])
+def chat_search():
+    """Ranked full-text search over past chats (?q=&user_id=&session_id=&cursor=)"""
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({
+            'status': 'error',
+            'message': 'Missing q parameter'
+        }), 400
+    try:
+        started = time.perf_counter()
+        page = chat_store.search(
+            query,
+            user_id=request.args.get('user_id'),
+            session_id=request.args.get('session_id'),
+            limit=request.args.get('limit', 20, type=int),
+            cursor=request.args.get('cursor'))
+        return jsonify({
+            'status': 'success',
+            'query': query,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2),
+            **page
+        })
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error searching chat history: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to search chat history: {str(e)}'
+        }), 500
+
+@app.route('/api/chat/metrics', methods=['GET'])
+def chat_metrics_endpoint():
+    """First-token and total latency percentiles"""
+    return jsonify({
+        'status': 'success',
+        'metrics': chat_metrics.snapshot(),
+        'store': chat_store.stats()
+    })
+
+def run_socket_stream(sid: str, request_id: str, message: str, context: Optional[Dict],
+                      cancel: threading.Event, session: Dict):
+    def send(event: str, data: Dict) -> bool:
+        return connection_tracker.emit_to(socketio, sid, event, data, wait=connection_tracker.ack_timeout)
+
+    try:
+        for index, chunk in enumerate(generate_chunks(message, context, cancel, session)):
+            if not send('chat_chunk', {'request_id': request_id, 'index': index, 'chunk': chunk}):
+                # Gone, or still saturated after waiting: stop generating for it
+                logger.warning(f"Cancelling chat stream {request_id}: client {sid} is not keeping up")
+                cancel.set()
+        if cancel.is_set():
+            send('chat_cancelled', {'request_id': request_id})
+        else:
+            send('chat_done', {
+                'request_id': request_id,
+                'timestamp': datetime.now().isoformat()
+            })
+    except Exception as e:
+        logger.error(f"Error streaming chat response over SocketIO: {str(e)}")
+        send('chat_error', {'request_id': request_id, 'message': str(e)})
+    finally:
+        with socket_streams_lock:
+            socket_streams.pop((sid, request_id), None)
+
+@socketio.on('chat_stream')
+def handle_chat_stream(data):
+    """Stream a reply as chat_chunk events, finishing with chat_done"""
+    message = (data or {}).get('message', '')
+    if not message:
+        emit('chat_error', {'message': 'Missing message parameter'})
+        return
+    request_id = data.get('request_id') or str(uuid.uuid4())
+    cancel = threading.Event()
+    with socket_streams_lock:
+        socket_streams[(request.sid, request_id)] = cancel
+    socketio.start_background_task(run_socket_stream, request.sid, request_id,
+                                   message, data.get('context'), cancel, session_ids(data))
+    return {'request_id': request_id}
+
+@socketio.on('chat_cancel')
+def handle_chat_cancel(data):
+    """Stop generating a reply the client no longer needs"""
+    with socket_streams_lock:
+        cancel = socket_streams.get((request.sid, (data or {}).get('request_id')))
+    if cancel:
+        cancel.set()
+
+def cancel_client_streams(departed_sid: str):
+    """Cancel every in-flight stream for the departing client"""
+    with socket_streams_lock:
+        for (sid, _), cancel in socket_streams.items():
+            if sid == departed_sid:
+                cancel.set()
+
+connection_tracker.on_disconnect(cancel_client_streams)
+
 if __name__ == '__main__':
     print("🤖 Starting AI Assistant API Server...")
     print("🌐 AI Server: http://localhost:7000")
     print("📊 Health Check: http://localhost:7000/api/health")
     print("💬 Chat Endpoint: http://localhost:7000/api/chat")
+    print("📜 History: GET /api/chat/history?user_id=&session_id=&before=")
+    print("🔎 Search: GET /api/chat/search?q=")
+    print("📡 Streaming: POST /api/chat {stream: true}, GET /api/chat/stream, SocketIO 'chat_stream'")
+    print(f"🧠 Backend: {chat_backend.name}")
     print("=" * 50)
     
-    app.run(host='0.0.0.0', port=7000, debug=True, use_reloader=False)
+    socketio.run(app, host='0.0.0.0', port=7000, debug=True, use_reloader=False)
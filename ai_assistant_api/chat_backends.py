@@ -0,0 +1,98 @@
+"""
+Pluggable chat generation backends for the AI Assistant API.
+
+A backend turns a user message into a stream of response chunks. The server
+consumes the stream either all at once (plain ``/api/chat``) or chunk by chunk
+(Server-Sent Events / SocketIO), and can stop it early through a cancel event
+when the client goes away.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional
+
+
+class ChatBackend:
+    """Base class: yield response chunks for ``message``"""
+
+    name = 'base'
+
+    def stream(self, message: str, context: Optional[Dict] = None,
+               cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        raise NotImplementedError
+
+    def complete(self, message: str, context: Optional[Dict] = None) -> str:
+        """Generate the whole response in one go"""
+        return ''.join(self.stream(message, context))
+
+
+class EchoBackend(ChatBackend):
+    """Deterministic local backend used for development and tests.
+
+    Produces the same text the API always returned (``AI Response to: ...``),
+    one word per chunk, optionally pausing ``delay`` seconds between chunks to
+    mimic a model's generation speed.
+    """
+
+    name = 'echo'
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def stream(self, message: str, context: Optional[Dict] = None,
+               cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        words = f"AI Response to: {message}".split(' ')
+        for i, word in enumerate(words):
+            if cancel is not None and cancel.is_set():
+                return
+            if self.delay and i:
+                # Event.wait doubles as an interruptible sleep
+                if cancel is not None and cancel.wait(self.delay):
+                    return
+                if cancel is None:
+                    time.sleep(self.delay)
+            yield word if i == 0 else ' ' + word
+
+
+class OpenAIBackend(ChatBackend):
+    """Streams completions from the OpenAI chat API"""
+
+    name = 'openai'
+
+    def __init__(self, model: str = 'gpt-3.5-turbo'):
+        from openai import OpenAI
+        self.client = OpenAI()
+        self.model = model
+
+    def stream(self, message: str, context: Optional[Dict] = None,
+               cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{'role': 'user', 'content': message}],
+            stream=True)
+        try:
+            for chunk in response:
+                if cancel is not None and cancel.is_set():
+                    return
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            response.close()
+
+
+BACKENDS = {
+    EchoBackend.name: EchoBackend,
+    OpenAIBackend.name: OpenAIBackend,
+}
+
+
+def create_backend(name: Optional[str] = None) -> ChatBackend:
+    """Instantiate the backend named by ``name`` or ``$CHAT_BACKEND`` (default: echo)"""
+    name = name or os.environ.get('CHAT_BACKEND', EchoBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown chat backend '{name}'. Available: {', '.join(BACKENDS)}")
+    if name == EchoBackend.name:
+        return EchoBackend(delay=float(os.environ.get('CHAT_ECHO_DELAY', '0')))
+    return BACKENDS[name]()
@@ -1,10 +1,19 @@
 # AI Portal - Main Flask Application
+import os
+
+# Async workers must patch the stdlib before anything else is imported
+if os.environ.get('SOCKETIO_ASYNC_MODE') == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+elif os.environ.get('SOCKETIO_ASYNC_MODE') == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
 from flask import Flask, request, jsonify, render_template
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask_socketio import emit, join_room, leave_room
 import asyncio
 import json
-import os
 from datetime import datetime
 from typing import Dict, Any
 
@@ -20,7 +29,19 @@ except ImportError:
     PersonalAIAssistant = None
 
 # Import diagram service
-from services.diagram_service import diagram_bp
+from services.diagram_service import diagram_bp, diagram_generator
+from services.diagram_preview import preview_bp, init_diagram_preview
+from services.tracking_service import tracking_bp
+from services.analytics_service import analytics_bp
+from services.log_service import logs_bp, init_log_service
+from services.metrics_sampler import server_bp, init_metrics_sampler
+from services.workflow_events import workflows_bp
+from services.preferences_service import preferences_bp, preferences_cache
+from services.status_service import status_bp
+from services.asset_pipeline import assets_bp
+from services.static_assets import FingerprintIndex, FingerprintLoader
+from services.realtime import create_socketio, ConnectionTracker, register_connection_tracking
+from services.session_registry import SessionRegistry, spill_store_from_uri
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -30,36 +51,70 @@ app.config.from_object('config.Config')
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 # Initialize SocketIO for real-time communication
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = create_socketio(app)
+connection_tracker = ConnectionTracker(
+    app.config.get('SOCKETIO_MAX_PENDING_PER_CLIENT', 64),
+    ack_timeout=app.config.get('SOCKETIO_ACK_TIMEOUT', 2.0),
+    # Ack callbacks are not relayed through the message queue
+    acks=not app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+register_connection_tracking(socketio, connection_tracker)
+init_log_service(app, socketio, connection_tracker)
+init_metrics_sampler(app, socketio)
+init_diagram_preview(app, socketio, connection_tracker, diagram_generator)
 
 # Register blueprints
 app.register_blueprint(diagram_bp)
+app.register_blueprint(preview_bp)
+app.register_blueprint(tracking_bp)
+app.register_blueprint(analytics_bp)
+app.register_blueprint(logs_bp)
+app.register_blueprint(server_bp)
+app.register_blueprint(workflows_bp)
+app.register_blueprint(preferences_bp)
+app.register_blueprint(status_bp)
+app.register_blueprint(assets_bp)
+
+# Asset references in pages point at the names fingerprinted by
+# python3 -m services.static_assets; rewritten when a page is served
+fingerprints = FingerprintIndex(os.path.join(app.root_path, app.config['STATIC_BUILD_DIR']))
+app.jinja_loader = FingerprintLoader(app.jinja_loader, fingerprints)
+app.before_request(lambda: app.jinja_loader.drop_stale(app.jinja_env))
+
+# Bounded per-user session state (LRU + idle TTL)
+session_spill = (spill_store_from_uri(app.config['DATABASE_URI'])
+                 if app.config.get('SESSION_SPILL_ENABLED') else None)
+session_limits = {
+    'max_entries': app.config.get('SESSION_MAX_ENTRIES', 1000),
+    'idle_ttl': app.config.get('SESSION_IDLE_TTL', 1800)
+}
 
 # Initialize core systems (if available)
 if CORE_MODULES_AVAILABLE:
     avatar_creator = AvatarCreator()
-    ai_assistants = {}  # Store AI assistants for each user
 else:
     avatar_creator = None
-    ai_assistants = {}
-
-# Global state
-active_users = {}
-active_avatars = {}
+# Store AI assistants for each user; evicted assistants spill to SQLite
+ai_assistants = SessionRegistry('ai_assistants',
+                                memory_budget=app.config.get('SESSION_MEMORY_BUDGET'),
+                                spill=session_spill,
+                                spill_ttl=app.config.get('SESSION_SPILL_TTL'),
+                                **session_limits)
 
 @app.route('/')
 def index():
     """Main dashboard page"""
     try:
-        with open('index.html', 'r', encoding='utf-8') as f:
-            return f.read()
+        return fingerprints.render_file('index.html', 'index.html')
     except FileNotFoundError:
         return render_template('index.html')
 
 @app.route('/enhanced')
 def enhanced_portal():
     """Enhanced AI Portal - Personal Workspace"""
-    return render_template('enhanced_portal.html')
+    # Preferences come from the in-process cache, not SQLite, on every load
+    user_id = request.args.get('user_id') or request.cookies.get('user_id')
+    theme = preferences_cache.theme(user_id)
+    return render_template('enhanced_portal.html', theme=theme, user_id=user_id)
 
 @app.route('/workflow-diagrams')
 def workflow_diagrams():
@@ -83,6 +138,23 @@ def health_check():
         }
     })
 
+@app.route('/api/realtime/stats')
+def realtime_stats():
+    """SocketIO connection gauge and backpressure counters"""
+    stats = connection_tracker.stats()
+    stats.update({
+        "async_mode": socketio.async_mode,
+        "message_queue": app.config.get('SOCKETIO_MESSAGE_QUEUE') or None
+    })
+    return jsonify(stats)
+
+@app.route('/api/sessions/stats')
+def session_stats():
+    """Occupancy and eviction metrics for the per-user session registries"""
+    return jsonify({
+        ai_assistants.name: ai_assistants.stats()
+    })
+
 @app.route('/api/profile')
 def get_profile():
     """Get user profile information"""
@@ -162,6 +234,13 @@ def get_themes():
             "colors": ["#1e40af", "#3b82f6", "#60a5fa", "#3b82f6"]
         }
     }
+    user_id = request.args.get('user_id')
+    if user_id:
+        return jsonify({
+            "themes": themes,
+            "default": app.config['DEFAULT_THEME'],
+            "selected": preferences_cache.theme(user_id)
+        })
     return jsonify(themes)
 
 if __name__ == '__main__':
@@ -176,6 +255,7 @@ if __name__ == '__main__':
     print(f"   - Workflow Diagrams: http://localhost:{port}/workflow-diagrams")
     print(f"   - API Health: http://localhost:{port}/api/health")
     print(f"   - Diagram API: http://localhost:{port}/api/diagrams/health")
+    print(f"   - SocketIO: {socketio.async_mode} workers, queue={app.config.get('SOCKETIO_MESSAGE_QUEUE') or 'none'}")
     print(f"   - Core Modules: {'Available' if CORE_MODULES_AVAILABLE else 'Limited Mode'}")
     print(f"   - Debug Mode: {'ON' if debug else 'OFF'}")
     print("   Press Ctrl+C to stop the server")
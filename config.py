@@ -1,6 +1,8 @@
 # Configuration for AI Portal
 # Port Strategy: 3030 (Frontend), 3040 (Backend) - Chrome Safe!
 
+import os
+
 class Config:
     """Base configuration class"""
     HOST = '0.0.0.0'
@@ -19,9 +21,26 @@ class Config:
     DEFAULT_THEME = 'space'
     AVAILABLE_THEMES = ['space', 'ocean', 'forest', 'sky']
     
+    # User preferences (read-through cache, write-behind to user_preferences)
+    PREFERENCES_CACHE_SIZE = 10000  # users kept in memory
+    PREFERENCES_FLUSH_DELAY = 2.0  # seconds a change must be quiet before it is written
+    
     # Port allocation
     FRONTEND_PORT = 3030  # Main portal - Chrome Safe!
     BACKEND_PORT = 3040   # Future backend services - Chrome Safe!
+    GATEWAY_PORT = 3050   # Single-origin edge gateway (python3 -m services.gateway)
+    
+    # Edge gateway routes: longest prefix wins; timeouts in seconds
+    GATEWAY_ROUTES = [
+        {'prefix': '/api/diagrams', 'upstream': 'http://127.0.0.1:6060', 'read_timeout': 60},
+        # Live preview stats are served by the portal's preview blueprint only
+        {'prefix': '/api/diagrams/preview', 'upstream': 'http://127.0.0.1:3030', 'read_timeout': 30},
+        {'prefix': '/api/ai', 'upstream': 'http://127.0.0.1:6060', 'read_timeout': 120},
+        {'prefix': '/api/chat', 'upstream': 'http://127.0.0.1:7000', 'read_timeout': 60},
+        # SSE: the read timeout bounds the gap between tokens, not the whole reply
+        {'prefix': '/api/chat/stream', 'upstream': 'http://127.0.0.1:7000', 'read_timeout': 300},
+        {'prefix': '', 'upstream': 'http://127.0.0.1:3030', 'read_timeout': 30},
+    ]
     
     # Security
     CORS_ORIGINS = ['http://localhost:3030', 'http://127.0.0.1:3030']
@@ -29,6 +48,93 @@ class Config:
     # Logging
     LOG_LEVEL = 'INFO'
     LOG_FILE = 'ai_portal.log'
+    # Files followed by the Log Dashboard (/api/logs), keyed by service name
+    LOG_SOURCES = {
+        'portal': LOG_FILE,
+        'unified-server': 'server/server.log',
+        'diagram-api': 'workflow_diagrams_api/diagram_server.log',
+        'ai-assistant': 'ai_assistant_api/ai_server.log'
+    }
+    LOG_INDEX_BUCKET_SECONDS = 300
+    LOG_INDEX_MAX_LINES = 200000  # lines kept searchable in memory
+    LOG_STREAM_RATE = 50  # lines/second per subscriber
+    LOG_STREAM_BURST = 200
+    
+    # Server Management metrics (sampled from /proc)
+    METRICS_SAMPLE_INTERVAL = 1.0  # seconds
+    METRICS_DISK_PATH = '/'
+    # Processes tracked per service, matched by command-line substring
+    METRICS_SERVICES = {
+        'portal': 'app.py',
+        'diagram-api': 'diagram_server.py',
+        'ai-assistant': 'ai_server.py',
+        'unified-server': 'unified-server.js'
+    }
+    
+    # Static assets; image variants come from python3 -m services.asset_pipeline
+    ASSETS_DIR = 'assets'
+    ASSET_VARIANTS_DIR = 'assets/derived'
+    # Fingerprinted assets and rewritten HTML (python3 -m services.static_assets)
+    STATIC_BUILD_DIR = 'build/static'
+    
+    # Static site for GitHub Pages (python3 -m services.static_export)
+    STATIC_EXPORT_DIR = 'build/site'
+    # Pages and read-only JSON endpoints rendered through the app
+    STATIC_EXPORT_ROUTES = ['/', '/enhanced', '/workflow-diagrams', '/api/profile',
+                            '/api/dashboards', '/api/themes']
+    # Files and directories copied as-is
+    STATIC_EXPORT_COPY = ['assets', 'pages', 'projects', 'src', 'sw.js', 'workflow-diagrams.html',
+                          'visitor-dashboard.html', 'advanced-dashboard-options.html',
+                          'card-design-showcase.html', 'Resume_AS_2.pdf']
+    
+    # Live diagram preview (SocketIO 'diagram_preview'); drafts are never saved
+    DIAGRAM_PREVIEW_DEBOUNCE = 0.3  # seconds of quiet before a draft is rendered
+    DIAGRAM_PREVIEW_WORKERS = 2
+    DIAGRAM_PREVIEW_TIMEOUT = 20.0  # seconds
+    DIAGRAM_PREVIEW_MAX_SOURCE_BYTES = 200 * 1024
+    
+    # Aggregated dependency status (/api/status)
+    STATUS_CACHE_TTL = 5.0  # seconds
+    STATUS_DIAGRAM_URL = 'http://127.0.0.1:6060/api/health'
+    STATUS_CHAT_URL = 'http://127.0.0.1:7000/api/health'
+    STATUS_PROBE_TIMEOUTS = {  # seconds
+        'diagram_server': 3.0,  # its /api/health runs plantuml -version
+        'chat_server': 2.0,
+        'plantuml': 3.0,
+        'sqlite': 1.0,
+        'disk': 1.0
+    }
+    STATUS_DISK_MIN_FREE_PERCENT = 5.0
+    
+    # Realtime (SocketIO) configuration
+    # async mode: 'threading' (default), 'gevent' or 'eventlet'
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+    # Message queue shared by all portal processes, e.g. 'redis://localhost:6379/0'.
+    # 'local://' uses an in-process stand-in (tests / single process).
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None
+    SOCKETIO_CHANNEL = 'ai-portal'
+    SOCKETIO_PING_INTERVAL = 25
+    SOCKETIO_PING_TIMEOUT = 20
+    SOCKETIO_MAX_PENDING_PER_CLIENT = 64
+    # Seconds an unacknowledged message holds one of a client's pending slots
+    SOCKETIO_ACK_TIMEOUT = 2.0
+    
+    # Per-user session registries (ai_assistants)
+    SESSION_MAX_ENTRIES = 1000
+    SESSION_IDLE_TTL = 30 * 60  # seconds
+    SESSION_MEMORY_BUDGET = 256 * 1024 * 1024  # bytes, AI assistants only
+    SESSION_SPILL_ENABLED = True  # spill evicted assistants to DATABASE_URI
+    SESSION_SPILL_TTL = 7 * 24 * 3600  # seconds a spilled assistant is kept
+    
+    # Visitor tracking ingestion (append-only NDJSON segments)
+    VISITOR_EVENT_LOG_DIR = 'logs/events'
+    VISITOR_EVENT_SEGMENT_BYTES = 64 * 1024 * 1024
+    VISITOR_EVENT_QUEUE_SIZE = 100000  # events; beyond this requests get 503
+    VISITOR_EVENT_FSYNC = True
+    
+    # Visitor analytics rollups
+    ANALYTICS_SNAPSHOT_PATH = 'logs/analytics_rollups.json'
+    ANALYTICS_SNAPSHOT_INTERVAL = 60  # seconds
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -46,6 +152,10 @@ class TestingConfig(Config):
     TESTING = True
     DEBUG = True
     DATABASE_URI = 'sqlite:///test_ai_portal.db'
+    SOCKETIO_MESSAGE_QUEUE = 'local://'
+    VISITOR_EVENT_LOG_DIR = 'logs/test_events'
+    VISITOR_EVENT_FSYNC = False
+    ANALYTICS_SNAPSHOT_PATH = 'logs/test_analytics_rollups.json'
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,457 @@
+"""
+Pre-aggregated visitor analytics.
+
+Tracker events accepted by ``tracking_service`` are folded into per-minute,
+per-hour and per-day rollup buckets as they arrive:
+
+- event counts keyed by event type and page / referrer / custom event name
+- unique sessions as HyperLogLog sketches (overall and per page)
+- session durations as quantile sketches
+
+``/api/analytics`` answers from the rollups only, so a dashboard query costs
+O(buckets in range) no matter how many raw events were recorded. Rollups are
+snapshotted to disk periodically and can be rebuilt from the event log.
+"""
+
+import atexit
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from flask import Blueprint, jsonify, request
+
+from services.sketches import HyperLogLog, QuantileSketch
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+# How long buckets of each resolution are kept (seconds; None = forever)
+RETENTION = {'minute': 2 * 86400, 'hour': 90 * 86400, 'day': None}
+
+ALL = ('all', '*')
+
+# Event times outside [0, 2100-01-01) are treated as missing
+MAX_EVENT_TIME = 4102444800.0
+
+
+def _valid_time(seconds: float) -> Optional[float]:
+    return seconds if math.isfinite(seconds) and 0 <= seconds < MAX_EVENT_TIME else None
+
+
+def _epoch_seconds(value) -> Optional[float]:
+    """Epoch seconds from a seconds/milliseconds number, None if it is not a usable time"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    try:
+        return _valid_time(value / 1000 if value > 1e11 else float(value))
+    except OverflowError:
+        return None
+
+
+def event_time(event: Dict) -> float:
+    """Epoch seconds for an event: its own timestamp if usable, else the receive time"""
+    stamp = event.get('timestamp')
+    if isinstance(stamp, str):
+        try:
+            seconds = _valid_time(datetime.fromisoformat(stamp.replace('Z', '+00:00')).timestamp())
+        except (ValueError, OverflowError, OSError):
+            seconds = None
+    else:
+        seconds = _epoch_seconds(stamp)
+    if seconds is None:
+        seconds = _epoch_seconds(event.get('receivedAt'))
+    return seconds if seconds is not None else time.time()
+
+
+def page_of(event: Dict) -> Optional[str]:
+    url = event.get('url') or event.get('page')
+    if not url or not isinstance(url, str):
+        return None
+    return urlparse(url).path or '/'
+
+
+def referrer_of(event: Dict) -> str:
+    referrer = event.get('referrer') or event.get('referer')
+    if not referrer or not isinstance(referrer, str):
+        return '(direct)'
+    return urlparse(referrer).netloc or referrer
+
+
+def event_dimensions(event: Dict) -> Tuple[str, List[Tuple[str, str]]]:
+    """Event type and the (dimension, value) keys it is counted under"""
+    event_type = event.get('type') or 'event'
+    if not isinstance(event_type, str):
+        raise ValueError(f'Invalid event type: {event_type!r}')
+    keys = [ALL]
+    page = page_of(event)
+    if page:
+        keys.append(('page', page))
+    if event_type == 'page':
+        keys.append(('referrer', referrer_of(event)))
+    if event_type == 'event' and event.get('event'):
+        keys.append(('name', str(event['event'])))
+    return event_type, keys
+
+
+class RollupEngine:
+    """Incrementally maintained multi-resolution rollups of tracker events"""
+
+    def __init__(self, hll_precision: int = 12, page_hll_precision: int = 10,
+                 session_idle: float = 1800, max_open_sessions: int = 50000):
+        self.hll_precision = hll_precision
+        self.page_hll_precision = page_hll_precision
+        self.session_idle = session_idle
+        self.max_open_sessions = max_open_sessions
+        self._lock = threading.Lock()
+        # resolution -> bucket start -> (event type, dimension, value) -> count
+        self._counts: Dict[str, Dict[int, Dict[Tuple[str, str, str], int]]] = {r: {} for r in RESOLUTIONS}
+        # resolution -> bucket start -> (dimension, value) -> HyperLogLog of session ids
+        self._uniques: Dict[str, Dict[int, Dict[Tuple[str, str], HyperLogLog]]] = {r: {} for r in RESOLUTIONS}
+        # resolution -> bucket start -> QuantileSketch of finished session durations (ms)
+        self._durations: Dict[str, Dict[int, QuantileSketch]] = {r: {} for r in RESOLUTIONS}
+        # Sessions still reporting durations: session id -> [latest duration ms, last seen]
+        self._open_sessions: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self.events_ingested = 0
+        self.events_rejected = 0
+
+    # Ingestion ---------------------------------------------------------
+
+    def ingest(self, events: Iterable[Dict]):
+        with self._lock:
+            for event in events:
+                self._ingest_safely(event)
+            self._close_idle_sessions(time.time())
+
+    def rebuild(self, events: Iterable[Dict], batch_size: int = 10000):
+        """Discard all rollups and recompute them from raw events (e.g. the event log).
+
+        Idle sessions are closed once, after the last batch, against the newest
+        event time: closing them per batch against the wall clock would finish
+        every session that straddles a batch boundary twice.
+        """
+        self.restore({})
+        self.events_rejected = 0
+        newest = None
+        batch = []
+        for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                newest = self._replay(batch, newest)
+                batch = []
+        newest = self._replay(batch, newest)
+        if newest is not None:
+            with self._lock:
+                self._close_idle_sessions(newest)
+
+    def _replay(self, events: List[Dict], newest: Optional[float]) -> Optional[float]:
+        """Ingest a batch without closing sessions; returns the newest event time so far"""
+        with self._lock:
+            for event in events:
+                ts = self._ingest_safely(event)
+                if ts is not None:
+                    newest = ts if newest is None else max(newest, ts)
+        return newest
+
+    def _ingest_safely(self, event: Dict) -> Optional[float]:
+        """Ingest one client event; a malformed one is counted and skipped, never raised"""
+        try:
+            return self._ingest_one(event)
+        except (ValueError, TypeError, AttributeError) as e:
+            self.events_rejected += 1
+            logger.debug(f"Skipping malformed analytics event: {str(e)}")
+            return None
+
+    def _ingest_one(self, event: Dict) -> float:
+        """Fold one event into the rollups; malformed events raise before anything changes"""
+        ts = event_time(event)
+        event_type, keys = event_dimensions(event)
+        session = event.get('sessionId')
+        if session is not None and not isinstance(session, str):
+            raise ValueError(f'Invalid sessionId: {session!r}')
+        duration = event.get('duration')
+        if session and event_type == 'duration' and isinstance(duration, (int, float)):
+            if isinstance(duration, bool) or not math.isfinite(duration) or duration < 0:
+                raise ValueError(f'Invalid duration: {duration!r}')
+        else:
+            duration = None
+        self.events_ingested += 1
+
+        for resolution, width in RESOLUTIONS.items():
+            bucket = int(ts // width * width)
+            counts = self._counts[resolution].setdefault(bucket, {})
+            for dimension, value in keys:
+                key = (event_type, dimension, value)
+                counts[key] = counts.get(key, 0) + 1
+            if session:
+                uniques = self._uniques[resolution].setdefault(bucket, {})
+                for key in keys:
+                    if key[0] in ('all', 'page'):
+                        if key not in uniques:
+                            uniques[key] = HyperLogLog(
+                                self.hll_precision if key == ALL else self.page_hll_precision)
+                        uniques[key].add(session)
+
+        if duration is not None:
+            # Durations are cumulative per session; only the last one counts
+            self._open_sessions[session] = [float(duration), ts]
+            self._open_sessions.move_to_end(session)
+            while len(self._open_sessions) > self.max_open_sessions:
+                self._finish_session(*self._open_sessions.popitem(last=False))
+        return ts
+
+    def _close_idle_sessions(self, now: float):
+        while self._open_sessions:
+            session, (duration, last_seen) = next(iter(self._open_sessions.items()))
+            if now - last_seen < self.session_idle:
+                break
+            self._open_sessions.popitem(last=False)
+            self._finish_session(session, [duration, last_seen])
+
+    def _finish_session(self, session: str, state: List[float]):
+        duration, last_seen = state
+        for resolution, width in RESOLUTIONS.items():
+            bucket = int(last_seen // width * width)
+            self._durations[resolution].setdefault(bucket, QuantileSketch()).add(duration)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop buckets past their resolution's retention; returns buckets dropped"""
+        now = now or time.time()
+        dropped = 0
+        with self._lock:
+            for resolution, retention in RETENTION.items():
+                if retention is None:
+                    continue
+                cutoff = now - retention
+                for table in (self._counts, self._uniques, self._durations):
+                    for bucket in [b for b in table[resolution] if b < cutoff]:
+                        del table[resolution][bucket]
+                        dropped += 1
+        return dropped
+
+    # Queries -----------------------------------------------------------
+
+    def _buckets(self, table: Dict, resolution: str, start: float, end: float) -> List[int]:
+        return sorted(b for b in table[resolution] if start <= b < end)
+
+    def query_counts(self, resolution: str, start: float, end: float, event_type: str = 'page',
+                     dimension: str = 'all', value: Optional[str] = None, top: int = 10) -> Dict:
+        with self._lock:
+            buckets = self._buckets(self._counts, resolution, start, end)
+            if dimension == 'all' or value is not None:
+                key = (event_type, dimension, value if value is not None else '*')
+                series = [{'bucket': b, 'count': self._counts[resolution][b].get(key, 0)} for b in buckets]
+                return {'series': series, 'total': sum(point['count'] for point in series)}
+
+            totals: Dict[str, int] = {}
+            for b in buckets:
+                for (etype, dim, val), count in self._counts[resolution][b].items():
+                    if etype == event_type and dim == dimension:
+                        totals[val] = totals.get(val, 0) + count
+            ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+            return {'top': [{'value': val, 'count': count} for val, count in ranked],
+                    'distinct_values': len(totals)}
+
+    def query_uniques(self, resolution: str, start: float, end: float,
+                      page: Optional[str] = None) -> Dict:
+        key = ('page', page) if page else ALL
+        with self._lock:
+            merged = HyperLogLog(self.page_hll_precision if page else self.hll_precision)
+            series = []
+            for b in self._buckets(self._uniques, resolution, start, end):
+                hll = self._uniques[resolution][b].get(key)
+                series.append({'bucket': b, 'sessions': hll.count() if hll else 0})
+                if hll:
+                    merged.merge(hll)
+            return {'series': series, 'total': merged.count()}
+
+    def query_durations(self, resolution: str, start: float, end: float) -> Dict:
+        with self._lock:
+            merged = QuantileSketch()
+            series = []
+            for b in self._buckets(self._durations, resolution, start, end):
+                sketch = self._durations[resolution][b]
+                series.append({'bucket': b, 'sessions': sketch.count, 'p50': sketch.quantile(0.5)})
+                merged.merge(sketch)
+            return {'series': series, 'summary': merged.summary(),
+                    'open_sessions': len(self._open_sessions)}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'events_ingested': self.events_ingested,
+                'events_rejected': self.events_rejected,
+                'open_sessions': len(self._open_sessions),
+                'buckets': {r: len(self._counts[r]) for r in RESOLUTIONS}
+            }
+
+    # Persistence -------------------------------------------------------
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'version': 1,
+                'events_ingested': self.events_ingested,
+                'counts': {r: {str(b): [[*k, c] for k, c in keys.items()] for b, keys in table.items()}
+                           for r, table in self._counts.items()},
+                'uniques': {r: {str(b): [[*k, h.to_dict()] for k, h in keys.items()] for b, keys in table.items()}
+                            for r, table in self._uniques.items()},
+                'durations': {r: {str(b): s.to_dict() for b, s in table.items()}
+                              for r, table in self._durations.items()},
+                'open_sessions': [[sid, *state] for sid, state in self._open_sessions.items()]
+            }
+
+    def restore(self, data: Dict):
+        with self._lock:
+            self._restore(data)
+
+    def _restore(self, data: Dict):
+        self.events_ingested = data.get('events_ingested', 0)
+        for r in RESOLUTIONS:
+            self._counts[r] = {int(b): {(t, d, v): c for t, d, v, c in keys}
+                               for b, keys in data.get('counts', {}).get(r, {}).items()}
+            self._uniques[r] = {int(b): {(d, v): HyperLogLog.from_dict(h) for d, v, h in keys}
+                                for b, keys in data.get('uniques', {}).get(r, {}).items()}
+            self._durations[r] = {int(b): QuantileSketch.from_dict(s)
+                                  for b, s in data.get('durations', {}).get(r, {}).items()}
+        self._open_sessions = OrderedDict(
+            (sid, [duration, last_seen]) for sid, duration, last_seen in data.get('open_sessions', []))
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r', encoding='utf-8') as f:
+            self.restore(json.load(f))
+        return True
+
+
+rollup_engine = RollupEngine()
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api')
+
+
+@analytics_bp.record_once
+def _start_rollups(state):
+    """Load the last snapshot, subscribe to tracker events and snapshot periodically"""
+    from services.tracking_service import event_listeners
+
+    snapshot_path = state.app.config.get('ANALYTICS_SNAPSHOT_PATH', 'logs/analytics_rollups.json')
+    interval = state.app.config.get('ANALYTICS_SNAPSHOT_INTERVAL', 60)
+    os.makedirs(os.path.dirname(snapshot_path) or '.', exist_ok=True)
+    try:
+        if rollup_engine.load(snapshot_path):
+            logger.info(f"Loaded analytics rollups from {snapshot_path}")
+    except (OSError, ValueError, KeyError) as e:
+        logger.error(f"Could not load analytics rollups: {str(e)}")
+    event_listeners.append(rollup_engine.ingest)
+
+    def save():
+        try:
+            rollup_engine.prune()
+            rollup_engine.save(snapshot_path)
+        except OSError as e:
+            logger.error(f"Could not save analytics rollups: {str(e)}")
+
+    def snapshot_loop():
+        while True:
+            time.sleep(interval)
+            save()
+
+    threading.Thread(target=snapshot_loop, name='analytics-snapshot', daemon=True).start()
+    atexit.register(save)
+
+
+def _parse_time(value: Optional[str], default: float) -> float:
+    """Epoch seconds from an epoch number or ISO string (naive = UTC)"""
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+
+
+@analytics_bp.route('/analytics', methods=['GET'])
+def query_analytics():
+    """Query visitor rollups.
+
+    Params: metric (views|events|uniques|duration), resolution (minute|hour|day),
+    from/to (epoch seconds or ISO), type, dimension (all|page|referrer|name),
+    value, page, top
+    """
+    try:
+        metric = request.args.get('metric', 'views')
+        resolution = request.args.get('resolution', 'hour')
+        if resolution not in RESOLUTIONS:
+            return jsonify({
+                'status': 'error',
+                'message': f"resolution must be one of {', '.join(RESOLUTIONS)}"
+            }), 400
+
+        now = time.time()
+        try:
+            end = _parse_time(request.args.get('to'), now)
+            start = _parse_time(request.args.get('from'), end - 24 * 3600)
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'from and to must be epoch seconds or ISO 8601 timestamps'
+            }), 400
+
+        if metric in ('views', 'events'):
+            result = rollup_engine.query_counts(
+                resolution, start, end,
+                event_type=request.args.get('type', 'page' if metric == 'views' else 'event'),
+                dimension=request.args.get('dimension', 'all'),
+                value=request.args.get('value'),
+                top=request.args.get('top', 10, type=int))
+        elif metric == 'uniques':
+            result = rollup_engine.query_uniques(resolution, start, end, page=request.args.get('page'))
+        elif metric == 'duration':
+            result = rollup_engine.query_durations(resolution, start, end)
+        else:
+            return jsonify({
+                'status': 'error',
+                'message': 'metric must be one of views, events, uniques, duration'
+            }), 400
+
+        return jsonify({
+            'status': 'success',
+            'metric': metric,
+            'resolution': resolution,
+            'from': start,
+            'to': end,
+            **result
+        })
+    except Exception as e:
+        logger.error(f"Error querying analytics: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to query analytics: {str(e)}'
+        }), 500
+
+
+@analytics_bp.route('/analytics/stats', methods=['GET'])
+def analytics_stats():
+    """Rollup engine size and ingestion counters"""
+    return jsonify({
+        'status': 'success',
+        'rollups': rollup_engine.stats()
+    })
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Image derivative pipeline for ``assets/`` and content-negotiated serving.
+
+Build stage (needs Pillow):
+
+    python3 -m services.asset_pipeline [--src assets] [--out assets/derived]
+
+Every PNG/JPEG/GIF/WebP under ``--src`` is hashed; byte-identical files are
+processed once. For each unique image the stage writes resized variants at
+``ASSET_VARIANT_WIDTHS`` (never upscaled) in WebP and AVIF (animated GIFs
+become animated WebP), plus smaller PNG/JPEG fallbacks, named
+``<hash>-<width>w.<ext>``. Variants that come out larger than the original
+are dropped. ``manifest.json`` maps every source path to its hash,
+dimensions and variants; unchanged images are skipped on the next run.
+
+Serving: ``assets_bp`` answers ``/assets/<path>`` and, for images in the
+manifest, sends the smallest variant the client accepts (``Accept``) that is
+at least the requested width (``?w=`` or the ``Sec-CH-Width``/``Width``
+client hints), falling back to the original file. Fingerprinted names from
+``services.static_assets`` are served the same way, but cached immutably.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from flask import Blueprint, current_app, request, send_from_directory
+
+from services.static_assets import IMMUTABLE_CACHE_CONTROL, FingerprintIndex, send_immutable
+
+try:
+    from PIL import Image, ImageSequence, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {'.png': 'png', '.jpg': 'jpeg', '.jpeg': 'jpeg', '.gif': 'gif', '.webp': 'webp'}
+FORMAT_EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'png': 'png', 'jpeg': 'jpg'}
+FORMAT_MIME = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png',
+               'jpeg': 'image/jpeg', 'gif': 'image/gif'}
+DEFAULT_WIDTHS = [320, 640, 1024, 1600]
+DEFAULT_FORMATS = ['avif', 'webp']
+MANIFEST_NAME = 'manifest.json'
+# ``<source hash prefix>-<width>w.<ext>``: the only files cleanup may delete
+VARIANT_NAME_RE = re.compile(
+    rf"^[0-9a-f]{{16}}-\d+w\.(?:{'|'.join(sorted(set(FORMAT_EXTENSIONS.values())))})$")
+MANIFEST_VERSION = 1
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def avif_supported() -> bool:
+    if not PIL_AVAILABLE:
+        return False
+    try:
+        if features.check('avif'):
+            return True
+    except ValueError:
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (registers the AVIF plugin)
+        return True
+    except ImportError:
+        return False
+
+
+# Build -----------------------------------------------------------------
+
+def _save(image, path: str, fmt: str, frames=None, durations=None, loop: int = 0):
+    options = {
+        'webp': {'quality': 80, 'method': 4},
+        'avif': {'quality': 55, 'speed': 6},
+        'png': {'optimize': True},
+        'jpeg': {'quality': 82, 'optimize': True, 'progressive': True},
+    }[fmt]
+    if frames:
+        image.save(path, format=fmt.upper(), save_all=True, append_images=frames,
+                   duration=durations, loop=loop, **options)
+    else:
+        image.save(path, format=fmt.upper(), **options)
+
+
+def render_variants(source: str, digest: str, out_dir: str, widths: List[int],
+                    formats: List[str]) -> Dict:
+    """Write all variants of one image; returns its manifest entry (runs in a worker)"""
+    original_bytes = os.path.getsize(source)
+    variants = []
+    with Image.open(source) as image:
+        width, height = image.size
+        source_format = (image.format or '').lower()
+        animated = getattr(image, 'is_animated', False)
+        targets = sorted({w for w in widths if w < width} | {width})
+        if animated:
+            frames = [frame.convert('RGBA') for frame in ImageSequence.Iterator(image)]
+            durations = [frame.info.get('duration', image.info.get('duration', 100))
+                         for frame in ImageSequence.Iterator(image)]
+            loop = image.info.get('loop', 0)
+        else:
+            has_alpha = image.mode in ('RGBA', 'LA', 'P') and (
+                image.mode != 'P' or 'transparency' in image.info)
+            base = image.convert('RGBA' if has_alpha else 'RGB')
+
+        for target in targets:
+            size = (target, max(1, round(height * target / width)))
+            if animated:
+                # Animated AVIF support is patchy; animated WebP works everywhere WebP does
+                target_formats = [fmt for fmt in formats if fmt == 'webp']
+            else:
+                target_formats = list(formats)
+                if target < width and source_format in ('png', 'jpeg'):
+                    target_formats.append(source_format)
+            for fmt in target_formats:
+                name = f"{digest[:16]}-{target}w.{FORMAT_EXTENSIONS[fmt]}"
+                path = os.path.join(out_dir, name)
+                if not os.path.exists(path):
+                    tmp_path = f"{path}.tmp"
+                    if animated:
+                        resized = [frame.resize(size, Image.LANCZOS) for frame in frames]
+                        _save(resized[0], tmp_path, fmt, resized[1:], durations, loop)
+                    else:
+                        resized = base if target == width else base.resize(size, Image.LANCZOS)
+                        if fmt == 'jpeg' and resized.mode != 'RGB':
+                            resized = resized.convert('RGB')
+                        _save(resized, tmp_path, fmt)
+                    os.replace(tmp_path, path)
+                size_bytes = os.path.getsize(path)
+                if size_bytes >= original_bytes:
+                    # No point serving a "derivative" bigger than the original
+                    os.unlink(path)
+                    continue
+                variants.append({'file': name, 'format': fmt, 'width': target, 'bytes': size_bytes})
+
+    return {
+        'hash': digest,
+        'format': source_format,
+        'width': width,
+        'height': height,
+        'animated': animated,
+        'bytes': original_bytes,
+        'variants': variants
+    }
+
+
+def _scan(src_dir: str, out_dir: str) -> Dict[str, str]:
+    """Relative path -> absolute path for every image under src_dir"""
+    images = {}
+    out_real = os.path.realpath(out_dir)
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) != out_real)
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                path = os.path.join(root, name)
+                images[os.path.relpath(path, src_dir).replace(os.sep, '/')] = path
+    return images
+
+
+def load_manifest(out_dir: str) -> Dict:
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'images': {}, 'sources': {}}
+
+
+def build_variants(src_dir: str = 'assets', out_dir: str = 'assets/derived',
+                   widths: Optional[List[int]] = None, formats: Optional[List[str]] = None,
+                   workers: Optional[int] = None) -> Dict:
+    """Generate derivatives for every image under ``src_dir``; returns the manifest"""
+    if not PIL_AVAILABLE:
+        raise RuntimeError('Pillow is required to build image variants (pip install Pillow)')
+    widths = sorted(widths or DEFAULT_WIDTHS)
+    formats = [fmt for fmt in (formats or DEFAULT_FORMATS)
+               if fmt != 'avif' or avif_supported()]
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest(out_dir)
+    previous_settings = previous.get('settings', {})
+    settings_unchanged = previous_settings == {'widths': widths, 'formats': formats}
+
+    # Duplicate files (same bytes, different names) share one set of variants
+    sources = _scan(src_dir, out_dir)
+    by_hash: Dict[str, List[str]] = {}
+    for rel_path, path in sources.items():
+        by_hash.setdefault(file_hash(path), []).append(rel_path)
+
+    images = {}
+    pending = {}
+    for digest, rel_paths in by_hash.items():
+        cached = previous['images'].get(digest)
+        if (settings_unchanged and cached is not None
+                and all(os.path.exists(os.path.join(out_dir, v['file'])) for v in cached['variants'])):
+            images[digest] = cached
+        else:
+            pending[digest] = sources[rel_paths[0]]
+
+    if pending:
+        logger.info(f"Rendering variants for {len(pending)} of {len(by_hash)} unique images")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {digest: executor.submit(render_variants, path, digest, out_dir, widths, formats)
+                       for digest, path in pending.items()}
+            for digest, future in futures.items():
+                try:
+                    images[digest] = future.result()
+                except Exception as e:
+                    logger.error(f"Could not render variants of {pending[digest]}: {str(e)}")
+
+    # Variants no longer referenced by any image are removed; anything else is left alone
+    referenced = {v['file'] for entry in images.values() for v in entry['variants']}
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if VARIANT_NAME_RE.match(name) and name not in referenced and os.path.isfile(path):
+            os.unlink(path)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'settings': {'widths': widths, 'formats': formats},
+        'images': images,
+        'sources': {rel_path: digest for digest, rel_paths in by_hash.items()
+                    for rel_path in rel_paths if digest in images},
+        'duplicates': {digest: rel_paths for digest, rel_paths in by_hash.items() if len(rel_paths) > 1}
+    }
+    tmp_path = os.path.join(out_dir, f"{MANIFEST_NAME}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_NAME))
+    return manifest
+
+
+def summarize(manifest: Dict) -> Dict:
+    """Bytes on the wire before/after for the largest and a 640px-wide modern variant"""
+    original = sum(manifest['images'][digest]['bytes'] for digest in manifest['sources'].values())
+    best_full = best_640 = 0
+    for digest in manifest['sources'].values():
+        entry = manifest['images'][digest]
+        full = [v['bytes'] for v in entry['variants'] if v['width'] == entry['width']]
+        small = [v['bytes'] for v in entry['variants'] if v['width'] <= 640]
+        best_full += min(full, default=entry['bytes'])
+        best_640 += min(small, default=min(full, default=entry['bytes']))
+    return {
+        'images': len(manifest['sources']),
+        'unique_images': len(manifest['images']),
+        'original_bytes': original,
+        'best_full_width_bytes': best_full,
+        'best_640w_bytes': best_640
+    }
+
+
+# Serving ---------------------------------------------------------------
+
+class VariantIndex:
+    """Manifest lookups for content negotiation; reloads when the manifest changes"""
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self._manifest: Dict = {'images': {}, 'sources': {}}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _current(self) -> Dict:
+        path = os.path.join(self.out_dir, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return self._manifest
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        self._manifest = load_manifest(self.out_dir)
+                        self._mtime = mtime
+                    except (OSError, ValueError) as e:
+                        logger.error(f"Could not load asset manifest: {str(e)}")
+        return self._manifest
+
+    def choose(self, rel_path: str, accept: str, width: Optional[int]) -> Optional[Dict]:
+        """Best variant of ``rel_path`` for the client, or None to send the original"""
+        manifest = self._current()
+        digest = manifest['sources'].get(rel_path)
+        if digest is None:
+            return None
+        entry = manifest['images'][digest]
+        accept = accept or ''
+        preferred = [fmt for fmt in ('avif', 'webp') if FORMAT_MIME[fmt] in accept]
+        preferred.append(entry['format'])
+        wanted = min(width, entry['width']) if width else entry['width']
+        for fmt in preferred:
+            candidates = sorted((v for v in entry['variants'] if v['format'] == fmt),
+                                key=lambda v: v['width'])
+            if not candidates:
+                continue
+            fitting = [v for v in candidates if v['width'] >= wanted]
+            if fitting:
+                return fitting[0]
+        return None
+
+
+def requested_width() -> Optional[int]:
+    for value in (request.args.get('w'), request.headers.get('Sec-CH-Width'),
+                  request.headers.get('Width')):
+        if value:
+            try:
+                return max(1, int(float(value)))
+            except ValueError:
+                continue
+    return None
+
+
+assets_bp = Blueprint('assets', __name__)
+_variant_index: Optional[VariantIndex] = None
+fingerprint_index: Optional[FingerprintIndex] = None
+
+
+@assets_bp.record_once
+def _configure_assets(state):
+    global _variant_index, fingerprint_index
+    variants_dir = os.path.join(state.app.root_path,
+                                state.app.config.get('ASSET_VARIANTS_DIR', 'assets/derived'))
+    _variant_index = VariantIndex(variants_dir)
+    fingerprint_index = FingerprintIndex(
+        os.path.join(state.app.root_path, state.app.config.get('STATIC_BUILD_DIR', 'build/static')))
+
+
+@assets_bp.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Serve an asset, negotiating image format and width against the manifest"""
+    assets_dir = os.path.join(current_app.root_path, current_app.config.get('ASSETS_DIR', 'assets'))
+    # Fingerprinted name (assets/css/style.<hash>.css): content can never change
+    original = fingerprint_index.original(f'assets/{filename}') if fingerprint_index else None
+    if original is not None:
+        filename = original[len('assets/'):]
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in IMAGE_EXTENSIONS and _variant_index is not None:
+        variant = _variant_index.choose(filename, request.headers.get('Accept', ''), requested_width())
+        if variant:
+            response = send_from_directory(_variant_index.out_dir, variant['file'],
+                                           mimetype=FORMAT_MIME[variant['format']])
+        elif original is not None:
+            response = send_immutable(os.path.join(fingerprint_index.build_dir, 'assets',
+                                                   request.view_args['filename']))
+        else:
+            response = send_from_directory(assets_dir, filename)
+        response.headers['Vary'] = 'Accept, Width, Sec-CH-Width'
+        response.headers['Accept-CH'] = 'Sec-CH-Width, Width'
+        response.headers['Cache-Control'] = (IMMUTABLE_CACHE_CONTROL if original is not None
+                                             else 'public, max-age=86400')
+        return response
+    if original is not None:
+        return send_immutable(os.path.join(fingerprint_index.build_dir, 'assets',
+                                           request.view_args['filename']))
+    return send_from_directory(assets_dir, filename)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Build responsive WebP/AVIF variants of assets/ images')
+    parser.add_argument('--src', default='assets')
+    parser.add_argument('--out', default='assets/derived')
+    parser.add_argument('--widths', default=','.join(str(w) for w in DEFAULT_WIDTHS))
+    parser.add_argument('--formats', default=','.join(DEFAULT_FORMATS))
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    print(f"🖼️  Building image variants {args.src} -> {args.out}")
+    try:
+        manifest = build_variants(args.src, args.out,
+                                  widths=[int(w) for w in args.widths.split(',') if w],
+                                  formats=[f for f in args.formats.split(',') if f],
+                                  workers=args.workers)
+    except (OSError, RuntimeError) as e:
+        print(f"❌ Build failed: {e}")
+        return 1
+    summary = summarize(manifest)
+    mb = 1024 * 1024
+    print(f"✅ {summary['images']} images ({summary['unique_images']} unique), "
+          f"{len(manifest['duplicates'])} duplicate groups")
+    print(f"   Originals: {summary['original_bytes'] / mb:.1f} MB, "
+          f"best full-width variants: {summary['best_full_width_bytes'] / mb:.1f} MB, "
+          f"640px variants: {summary['best_640w_bytes'] / mb:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
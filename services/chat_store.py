@@ -0,0 +1,525 @@
+"""
+Data-access layer for agentic_chatbot.db.
+
+Covers the ``conversations``, ``user_preferences`` and ``workflow_history``
+tables. Every thread gets its own pooled SQLite connection (WAL mode, cached
+prepared statements). Writes that callers should never wait on, such as chat
+turns, go through a background writer that group-commits them in batches, so
+a request only pays for a queue put, never for an fsync.
+
+Conversation text is also indexed in an FTS5 table kept in sync by triggers,
+so history search never scans ``conversations``.
+
+The database file is not tracked: :meth:`ChatStore.ensure_schema` creates (or
+migrates) every table, index and trigger on first use, at ``CHATBOT_DB_PATH``.
+"""
+
+import atexit
+import base64
+import html
+import json
+import logging
+import math
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.environ.get(
+    'CHATBOT_DB_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'agentic_chatbot.db'))
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        message TEXT NOT NULL,
+        response TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        context TEXT,
+        metadata TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS user_preferences (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT UNIQUE NOT NULL,
+        preferences TEXT NOT NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS workflow_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        workflow_type TEXT NOT NULL,
+        steps_completed INTEGER,
+        status TEXT,
+        metadata TEXT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+# Columns added after the original schema: table -> [(column, definition)]
+MIGRATIONS = {
+    'workflow_history': [('duration_ms', 'REAL')],
+}
+
+INDEXES = [
+    # History pages are keyset-paginated on id within a user or session
+    "CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations (user_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations (session_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_workflow_history_session ON workflow_history (session_id, timestamp)",
+    # Covering indexes: bucketed workflow aggregations never touch the table itself
+    "DROP INDEX IF EXISTS idx_workflow_history_timestamp",
+    "CREATE INDEX IF NOT EXISTS idx_workflow_history_time_cover "
+    "ON workflow_history (timestamp, workflow_type, status, duration_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_workflow_history_type_cover "
+    "ON workflow_history (workflow_type, timestamp, status, duration_ms)",
+]
+
+INSERT_CONVERSATION = (
+    "INSERT INTO conversations (session_id, user_id, message, response, timestamp, context, metadata) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)")
+INSERT_WORKFLOW = (
+    "INSERT INTO workflow_history "
+    "(session_id, workflow_type, steps_completed, status, metadata, duration_ms, timestamp) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)")
+UPSERT_PREFERENCES = (
+    "INSERT INTO user_preferences (user_id, preferences, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET preferences = excluded.preferences, updated_at = excluded.updated_at")
+SELECT_PREFERENCES = "SELECT preferences, updated_at FROM user_preferences WHERE user_id = ?"
+# snippet() marks matches with private-use sentinels; the text is HTML-escaped
+# before they become <mark> tags, so stored markup is never returned live
+MARK_START, MARK_END = '\ue000', '\ue001'
+CONVERSATION_COLUMNS = "id, session_id, user_id, message, response, timestamp, context, metadata"
+
+# External-content FTS5 index over conversations; triggers keep it in sync with
+# every write path (including the batch writer) without storing the text twice.
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS conversations_fts USING fts5(
+        message, response,
+        content='conversations', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_insert AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversations_fts (rowid, message, response) VALUES (new.id, new.message, new.response);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_delete AFTER DELETE ON conversations BEGIN
+        INSERT INTO conversations_fts (conversations_fts, rowid, message, response)
+        VALUES ('delete', old.id, old.message, old.response);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_update AFTER UPDATE OF message, response ON conversations BEGIN
+        INSERT INTO conversations_fts (conversations_fts, rowid, message, response)
+        VALUES ('delete', old.id, old.message, old.response);
+        INSERT INTO conversations_fts (rowid, message, response) VALUES (new.id, new.message, new.response);
+    END""",
+    # Matches in the user's message count twice as much as matches in the reply
+    "INSERT INTO conversations_fts (conversations_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')",
+]
+
+
+def sqlite_timestamp(moment: Optional[datetime] = None) -> str:
+    """Format like SQLite's CURRENT_TIMESTAMP (UTC, second precision)"""
+    return (moment or datetime.utcnow()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def fts_query(text: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: all terms required, last one as a prefix"""
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlight_snippet(snippet: Optional[str]) -> Optional[str]:
+    """HTML-safe snippet: the text is escaped, then the match sentinels become ``<mark>``"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _encode_cursor(rank: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([rank, row_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Inverse of :func:`_encode_cursor`; raises ValueError for anything it did not produce"""
+    try:
+        rank, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if isinstance(row_id, bool) or not isinstance(row_id, int) or isinstance(rank, bool):
+            raise ValueError
+        rank = float(rank)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError(f'Invalid cursor: {cursor!r}') from None
+    if not math.isfinite(rank):
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+    return rank, row_id
+
+
+def _dumps(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def _loads(value: Optional[str]) -> Any:
+    if value is None:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+class ConnectionPool:
+    """One SQLite connection per thread, configured for concurrent readers"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, cached_statements: int = 256):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False,
+                                   cached_statements=self.cached_statements)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL + NORMAL only fsyncs at checkpoints; commits stay durable across app crashes
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._all.clear()
+        self._local = threading.local()
+
+
+class BatchWriter:
+    """Background thread that group-commits queued statements.
+
+    ``submit`` never blocks: statements are queued and a single writer thread
+    commits whatever has accumulated (up to ``max_batch`` statements, waiting at
+    most ``max_delay`` seconds for a batch to fill) in one transaction. When the
+    queue is full the statement is dropped and counted rather than stalling the
+    caller.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_batch: int = 500,
+                 max_delay: float = 0.05, max_queue: int = 50000):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: 'queue.Queue[Tuple]' = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self.batches = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name='chat-store-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, params: Tuple) -> bool:
+        try:
+            self._queue.put_nowait((sql, params, None))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything submitted so far is committed"""
+        done = threading.Event()
+        try:
+            self._queue.put((None, None, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict:
+        return {
+            'pending': self.pending,
+            'batches': self.batches,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch: List[Tuple]):
+        # Group consecutive identical statements so each runs as one executemany
+        groups: List[Tuple[str, List[Tuple]]] = []
+        waiters = []
+        for sql, params, done in batch:
+            if done is not None:
+                waiters.append(done)
+                continue
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+
+        if groups:
+            count = sum(len(rows) for _, rows in groups)
+            try:
+                conn = self.pool.connection()
+                with conn:
+                    for sql, rows in groups:
+                        conn.executemany(sql, rows)
+                self.batches += 1
+                self.written += count
+            except sqlite3.Error as e:
+                self.failed += count
+                logger.error(f"Batch write of {count} statements failed: {str(e)}")
+        for done in waiters:
+            done.set()
+
+
+class ChatStore:
+    """Queries and buffered writes for the agentic chatbot tables"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, writer_options: Optional[Dict] = None):
+        self.pool = ConnectionPool(db_path)
+        self.ensure_schema()
+        self.writer = BatchWriter(self.pool, **(writer_options or {}))
+
+    def ensure_schema(self):
+        conn = self.pool.connection()
+        with conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+            for table, columns in MIGRATIONS.items():
+                existing = {row['name'] for row in conn.execute(f"PRAGMA table_info({table})")}
+                for column, definition in columns:
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            for statement in INDEXES:
+                conn.execute(statement)
+            fts_exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'conversations_fts'").fetchone()
+            for statement in FTS_SCHEMA:
+                conn.execute(statement)
+            if not fts_exists:
+                # Index rows written before the FTS table existed
+                conn.execute("INSERT INTO conversations_fts (conversations_fts) VALUES ('rebuild')")
+
+    def close(self):
+        self.writer.close()
+        self.pool.close_all()
+
+    # Conversations -----------------------------------------------------
+
+    def record_turn(self, session_id: str, user_id: str, message: str, response: str,
+                    context: Any = None, metadata: Any = None) -> bool:
+        """Queue a chat turn for the next group commit (never blocks)"""
+        return self.writer.submit(INSERT_CONVERSATION, (
+            session_id, user_id, message, response, sqlite_timestamp(),
+            _dumps(context), _dumps(metadata)))
+
+    def history(self, user_id: Optional[str] = None, session_id: Optional[str] = None,
+                limit: int = 50, before_id: Optional[int] = None) -> Dict:
+        """Newest-first page of turns; pass ``next_cursor`` back as ``before_id``"""
+        limit = max(1, min(int(limit), 200))
+        clauses, params = [], []
+        if user_id:
+            clauses.append('user_id = ?')
+            params.append(user_id)
+        if session_id:
+            clauses.append('session_id = ?')
+            params.append(session_id)
+        if before_id:
+            clauses.append('id < ?')
+            params.append(int(before_id))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self.pool.connection().execute(
+            f"SELECT {CONVERSATION_COLUMNS} FROM conversations {where} ORDER BY id DESC LIMIT ?",
+            (*params, limit + 1)).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'messages': [self._conversation_row(row) for row in rows],
+            'next_cursor': rows[-1]['id'] if has_more else None
+        }
+
+    def search(self, query: str, user_id: Optional[str] = None, session_id: Optional[str] = None,
+               limit: int = 20, cursor: Optional[str] = None) -> Dict:
+        """Ranked full-text search over messages and responses.
+
+        Results are ordered best match first (bm25, then id); ``next_cursor``
+        resumes after the last result of the page. Snippets are HTML-escaped
+        text with the matches wrapped in ``<mark>``.
+        """
+        limit = max(1, min(int(limit), 100))
+        match = fts_query(query)
+        if match is None:
+            return {'results': [], 'next_cursor': None}
+
+        clauses, params = ['conversations_fts MATCH ?'], [match]
+        if user_id:
+            clauses.append('c.user_id = ?')
+            params.append(user_id)
+        if session_id:
+            clauses.append('c.session_id = ?')
+            params.append(session_id)
+        if cursor:
+            rank, row_id = _decode_cursor(cursor)
+            clauses.append('(conversations_fts.rank > ? OR (conversations_fts.rank = ? AND c.id > ?))')
+            params.extend([rank, rank, row_id])
+
+        rows = self.pool.connection().execute(
+            f"""SELECT c.id, c.session_id, c.user_id, c.timestamp,
+                       conversations_fts.rank AS rank,
+                       snippet(conversations_fts, 0, ?, ?, '…', 12) AS message_snippet,
+                       snippet(conversations_fts, 1, ?, ?, '…', 12) AS response_snippet
+                FROM conversations_fts
+                JOIN conversations c ON c.id = conversations_fts.rowid
+                WHERE {' AND '.join(clauses)}
+                ORDER BY conversations_fts.rank, c.id
+                LIMIT ?""",
+            (MARK_START, MARK_END, MARK_START, MARK_END, *params, limit + 1)).fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'results': [{**dict(row),
+                         'message_snippet': highlight_snippet(row['message_snippet']),
+                         'response_snippet': highlight_snippet(row['response_snippet']),
+                         'score': -row['rank']} for row in rows],
+            'next_cursor': _encode_cursor(rows[-1]['rank'], rows[-1]['id']) if has_more else None
+        }
+
+    @staticmethod
+    def _conversation_row(row: sqlite3.Row) -> Dict:
+        item = dict(row)
+        item['context'] = _loads(item['context'])
+        item['metadata'] = _loads(item['metadata'])
+        return item
+
+    # Workflow history --------------------------------------------------
+
+    def record_workflow(self, session_id: str, workflow_type: str, status: str,
+                        steps_completed: Optional[int] = None, metadata: Any = None,
+                        duration_ms: Optional[float] = None) -> bool:
+        """Queue a workflow_history event for the next group commit"""
+        return self.writer.submit(INSERT_WORKFLOW, (
+            session_id, workflow_type, steps_completed, status, _dumps(metadata),
+            duration_ms, sqlite_timestamp()))
+
+    def workflow_stats(self, start: datetime, end: datetime, interval: int = 3600,
+                       workflow_type: Optional[str] = None) -> List[Dict]:
+        """Per-interval counts, failure rates and durations for workflow events.
+
+        Answered from the covering indexes: a range scan over [start, end)
+        grouped into ``interval``-second buckets.
+        """
+        interval = max(60, int(interval))
+        clauses, params = ['timestamp >= ?', 'timestamp < ?'], [sqlite_timestamp(start), sqlite_timestamp(end)]
+        if workflow_type:
+            clauses.append('workflow_type = ?')
+            params.append(workflow_type)
+        rows = self.pool.connection().execute(
+            f"""SELECT CAST(strftime('%s', timestamp) AS INTEGER) / ? * ? AS bucket,
+                       workflow_type,
+                       COUNT(*) AS total,
+                       SUM(status IN ('error', 'failed', 'failure')) AS failures,
+                       AVG(duration_ms) AS avg_duration_ms,
+                       MAX(duration_ms) AS max_duration_ms
+                FROM workflow_history
+                WHERE {' AND '.join(clauses)}
+                GROUP BY bucket, workflow_type
+                ORDER BY bucket, workflow_type""",
+            (interval, interval, *params)).fetchall()
+        return [{
+            **dict(row),
+            'failure_rate': round(row['failures'] / row['total'], 4) if row['total'] else 0.0
+        } for row in rows]
+
+    # User preferences --------------------------------------------------
+
+    def get_preferences(self, user_id: str) -> Optional[Dict]:
+        row = self.pool.connection().execute(SELECT_PREFERENCES, (user_id,)).fetchone()
+        if row is None:
+            return None
+        return {'preferences': _loads(row['preferences']), 'updated_at': row['updated_at']}
+
+    def save_preferences(self, user_id: str, preferences: Dict):
+        """Synchronously upsert a user's preferences"""
+        conn = self.pool.connection()
+        with conn:
+            conn.execute(UPSERT_PREFERENCES, (user_id, _dumps(preferences), sqlite_timestamp()))
+
+    def save_preferences_many(self, items: Dict[str, Dict]):
+        """Upsert several users' preferences in a single transaction"""
+        if not items:
+            return
+        now = sqlite_timestamp()
+        conn = self.pool.connection()
+        with conn:
+            conn.executemany(UPSERT_PREFERENCES,
+                             [(user_id, _dumps(prefs), now) for user_id, prefs in items.items()])
+
+    def stats(self) -> Dict:
+        return {'db_path': self.pool.db_path, 'writer': self.writer.stats()}
+
+
+_default_store: Optional[ChatStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_store(db_path: str = DEFAULT_DB_PATH) -> ChatStore:
+    """Process-wide ChatStore for the default database (flushed at exit)"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ChatStore(db_path)
+            atexit.register(_default_store.close)
+        return _default_store
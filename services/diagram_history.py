@@ -0,0 +1,275 @@
+"""
+Versioned PlantUML source store for the workflow diagrams.
+
+Every write of ``plantuml_<type>.puml`` goes through :func:`atomic_write`
+(temp file + fsync + rename, then fsync of the directory), so a crash leaves
+either the old or the new source on disk, never a truncated one. Each change
+is also recorded as a revision in ``<diagrams>/.history/revisions.db``:
+
+- revisions store a line delta against the previous revision, with a full
+  snapshot every ``keyframe_interval`` revisions to bound reconstruction
+- every payload is zlib-compressed
+- every revision records the SHA-256 of its source, so render caches can key
+  off ``(type, hash)`` without re-reading or re-hashing the file
+
+Rolling back writes the old source as a new revision; history is append-only.
+"""
+
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DIAGRAM_TYPE_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS diagram_revisions (
+        diagram_type TEXT NOT NULL,
+        revision INTEGER NOT NULL,
+        hash TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        data BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        message TEXT,
+        created_at TEXT NOT NULL,
+        -- UNIQUE(diagram_type, revision): two writers can never share a number
+        PRIMARY KEY (diagram_type, revision)
+    )""",
+]
+
+
+def source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def atomic_write(path: str, data: bytes):
+    """Replace ``path`` with ``data`` so readers see the old or new file, never a mix"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{os.path.basename(path)}.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    # Make the rename itself durable
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def make_delta(base: List[str], target: List[str]) -> List:
+    """Line delta: ``[i1, i2]`` copies base[i1:i2], a list of strings inserts lines"""
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base, target, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append({'+': target[j1:j2]})
+    return ops
+
+
+def apply_delta(base: List[str], ops: List) -> List[str]:
+    lines = []
+    for op in ops:
+        if isinstance(op, dict):
+            lines.extend(op['+'])
+        else:
+            lines.extend(base[op[0]:op[1]])
+    return lines
+
+
+class DiagramSourceStore:
+    """Atomic, versioned storage for ``plantuml_<type>.puml`` sources"""
+
+    def __init__(self, diagrams_path: str, keyframe_interval: int = 10):
+        self.diagrams_path = diagrams_path
+        self.keyframe_interval = keyframe_interval
+        self.db_path = os.path.join(diagrams_path, '.history', 'revisions.db')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    def source_path(self, diagram_type: str) -> str:
+        if not DIAGRAM_TYPE_PATTERN.match(diagram_type or ''):
+            raise ValueError(f'Invalid diagram type: {diagram_type!r}')
+        return os.path.join(self.diagrams_path, f'plantuml_{diagram_type}.puml')
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # Reads -------------------------------------------------------------
+
+    def read(self, diagram_type: str) -> Optional[str]:
+        path = self.source_path(diagram_type)
+        if not os.path.exists(path):
+            return None
+        # newline='' keeps CRLF as written, so the hash matches the recorded revision
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def latest(self, diagram_type: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT revision, hash, kind, size, length(data) AS stored, message, created_at "
+                "FROM diagram_revisions WHERE diagram_type = ? ORDER BY revision DESC LIMIT 1",
+                (diagram_type,)).fetchone()
+        return self._revision_row(row) if row else None
+
+    def history(self, diagram_type: str, limit: int = 50) -> List[Dict]:
+        self.source_path(diagram_type)
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT revision, hash, kind, size, length(data) AS stored, message, created_at "
+                "FROM diagram_revisions WHERE diagram_type = ? ORDER BY revision DESC LIMIT ?",
+                (diagram_type, max(1, min(limit, 1000)))).fetchall()
+        return [self._revision_row(row) for row in rows]
+
+    def get_revision(self, diagram_type: str, revision: int) -> Optional[Dict]:
+        """Metadata plus the reconstructed source of one revision"""
+        self.source_path(diagram_type)
+        with self._lock:
+            conn = self._connection()
+            keyframe = conn.execute(
+                "SELECT MAX(revision) FROM diagram_revisions "
+                "WHERE diagram_type = ? AND revision <= ? AND kind = 'full'",
+                (diagram_type, revision)).fetchone()[0]
+            if keyframe is None:
+                return None
+            rows = conn.execute(
+                "SELECT revision, hash, kind, data, size, length(data) AS stored, message, created_at "
+                "FROM diagram_revisions WHERE diagram_type = ? AND revision BETWEEN ? AND ? "
+                "ORDER BY revision", (diagram_type, keyframe, revision)).fetchall()
+        if not rows or rows[-1]['revision'] != revision:
+            return None
+        lines: List[str] = []
+        for row in rows:
+            payload = json.loads(zlib.decompress(row['data']).decode('utf-8'))
+            lines = payload if row['kind'] == 'full' else apply_delta(lines, payload)
+        source = ''.join(lines)
+        if source_hash(source) != rows[-1]['hash']:
+            raise ValueError(f'Revision {revision} of {diagram_type} is corrupt (hash mismatch)')
+        return dict(self._revision_row(rows[-1]), source=source)
+
+    @staticmethod
+    def _revision_row(row: sqlite3.Row) -> Dict:
+        return {
+            'revision': row['revision'],
+            'hash': row['hash'],
+            'kind': row['kind'],
+            'size': row['size'],
+            'stored_bytes': row['stored'],
+            'message': row['message'],
+            'created_at': row['created_at']
+        }
+
+    # Writes ------------------------------------------------------------
+
+    def write(self, diagram_type: str, source: str, message: Optional[str] = None) -> Dict:
+        """Atomically replace the source and record it as a new revision.
+
+        Writing the current content again records nothing and returns the
+        latest revision. A file changed outside the store (or never tracked)
+        is first recorded as its own revision so history stays complete.
+        """
+        path = self.source_path(diagram_type)
+        with self._lock:
+            latest = self.latest(diagram_type)
+            on_disk = self.read(diagram_type)
+            if on_disk is not None and (latest is None or source_hash(on_disk) != latest['hash']):
+                latest = self._record(diagram_type, on_disk,
+                                      'imported' if latest is None else 'changed outside the editor')
+            new_hash = source_hash(source)
+            if latest is not None and latest['hash'] == new_hash and on_disk is not None:
+                return dict(latest, changed=False)
+            atomic_write(path, source.encode('utf-8'))
+            revision = self._record(diagram_type, source, message)
+        logger.info(f"Saved {diagram_type} revision {revision['revision']} ({revision['hash'][:12]})")
+        return dict(revision, changed=True)
+
+    def rollback(self, diagram_type: str, revision: int) -> Optional[Dict]:
+        target = self.get_revision(diagram_type, revision)
+        if target is None:
+            return None
+        return self.write(diagram_type, target['source'], message=f'rollback to revision {revision}')
+
+    def _record(self, diagram_type: str, source: str, message: Optional[str]) -> Dict:
+        """Store ``source`` as the next revision.
+
+        The number is allocated inside ``BEGIN IMMEDIATE``, so another process
+        writing the same history cannot take it between the read and the insert.
+        """
+        lines = source.splitlines(keepends=True)
+        created_at = datetime.now().isoformat()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            latest = self.latest(diagram_type)
+            number = (latest['revision'] if latest else 0) + 1
+            kind, payload = 'full', lines
+            if latest is not None and (number - 1) % self.keyframe_interval != 0:
+                base = self.get_revision(diagram_type, latest['revision'])
+                if base is not None:
+                    kind, payload = 'delta', make_delta(base['source'].splitlines(keepends=True), lines)
+            data = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 9)
+            conn.execute(
+                "INSERT INTO diagram_revisions "
+                "(diagram_type, revision, hash, kind, data, size, message, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (diagram_type, number, source_hash(source), kind, data,
+                 len(source.encode('utf-8')), message, created_at))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return {
+            'revision': number,
+            'hash': source_hash(source),
+            'kind': kind,
+            'size': len(source.encode('utf-8')),
+            'stored_bytes': len(data),
+            'message': message,
+            'created_at': created_at
+        }
@@ -0,0 +1,349 @@
+"""
+Symbol index over the workflow diagram sources.
+
+Every catalog source (``plantuml_<type>.puml``) and AI-generated source
+(``custom/*.puml``) is reduced to its symbols - participants, classes,
+components, nodes, arrows (``A -> B``), actions (message labels and activity
+steps) and titles - which are stored in an inverted index
+(``<diagrams>/.index/symbols.db``, table ``diagram_terms``: term -> symbol ->
+diagram). Sources are indexed when they are saved; :meth:`refresh` picks up
+files changed outside the API by comparing size and mtime, so only changed
+files are re-read.
+
+Queries are whitespace-separated terms that must all match:
+
+- ``database`` - a word of a symbol name
+- ``auth*`` - any word starting with ``auth``
+- ``component:Database`` / ``action:authenticate*`` - restricted to one kind
+
+Term lookups are index range scans, so searches stay in the millisecond
+range across tens of thousands of diagrams.
+"""
+
+import glob
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SYMBOL_KINDS = ('participant', 'class', 'component', 'node', 'arrow', 'action', 'title')
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS diagram_documents (
+        doc_id TEXT PRIMARY KEY,
+        scope TEXT NOT NULL,
+        name TEXT NOT NULL,
+        path TEXT NOT NULL,
+        title TEXT,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        indexed_at REAL NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS diagram_symbols (
+        symbol_id INTEGER PRIMARY KEY,
+        doc_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS diagram_terms (
+        term TEXT NOT NULL,
+        symbol_id INTEGER NOT NULL,
+        PRIMARY KEY (term, symbol_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_diagram_symbols_doc ON diagram_symbols (doc_id)",
+]
+
+QUOTED_OR_NAME = r'(?:"([^"]+)"|([^\s{"]+))'
+ALIAS = r'(?:\s+as\s+"?([^\s"{]+)"?)?'
+DECLARATIONS = [
+    ('participant', re.compile(rf'^(?:participant|actor|boundary|control|entity|database|collections|queue)\s+'
+                               rf'{QUOTED_OR_NAME}{ALIAS}', re.IGNORECASE)),
+    ('class', re.compile(rf'^(?:abstract\s+class|abstract|class|interface|enum|annotation)\s+'
+                         rf'{QUOTED_OR_NAME}{ALIAS}', re.IGNORECASE)),
+    ('component', re.compile(rf'^component\s+{QUOTED_OR_NAME}{ALIAS}', re.IGNORECASE)),
+    ('node', re.compile(rf'^(?:node|cloud|frame|package|rectangle|folder|artifact|storage|card)\s+'
+                        rf'{QUOTED_OR_NAME}{ALIAS}', re.IGNORECASE)),
+]
+BRACKET_COMPONENT = re.compile(r'^\[([^\]]+)\]')
+ARROW = re.compile(r'^(\[[^\]]+\]|"[^"]+"|[\w.]+)\s*([<o*x#}|]*[-.]+(?:\[[^\]]*\])?[-.]*[>o*x#{|]*)\s*'
+                   r'(\[[^\]]+\]|"[^"]+"|[\w.]+)\s*(?::\s*(.+))?$')
+ACTIVITY = re.compile(r'^:(.+?);?$')
+TITLE = re.compile(r'^title\s+(.+)$', re.IGNORECASE)
+WORD = re.compile(r'[a-z0-9]+')
+CAMEL = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+
+
+def _clean(name: str) -> str:
+    return name.strip().strip('[]"').strip()
+
+
+def extract_symbols(source: str) -> Tuple[Optional[str], Set[Tuple[str, str]]]:
+    """``(title, {(kind, name), ...})`` found in a PlantUML source"""
+    symbols: Set[Tuple[str, str]] = set()
+    aliases: Dict[str, str] = {}
+    title = None
+    for raw in source.replace('\r\n', '\n').split('\n'):
+        line = raw.strip()
+        if not line or line.startswith(("'", '@', '!', 'skinparam')):
+            continue
+        match = TITLE.match(line)
+        if match:
+            title = title or match.group(1).strip()
+            symbols.add(('title', match.group(1).strip()))
+            continue
+        declared = False
+        for kind, pattern in DECLARATIONS:
+            match = pattern.match(line)
+            if match:
+                name = _clean(match.group(1) or match.group(2))
+                symbols.add((kind, name))
+                if match.group(3):
+                    aliases[match.group(3)] = name
+                declared = True
+                break
+        if declared:
+            continue
+        match = BRACKET_COMPONENT.match(line)
+        if match and not ARROW.match(line):
+            symbols.add(('component', _clean(match.group(1))))
+            continue
+        match = ARROW.match(line)
+        if match:
+            left, right = (aliases.get(_clean(side), _clean(side)) for side in (match.group(1), match.group(3)))
+            symbols.add(('arrow', f'{left} -> {right}'))
+            if match.group(4):
+                symbols.add(('action', match.group(4).strip()))
+            continue
+        match = ACTIVITY.match(line)
+        if match:
+            symbols.add(('action', match.group(1).strip()))
+    return title, symbols
+
+
+def name_terms(name: str) -> Set[str]:
+    """Lower-cased words of a symbol name, camelCase split, plus the whole name"""
+    words = set(WORD.findall(CAMEL.sub(' ', name).lower())) | set(WORD.findall(name.lower()))
+    whole = ' '.join(name.lower().split())
+    if whole:
+        words.add(whole)
+    return words
+
+
+class DiagramSymbolIndex:
+    """Persistent, incrementally maintained inverted index of diagram symbols"""
+
+    def __init__(self, diagrams_path: str, refresh_interval: float = 30.0):
+        self.diagrams_path = diagrams_path
+        self.custom_path = os.path.join(diagrams_path, 'custom')
+        self.refresh_interval = refresh_interval
+        self.db_path = os.path.join(diagrams_path, '.index', 'symbols.db')
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._refreshed_at = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # Documents ---------------------------------------------------------
+
+    def document_for(self, path: str) -> Optional[Tuple[str, str, str]]:
+        """``(doc_id, scope, name)`` of a source path, None if it is not indexed"""
+        filename = os.path.basename(path)
+        if not filename.endswith('.puml'):
+            return None
+        directory = os.path.abspath(os.path.dirname(path))
+        if directory == os.path.abspath(self.custom_path):
+            name = filename[:-5].replace('ai_generated_', '', 1)
+            return f'custom:{name}', 'custom', name
+        if directory == os.path.abspath(self.diagrams_path) and filename.startswith('plantuml_'):
+            name = filename[len('plantuml_'):-5]
+            return f'catalog:{name}', 'catalog', name
+        return None
+
+    def _source_files(self) -> List[str]:
+        return (glob.glob(os.path.join(self.diagrams_path, 'plantuml_*.puml')) +
+                glob.glob(os.path.join(self.custom_path, '*.puml')))
+
+    def index_file(self, path: str, source: Optional[str] = None) -> bool:
+        """(Re)index one source file; call after every save"""
+        document = self.document_for(path)
+        if document is None:
+            return False
+        try:
+            stat = os.stat(path)
+            if source is None:
+                with open(path, 'r', encoding='utf-8') as f:
+                    source = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warning(f"Could not index {path}: {str(e)}")
+            return False
+        doc_id, scope, name = document
+        title, symbols = extract_symbols(source)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._delete(conn, doc_id)
+                conn.execute(
+                    "INSERT INTO diagram_documents (doc_id, scope, name, path, title, size, mtime_ns, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (doc_id, scope, name, os.path.abspath(path), title, stat.st_size, stat.st_mtime_ns, time.time()))
+                for kind, symbol in sorted(symbols):
+                    symbol_id = conn.execute(
+                        "INSERT INTO diagram_symbols (doc_id, kind, name) VALUES (?, ?, ?)",
+                        (doc_id, kind, symbol)).lastrowid
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO diagram_terms (term, symbol_id) VALUES (?, ?)",
+                        [(term, symbol_id) for term in name_terms(symbol)])
+        return True
+
+    def remove_file(self, path: str):
+        document = self.document_for(path)
+        if document is None:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._delete(conn, document[0])
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, doc_id: str):
+        conn.execute("DELETE FROM diagram_terms WHERE symbol_id IN "
+                     "(SELECT symbol_id FROM diagram_symbols WHERE doc_id = ?)", (doc_id,))
+        conn.execute("DELETE FROM diagram_symbols WHERE doc_id = ?", (doc_id,))
+        conn.execute("DELETE FROM diagram_documents WHERE doc_id = ?", (doc_id,))
+
+    def refresh(self, force: bool = False) -> Dict:
+        """Index new/changed files and drop deleted ones (size + mtime comparison)"""
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return {'indexed': 0, 'removed': 0, 'skipped': True}
+        with self._lock:
+            known = {row['path']: (row['size'], row['mtime_ns']) for row in self._connection().execute(
+                "SELECT path, size, mtime_ns FROM diagram_documents")}
+            indexed = 0
+            seen = set()
+            for path in self._source_files():
+                path = os.path.abspath(path)
+                seen.add(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if known.get(path) != (stat.st_size, stat.st_mtime_ns):
+                    indexed += self.index_file(path)
+            removed = [path for path in known if path not in seen]
+            for path in removed:
+                self.remove_file(path)
+            self._refreshed_at = time.monotonic()
+        if indexed or removed:
+            logger.info(f"Symbol index: {indexed} diagrams indexed, {len(removed)} removed")
+        return {'indexed': indexed, 'removed': len(removed), 'skipped': False}
+
+    # Queries -----------------------------------------------------------
+
+    @staticmethod
+    def parse_query(query: str) -> List[Tuple[Optional[str], str, bool]]:
+        """``[(kind, term, is_prefix), ...]``; raises ValueError on an unknown kind"""
+        parsed = []
+        for token in query.split():
+            kind = None
+            if ':' in token:
+                kind, token = token.split(':', 1)
+                kind = kind.lower()
+                if kind not in SYMBOL_KINDS:
+                    raise ValueError(f"Unknown symbol kind '{kind}' (use {', '.join(SYMBOL_KINDS)})")
+            prefix = token.endswith('*')
+            term = token.rstrip('*').lower()
+            if term:
+                # Query words are split the way names are; '*' applies to the last one
+                words = WORD.findall(term)
+                parsed.extend((kind, word, prefix and index == len(words) - 1)
+                              for index, word in enumerate(words))
+        return parsed
+
+    def search(self, query: str, kind: Optional[str] = None, scope: Optional[str] = None,
+               limit: int = 50) -> List[Dict]:
+        terms = self.parse_query(query)
+        if kind is not None and kind not in SYMBOL_KINDS:
+            raise ValueError(f"Unknown symbol kind '{kind}'")
+        if not terms:
+            return []
+        self.refresh()
+        with self._lock:
+            conn = self._connection()
+            matched_docs: Optional[Set[str]] = None
+            matched_symbols: Dict[str, Set[int]] = {}
+            for term_kind, term, prefix in terms:
+                clauses, params = [], []
+                if prefix:
+                    clauses.append("t.term >= ? AND t.term < ?")
+                    params += [term, term + '\uffff']
+                else:
+                    clauses.append("t.term = ?")
+                    params.append(term)
+                if term_kind or kind:
+                    clauses.append("s.kind = ?")
+                    params.append(term_kind or kind)
+                if scope:
+                    clauses.append("s.doc_id LIKE ?")
+                    params.append(f'{scope}:%')
+                rows = conn.execute(
+                    "SELECT s.doc_id, s.symbol_id FROM diagram_terms t "
+                    "JOIN diagram_symbols s ON s.symbol_id = t.symbol_id WHERE " + ' AND '.join(clauses),
+                    params).fetchall()
+                docs = {row['doc_id'] for row in rows}
+                matched_docs = docs if matched_docs is None else matched_docs & docs
+                for row in rows:
+                    matched_symbols.setdefault(row['doc_id'], set()).add(row['symbol_id'])
+                if not matched_docs:
+                    return []
+            ranked = sorted(matched_docs, key=lambda doc_id: (-len(matched_symbols[doc_id]), doc_id))[:limit]
+            results = []
+            for doc_id in ranked:
+                document = conn.execute(
+                    "SELECT doc_id, scope, name, title FROM diagram_documents WHERE doc_id = ?",
+                    (doc_id,)).fetchone()
+                symbol_ids = sorted(matched_symbols[doc_id])
+                placeholders = ','.join('?' * len(symbol_ids))
+                symbols = conn.execute(
+                    f"SELECT kind, name FROM diagram_symbols WHERE symbol_id IN ({placeholders}) "
+                    f"ORDER BY kind, name", symbol_ids).fetchall()
+                results.append({
+                    'id': document['doc_id'],
+                    'scope': document['scope'],
+                    'name': document['name'],
+                    'title': document['title'],
+                    'matches': [{'kind': row['kind'], 'name': row['name']} for row in symbols]
+                })
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connection()
+            return {
+                'documents': conn.execute("SELECT COUNT(*) FROM diagram_documents").fetchone()[0],
+                'symbols': conn.execute("SELECT COUNT(*) FROM diagram_symbols").fetchone()[0],
+                'terms': conn.execute("SELECT COUNT(*) FROM diagram_terms").fetchone()[0]
+            }
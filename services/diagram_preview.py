@@ -0,0 +1,232 @@
+"""
+Live preview of draft diagram sources over the portal's SocketIO instance.
+
+The editor emits ``diagram_preview`` with ``{source, revision, format}`` as the
+user types. Per connection, drafts are debounced (only the last draft of a
+burst is rendered), a render for a revision that has been superseded is
+cancelled - queued jobs are skipped and a running PlantUML process is killed -
+and only the newest result is pushed back as ``diagram_preview_result`` (or
+``diagram_preview_error``).
+
+Drafts never touch the catalog: simple diagrams are drawn by
+``services.fast_diagrams``, everything else is piped through ``plantuml
+-pipe`` (stdin to stdout), and results are looked up in / added to the
+canonical-hash render cache so saving an identical source later is free.
+"""
+
+import base64
+import logging
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import Blueprint, jsonify, request
+
+from services import fast_diagrams
+from services.plantuml_canonical import cache_key
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PREVIEW_FORMATS = ('svg', 'png')
+
+
+class PreviewCancelled(Exception):
+    """The render was superseded by a newer draft"""
+
+
+class _Session:
+    """Preview state of one connection"""
+
+    def __init__(self):
+        self.revision = -1
+        self.draft: Optional[Dict] = None
+        self.timer: Optional[threading.Timer] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.lock = threading.Lock()
+
+
+class PreviewService:
+    def __init__(self, generator, emit, debounce: float = 0.3, workers: int = 2,
+                 timeout: float = 20.0, max_source_bytes: int = 200 * 1024):
+        self.generator = generator
+        self.emit = emit
+        self.debounce = debounce
+        self.timeout = timeout
+        self.max_source_bytes = max_source_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='diagram-preview')
+        self._sessions: Dict[str, _Session] = {}
+        self._lock = threading.Lock()
+        self._stats = {'drafts': 0, 'rendered': 0, 'pushed': 0, 'skipped': 0, 'killed': 0,
+                       'cache_hits': 0, 'native': 0, 'errors': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def submit(self, sid: str, source: str, revision: int, output_format: str = 'svg') -> Dict:
+        """Accept a draft; it is rendered once no newer draft arrives for ``debounce`` seconds"""
+        if output_format not in PREVIEW_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(PREVIEW_FORMATS)}")
+        if len(source.encode('utf-8')) > self.max_source_bytes:
+            raise ValueError(f'Draft larger than {self.max_source_bytes} bytes')
+        with self._lock:
+            session = self._sessions.setdefault(sid, _Session())
+        self._count('drafts')
+        with session.lock:
+            if revision <= session.revision:
+                return {'status': 'stale', 'revision': session.revision}
+            session.revision = revision
+            session.draft = {'source': source, 'revision': revision, 'format': output_format}
+            if session.timer is not None:
+                session.timer.cancel()
+            session.timer = threading.Timer(self.debounce, self._dispatch, (sid, session))
+            session.timer.daemon = True
+            session.timer.start()
+        return {'status': 'queued', 'revision': revision}
+
+    def close(self, sid: str):
+        """Forget a connection, cancelling its pending and running renders"""
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+        if session is None:
+            return
+        with session.lock:
+            session.revision = float('inf')
+            if session.timer is not None:
+                session.timer.cancel()
+            self._kill(session)
+
+    def _kill(self, session: _Session):
+        if session.process is not None and session.process.poll() is None:
+            session.process.kill()
+            self._count('killed')
+
+    def _dispatch(self, sid: str, session: _Session):
+        with session.lock:
+            draft, session.draft = session.draft, None
+            if draft is None:
+                return
+            # A newer draft replaces whatever is still rendering
+            self._kill(session)
+        self._executor.submit(self._render, sid, session, draft)
+
+    def _current(self, session: _Session, revision: int) -> bool:
+        with session.lock:
+            return session.revision == revision
+
+    def _render(self, sid: str, session: _Session, draft: Dict):
+        revision, output_format, source = draft['revision'], draft['format'], draft['source']
+        if not self._current(session, revision):
+            self._count('skipped')
+            return
+        started = time.perf_counter()
+        try:
+            key = cache_key(source)
+            data = self.generator.render_cache.get(key, output_format)
+            renderer = 'cache'
+            if data is not None:
+                self._count('cache_hits')
+            else:
+                data = fast_diagrams.render(source, output_format)
+                renderer = 'native'
+                if data is not None:
+                    self._count('native')
+                else:
+                    data = self._plantuml(session, revision, source, output_format)
+                    renderer = 'plantuml'
+                data = self.generator.render_cache.put(key, output_format, data)
+                self._count('rendered')
+        except PreviewCancelled:
+            self._count('skipped')
+            return
+        except Exception as e:
+            self._count('errors')
+            if self._current(session, revision):
+                self.emit('diagram_preview_error', {'revision': revision, 'message': str(e)}, sid)
+            return
+        if not self._current(session, revision):
+            self._count('skipped')
+            return
+        self.emit('diagram_preview_result', {
+            'revision': revision,
+            'format': output_format,
+            'data': base64.b64encode(data).decode('utf-8'),
+            'size': len(data),
+            'renderer': renderer,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        }, sid)
+        self._count('pushed')
+
+    def _plantuml(self, session: _Session, revision: int, source: str, output_format: str) -> bytes:
+        with session.lock:
+            if session.revision != revision:
+                raise PreviewCancelled()
+            # -pipe: stdin to stdout, nothing is written next to the catalog sources
+            process = subprocess.Popen(['plantuml', f'-t{output_format}', '-pipe'],
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE,
+                                       cwd=self.generator.workflow_diagrams_path)
+            session.process = process
+        try:
+            stdout, stderr = process.communicate(source.encode('utf-8'), timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise RuntimeError(f'Preview render took longer than {self.timeout}s')
+        finally:
+            with session.lock:
+                if session.process is process:
+                    session.process = None
+        if not self._current(session, revision):
+            raise PreviewCancelled()
+        if process.returncode != 0 or not stdout:
+            raise RuntimeError(f"PlantUML failed: {stderr.decode('utf-8', 'replace')[:500]}")
+        return stdout
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, sessions=len(self._sessions))
+
+
+preview_bp = Blueprint('diagram_preview', __name__, url_prefix='/api/diagrams/preview')
+preview_service: Optional[PreviewService] = None
+
+
+def init_diagram_preview(app, socketio, connection_tracker, generator) -> PreviewService:
+    """Register the ``diagram_preview`` SocketIO handler"""
+    global preview_service
+
+    preview_service = PreviewService(
+        generator,
+        lambda event, data, sid: connection_tracker.emit_to(socketio, sid, event, data),
+        debounce=app.config.get('DIAGRAM_PREVIEW_DEBOUNCE', 0.3),
+        workers=app.config.get('DIAGRAM_PREVIEW_WORKERS', 2),
+        timeout=app.config.get('DIAGRAM_PREVIEW_TIMEOUT', 20.0),
+        max_source_bytes=app.config.get('DIAGRAM_PREVIEW_MAX_SOURCE_BYTES', 200 * 1024))
+
+    @socketio.on('diagram_preview')
+    def handle_diagram_preview(data=None):
+        data = data or {}
+        source, revision = data.get('source'), data.get('revision')
+        if not isinstance(source, str) or not isinstance(revision, int):
+            return {'status': 'error', 'message': 'source and integer revision are required'}
+        try:
+            return preview_service.submit(request.sid, source, revision, data.get('format', 'svg'))
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}
+
+    connection_tracker.on_disconnect(preview_service.close)
+    return preview_service
+
+
+@preview_bp.route('/stats', methods=['GET'])
+def preview_stats():
+    """Draft, render, cancellation and cache counters"""
+    return jsonify({
+        'status': 'success',
+        'stats': preview_service.stats() if preview_service else None
+    })
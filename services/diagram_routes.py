@@ -0,0 +1,195 @@
+"""
+Diagram endpoints shared by the portal and the standalone diagram API.
+
+Both ``services/diagram_service.py`` (mounted in the portal under
+``/api/diagrams``) and ``workflow_diagrams_api/diagram_server.py`` serve the
+same catalog of ``plantuml_<type>.puml`` sources through a ``DiagramGenerator``
+with a source store, render cache, thumbnails and symbol index. The routes
+that only depend on those are defined once here; each server registers the
+blueprint from :func:`create_diagram_routes` for its own generator:
+
+- ``GET  /thumbnail/<type>`` - gallery derivative of the PNG render
+- ``GET  /search`` - symbol search over catalog and custom diagrams
+- ``GET  /cache/stats`` - render cache and optimiser counters
+- ``GET  /history/<type>`` and ``/history/<type>/<revision>`` - source revisions
+- ``POST /rollback`` - restore an earlier revision
+"""
+
+import base64
+import logging
+import time
+from typing import Optional, Tuple
+
+from flask import Blueprint, jsonify, request
+
+from services.diagram_thumbnails import thumbnail_response
+from services.plantuml_canonical import cache_key
+from services.workflow_events import track_workflow
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def source_key(generator, diagram_type: str) -> Optional[str]:
+    """Render cache key of a catalog diagram's current source"""
+    source = generator.source_store.read(diagram_type)
+    return cache_key(source) if source is not None else None
+
+
+def get_thumbnail(generator, diagram_type: str, width: int) -> Tuple[Optional[bytes], Optional[str]]:
+    """Derivative of the PNG render at ``width`` and the render's cache key"""
+    key = source_key(generator, diagram_type)
+    if key is None:
+        return None, None
+    data = generator.thumbnails.get(key, width)
+    if data is None:
+        result = generator.generate_plantuml_diagram(diagram_type, 'png')
+        if result['status'] != 'success':
+            raise RuntimeError(result['message'])
+        data = generator.thumbnails.build(key, base64.b64decode(result['file_data']))[width]
+    return data, key
+
+
+def create_diagram_routes(generator, name: str = 'diagram_store') -> Blueprint:
+    """Blueprint with the shared diagram routes, bound to ``generator``"""
+    bp = Blueprint(name, __name__)
+
+    @bp.route('/thumbnail/<diagram_type>', methods=['GET'])
+    def get_diagram_thumbnail(diagram_type: str):
+        """Downscaled PNG render for the gallery (?w=, ?v= from the list's URLs)"""
+        try:
+            thumbnails = generator.thumbnails
+            if not thumbnails.available:
+                return jsonify({'status': 'error', 'message': 'Thumbnails require Pillow'}), 501
+            width = thumbnails.width_for(request.args.get('w', type=int))
+            data, key = get_thumbnail(generator, diagram_type, width)
+            if data is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Diagram {diagram_type} not found'
+                }), 404
+            return thumbnail_response(thumbnails, data, key, width)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error generating thumbnail for {diagram_type}: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': f'Failed to generate thumbnail: {str(e)}'
+            }), 500
+
+    @bp.route('/search', methods=['GET'])
+    def search_diagrams():
+        """Find diagrams by symbol (?q=&kind=&scope=catalog|custom&limit=)"""
+        try:
+            started = time.perf_counter()
+            query = request.args.get('q', '')
+            results = generator.symbol_index.search(
+                query,
+                kind=request.args.get('kind'),
+                scope=request.args.get('scope'),
+                limit=min(request.args.get('limit', 50, type=int), 500))
+            return jsonify({
+                'status': 'success',
+                'query': query,
+                'results': results,
+                'count': len(results),
+                'took_ms': round((time.perf_counter() - started) * 1000, 2)
+            })
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error searching diagrams: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': f'Failed to search diagrams: {str(e)}'
+            }), 500
+
+    @bp.route('/cache/stats', methods=['GET'])
+    def render_cache_stats():
+        """Render cache hits/misses and original vs optimised artifact sizes"""
+        return jsonify({
+            'status': 'success',
+            'stats': generator.render_cache.stats()
+        })
+
+    @bp.route('/history/<diagram_type>', methods=['GET'])
+    def get_diagram_history(diagram_type: str):
+        """List source revisions, newest first (?limit=)"""
+        try:
+            revisions = generator.source_store.history(
+                diagram_type, request.args.get('limit', 50, type=int))
+            return jsonify({
+                'status': 'success',
+                'type': diagram_type,
+                'revisions': revisions
+            })
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error listing history for {diagram_type}: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': f'Failed to list history: {str(e)}'
+            }), 500
+
+    @bp.route('/history/<diagram_type>/<int:revision>', methods=['GET'])
+    def get_diagram_revision(diagram_type: str, revision: int):
+        """Source of one revision"""
+        try:
+            result = generator.source_store.get_revision(diagram_type, revision)
+            if result is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Revision {revision} of {diagram_type} not found'
+                }), 404
+            return jsonify({'status': 'success', 'type': diagram_type, **result})
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error reading revision {revision} of {diagram_type}: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': f'Failed to read revision: {str(e)}'
+            }), 500
+
+    @bp.route('/rollback', methods=['POST'])
+    @track_workflow('diagram_rollback')
+    def rollback_diagram():
+        """Restore an earlier revision (recorded as a new revision)"""
+        try:
+            data = request.json or {}
+            diagram_type = data.get('type')
+            revision = data.get('revision')
+
+            if not diagram_type or not isinstance(revision, int):
+                return jsonify({
+                    'status': 'error',
+                    'message': 'Diagram type and integer revision are required'
+                }), 400
+
+            result = generator.source_store.rollback(diagram_type, revision)
+            if result is None:
+                return jsonify({
+                    'status': 'error',
+                    'message': f'Revision {revision} of {diagram_type} not found'
+                }), 404
+            generator.symbol_index.index_file(generator.source_store.source_path(diagram_type))
+            return jsonify({
+                'status': 'success',
+                'message': f'{diagram_type} rolled back to revision {revision}',
+                'type': diagram_type,
+                'revision': result['revision'],
+                'hash': result['hash']
+            })
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error rolling back diagram: {str(e)}")
+            return jsonify({
+                'status': 'error',
+                'message': f'Failed to roll back: {str(e)}'
+            }), 500
+
+    return bp
@@ -7,6 +7,14 @@ from typing import Dict, List, Optional
 from flask import Blueprint, request, jsonify, send_file
 import logging
 
+from services.workflow_events import track_workflow
+from services.diagram_history import DiagramSourceStore, source_hash
+from services.diagram_routes import create_diagram_routes, source_key
+from services.plantuml_canonical import RenderCache, cache_key, canonical_hash
+from services.diagram_index import DiagramSymbolIndex
+from services.render_optimizer import RenderOptimizer
+from services.diagram_thumbnails import DiagramThumbnails, thumbnail_fields
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,6 +23,13 @@ class DiagramGenerator:
     def __init__(self, workflow_diagrams_path: str):
         self.workflow_diagrams_path = workflow_diagrams_path
         self.supported_formats = ['png', 'svg', 'pdf']
+        self.source_store = DiagramSourceStore(workflow_diagrams_path)
+        # Renders keyed by canonical source hash, so cosmetic edits reuse them;
+        # each new render is minified/recompressed once before it is cached
+        self.render_cache = RenderCache(os.path.join(workflow_diagrams_path, '.cache', 'renders'),
+                                        optimizer=RenderOptimizer())
+        self.thumbnails = DiagramThumbnails(self.render_cache)
+        self.symbol_index = DiagramSymbolIndex(workflow_diagrams_path)
         logger.info(f"DiagramGenerator initialized with path: {workflow_diagrams_path}")
         
     def generate_plantuml_diagram(self, 
@@ -47,6 +62,21 @@ class DiagramGenerator:
                     'message': error_msg
                 }
             
+            with open(source_file, 'r', encoding='utf-8') as f:
+                key = cache_key(f.read())
+            cached = self.render_cache.get(key, output_format)
+            if cached is not None:
+                file_data = base64.b64encode(cached).decode('utf-8')
+                logger.info(f"Serving cached {diagram_type} diagram ({key[:12]})")
+                return {
+                    'status': 'success',
+                    'file_data': file_data,
+                    'format': output_format,
+                    'diagram_type': diagram_type,
+                    'file_size': len(file_data),
+                    'cached': True
+                }
+            
             # Create temporary output directory
             with tempfile.TemporaryDirectory() as temp_dir:
                 logger.info(f"Using temporary directory: {temp_dir}")
@@ -87,7 +117,11 @@ class DiagramGenerator:
                 
                 # Read file and encode as base64
                 with open(output_file, 'rb') as f:
-                    file_data = base64.b64encode(f.read()).decode('utf-8')
+                    output_data = f.read()
+                output_data = self.render_cache.put(key, output_format, output_data)
+                if output_format == 'png':
+                    self.thumbnails.schedule(key, output_data)
+                file_data = base64.b64encode(output_data).decode('utf-8')
                 
                 logger.info(f"Successfully generated {diagram_type} diagram, size: {len(file_data)} bytes")
                 
@@ -96,7 +130,8 @@ class DiagramGenerator:
                     'file_data': file_data,
                     'format': output_format,
                     'diagram_type': diagram_type,
-                    'file_size': len(file_data)
+                    'file_size': len(file_data),
+                    'cached': False
                 }
                 
         except Exception as e:
@@ -146,17 +181,24 @@ class DiagramGenerator:
             return ""
     
     def update_diagram_source(self, diagram_type: str, source: str) -> Dict:
-        """Update PlantUML source code for a diagram"""
+        """Update PlantUML source code for a diagram (atomic write + new revision)"""
         try:
-            source_file = f"{self.workflow_diagrams_path}/plantuml_{diagram_type}.puml"
-            
-            with open(source_file, 'w', encoding='utf-8') as f:
-                f.write(source)
+            previous = self.source_store.read(diagram_type)
+            revision = self.source_store.write(diagram_type, source)
+            new_canonical = canonical_hash(source)
+            if revision['changed']:
+                self.symbol_index.index_file(self.source_store.source_path(diagram_type), source)
             
             logger.info(f"Successfully updated source code for {diagram_type}")
             return {
                 'status': 'success',
-                'message': 'Diagram updated successfully'
+                'message': 'Diagram updated successfully',
+                'revision': revision['revision'],
+                'hash': revision['hash'],
+                'changed': revision['changed'],
+                'canonical_hash': new_canonical,
+                # Only whitespace/comments changed: existing renders stay valid
+                'rerender': previous is None or canonical_hash(previous) != new_canonical
             }
         except Exception as e:
             error_msg = f'Update failed: {str(e)}'
@@ -172,12 +214,19 @@ diagram_bp = Blueprint('diagram', __name__, url_prefix='/api/diagrams')
 # Initialize diagram generator
 WORKFLOW_DIAGRAMS_PATH = "/Users/ayush/AI_Projects/agenticchatbot/WorkflowDiagrams"
 diagram_generator = DiagramGenerator(WORKFLOW_DIAGRAMS_PATH)
+# Thumbnail, search, cache stats and history routes shared with the standalone diagram API
+diagram_bp.register_blueprint(create_diagram_routes(diagram_generator))
 
 @diagram_bp.route('/list', methods=['GET'])
 def list_diagrams():
     """Get list of available diagrams"""
     try:
         diagrams = diagram_generator.get_available_diagrams()
+        for diagram in diagrams:
+            diagram.update(thumbnail_fields(
+                diagram_generator.thumbnails,
+                f"/api/diagrams/thumbnail/{diagram['type']}",
+                source_key(diagram_generator, diagram['type'])))
         return jsonify({
             'status': 'success',
             'diagrams': diagrams
@@ -190,6 +239,7 @@ def list_diagrams():
         }), 500
 
 @diagram_bp.route('/generate', methods=['POST'])
+@track_workflow('diagram_generate')
 def generate_diagram():
     """Generate a diagram"""
     try:
@@ -224,7 +274,8 @@ def get_diagram_source(diagram_type: str):
         return jsonify({
             'status': 'success',
             'source': source,
-            'type': diagram_type
+            'type': diagram_type,
+            'hash': source_hash(source)
         })
     except Exception as e:
         logger.error(f"Error getting source code: {str(e)}")
@@ -234,6 +285,7 @@ def get_diagram_source(diagram_type: str):
         }), 500
 
 @diagram_bp.route('/update', methods=['POST'])
+@track_workflow('diagram_update')
 def update_diagram():
     """Update diagram source code"""
     try:
@@ -0,0 +1,144 @@
+"""
+Thumbnails and fixed-width derivatives of rendered diagrams for the gallery.
+
+Each PNG render is downscaled once to ``DERIVATIVE_WIDTHS`` (never upscaled:
+a diagram narrower than a width is stored at its own size under that width)
+and the results are stored in the render cache next to the render, as
+``<canonical hash>.<width>w.webp`` (PNG where Pillow lacks WebP). Because the
+derivatives share the render's content-addressed key, an edited diagram gets
+new ones and unchanged diagrams never redo the work.
+
+List endpoints add ``thumbnail_url`` and ``srcset`` (via
+:func:`thumbnail_fields`). The URLs carry ``v=<key prefix>``, so the thumbnail
+routes can send them with immutable caching (:func:`thumbnail_response`).
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from flask import request, send_file
+
+from services.static_assets import IMMUTABLE_CACHE_CONTROL
+
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = [240, 480, 960]
+THUMBNAIL_WIDTH = 240
+VERSION_LENGTH = 16
+
+
+def derivative_format() -> str:
+    return 'webp' if PIL_AVAILABLE and features.check('webp') else 'png'
+
+
+def make_derivatives(png_data: bytes, widths: List[int], output_format: str) -> Dict[int, bytes]:
+    """``{width: encoded image}`` for one render"""
+    derivatives = {}
+    with Image.open(BytesIO(png_data)) as image:
+        has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        base = image.convert('RGBA' if has_alpha else 'RGB')
+    for width in widths:
+        if width < base.width:
+            size = (width, max(1, round(base.height * width / base.width)))
+            resized = base.resize(size, Image.LANCZOS)
+        else:
+            resized = base
+        buffer = BytesIO()
+        if output_format == 'webp':
+            resized.save(buffer, format='WEBP', quality=80, method=4)
+        else:
+            resized.save(buffer, format='PNG', optimize=True)
+        derivatives[width] = buffer.getvalue()
+    return derivatives
+
+
+class DiagramThumbnails:
+    """Derivatives of PNG renders, stored in (and served from) a RenderCache"""
+
+    def __init__(self, render_cache, widths: Optional[List[int]] = None, workers: int = 2):
+        self.render_cache = render_cache
+        self.widths = sorted(widths or DERIVATIVE_WIDTHS)
+        self.format = derivative_format()
+        self.mimetype = f'image/{self.format}'
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='diagram-thumbnails')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return PIL_AVAILABLE
+
+    def width_for(self, requested: Optional[int]) -> int:
+        """Smallest derivative at least ``requested`` wide (the thumbnail by default)"""
+        if not requested:
+            return THUMBNAIL_WIDTH if THUMBNAIL_WIDTH in self.widths else self.widths[0]
+        return next((width for width in self.widths if width >= requested), self.widths[-1])
+
+    def _cache_format(self, width: int) -> str:
+        return f'{width}w.{self.format}'
+
+    def get(self, key: Optional[str], width: int) -> Optional[bytes]:
+        return self.render_cache.get(key, self._cache_format(width))
+
+    def build(self, key: Optional[str], png_data: bytes) -> Dict[int, bytes]:
+        """Make and cache every derivative of one render"""
+        derivatives = make_derivatives(png_data, self.widths, self.format)
+        for width, data in derivatives.items():
+            self.render_cache.put(key, self._cache_format(width), data)
+        return derivatives
+
+    def schedule(self, key: Optional[str], png_data: bytes):
+        """Build derivatives in the background after a new PNG render"""
+        if key is None or not PIL_AVAILABLE:
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._build_pending, key, png_data)
+
+    def _build_pending(self, key: str, png_data: bytes):
+        try:
+            if self.get(key, self.widths[-1]) is None:
+                self.build(key, png_data)
+        except Exception as e:
+            logger.warning(f"Could not build thumbnails for {key[:12]}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+
+def thumbnail_fields(thumbnails: DiagramThumbnails, url: str, key: Optional[str]) -> Dict:
+    """``thumbnail_url`` and ``srcset`` for a list entry whose thumbnails live at ``url``"""
+    if not thumbnails.available:
+        return {'thumbnail_url': None, 'srcset': None}
+    version = f'&v={key[:VERSION_LENGTH]}' if key else ''
+    return {
+        'thumbnail_url': f'{url}?w={thumbnails.width_for(None)}{version}',
+        'srcset': ', '.join(f'{url}?w={width}{version} {width}w' for width in thumbnails.widths)
+    }
+
+
+def thumbnail_response(thumbnails: DiagramThumbnails, data: bytes, key: Optional[str], width: int):
+    """Send a derivative; versioned URLs that match the current render are cached immutably"""
+    response = send_file(BytesIO(data), mimetype=thumbnails.mimetype, etag=False)
+    if key:
+        response.set_etag(f'{key[:VERSION_LENGTH]}-{width}')
+        response.make_conditional(request)
+    version = request.args.get('v')
+    if key and version == key[:VERSION_LENGTH]:
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
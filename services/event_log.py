@@ -0,0 +1,227 @@
+"""
+Append-only, segmented NDJSON event log.
+
+Producers hand events to :meth:`SegmentedEventLog.append` and return
+immediately; a single writer thread group-commits everything queued since its
+last write (one ``write`` + ``fsync`` per batch) into the current segment and
+rolls to a new segment file once it reaches ``segment_bytes``. A bounded queue
+provides backpressure: when it is full ``append`` refuses the events instead of
+letting memory grow.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'events-'
+SEGMENT_SUFFIX = '.ndjson'
+
+
+class SegmentedEventLog:
+    """Group-committing NDJSON writer split into size-bounded segments.
+
+    Args:
+        directory: Where segment files live
+        segment_bytes: Roll to a new segment once the current one reaches this size
+        max_queue: Maximum number of events waiting to be written
+        max_batch: Maximum events per group commit
+        max_delay: Seconds the writer waits for a batch to fill
+        fsync: fsync after every group commit (durability vs. throughput)
+    """
+
+    def __init__(self,
+                 directory: str,
+                 segment_bytes: int = 64 * 1024 * 1024,
+                 max_queue: int = 100000,
+                 max_batch: int = 5000,
+                 max_delay: float = 0.2,
+                 fsync: bool = True):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._queue: 'queue.Queue[Optional[str]]' = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._segment_path: Optional[str] = None
+        self._segment_size = 0
+        self._sequence = self._last_sequence()
+        self._stop = threading.Event()
+        self._flushed = threading.Condition()
+        self._submitted = 0
+        self._committed = 0
+
+        self.accepted = 0
+        self.rejected = 0
+        self.commits = 0
+        self.bytes_written = 0
+        self.segments_rolled = 0
+        self.write_errors = 0
+
+        self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+        self._thread.start()
+
+    # Producer side -----------------------------------------------------
+
+    def append(self, events: Iterable[Dict]) -> bool:
+        """Queue events for the next group commit.
+
+        All-or-nothing: returns False (and queues none of them) when the queue
+        does not have room for the whole batch.
+        """
+        lines = [json.dumps(event, separators=(',', ':'), ensure_ascii=False) for event in events]
+        if not lines:
+            return True
+        with self._flushed:
+            if self._queue.maxsize and self._queue.qsize() + len(lines) > self._queue.maxsize:
+                self.rejected += len(lines)
+                return False
+            for line in lines:
+                self._queue.put_nowait(line)
+            self._submitted += len(lines)
+            self.accepted += len(lines)
+        return True
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def saturation(self) -> float:
+        """Fraction of the write queue in use (0.0 - 1.0)"""
+        return self._queue.qsize() / self._queue.maxsize if self._queue.maxsize else 0.0
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until everything appended so far has been committed"""
+        deadline = time.monotonic() + timeout
+        with self._flushed:
+            target = self._submitted
+            while self._committed < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> Dict:
+        return {
+            'directory': self.directory,
+            'current_segment': os.path.basename(self._segment_path) if self._segment_path else None,
+            'pending': self.pending,
+            'saturation': round(self.saturation, 4),
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'commits': self.commits,
+            'bytes_written': self.bytes_written,
+            'segments_rolled': self.segments_rolled,
+            'write_errors': self.write_errors
+        }
+
+    # Reading -----------------------------------------------------------
+
+    def segments(self) -> List[str]:
+        """Segment paths, oldest first"""
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def read(self, since_segment: Optional[str] = None) -> Iterator[Dict]:
+        """Iterate committed events, optionally starting at ``since_segment``"""
+        for path in self.segments():
+            if since_segment and os.path.basename(path) < since_segment:
+                continue
+            yield from read_segment(path)
+
+    # Writer side -------------------------------------------------------
+
+    def _last_sequence(self) -> int:
+        try:
+            names = [name for name in os.listdir(self.directory)
+                     if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)]
+        except FileNotFoundError:
+            return 0
+        sequences = []
+        for name in names:
+            try:
+                sequences.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].split('-')[0]))
+            except ValueError:
+                continue
+        return max(sequences, default=0)
+
+    def _open_segment(self):
+        if self._file:
+            self._file.close()
+            self.segments_rolled += 1
+        self._sequence += 1
+        # Zero-padded sequence keeps lexical order == write order
+        name = f"{SEGMENT_PREFIX}{self._sequence:08d}-{time.strftime('%Y%m%dT%H%M%S')}{SEGMENT_SUFFIX}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._file = open(self._segment_path, 'ab')
+        self._segment_size = self._file.tell()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch: List[str]):
+        payload = ('\n'.join(batch) + '\n').encode('utf-8')
+        try:
+            if self._file is None or self._segment_size >= self.segment_bytes:
+                self._open_segment()
+            self._file.write(payload)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._segment_size += len(payload)
+            self.bytes_written += len(payload)
+            self.commits += 1
+        except OSError as e:
+            self.write_errors += 1
+            logger.error(f"Event log commit of {len(batch)} events failed: {str(e)}")
+        with self._flushed:
+            self._committed += len(batch)
+            self._flushed.notify_all()
+
+
+def read_segment(path: str) -> Iterator[Dict]:
+    """Yield the events in one segment, skipping a torn final line"""
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
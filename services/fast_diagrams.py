@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+Native renderer for the simple diagrams ``AIDiagramGenerator`` produces.
+
+Supported subset (anything else returns ``None`` and the caller runs PlantUML):
+
+- sequence: up to 4 participants, ``->`` / ``-->`` messages with labels
+- component: components joined in one linear ``-->`` chain
+- activity: ``start``, ``:action;`` steps, ``->``, ``stop``/``end``
+- class: class boxes with members, acyclic ``-->`` / ``->`` / ``--`` links
+
+plus ``title``, ``!theme plain``, blank lines and ``'`` comments. The source is
+parsed into a small model, laid out once into drawing primitives (boxes,
+lines, arrowheads, text), and the primitives are emitted as SVG or, when
+Pillow is installed, drawn to PNG - in milliseconds instead of a JVM start.
+
+Fidelity check against PlantUML (needs ``plantuml`` on PATH)::
+
+    python3 -m services.fast_diagrams --verify <dir-with-.puml-files>
+
+For every supported source it checks that every label of the model appears in
+both the native and PlantUML's SVG, and that the two drawings have a similar
+aspect ratio.
+"""
+
+import argparse
+import glob
+import io
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_PARTICIPANTS = 4
+FONT_SIZE = 13
+TITLE_SIZE = 14
+CHAR_WIDTH = 7.2  # average advance of the sans-serif font at FONT_SIZE
+LINE_HEIGHT = 17
+PADDING = 10
+MARGIN = 20
+BOX_FILL = '#F1F1F1'
+STROKE = '#181818'
+FONT_FAMILY = 'sans-serif'
+DASHED = ' stroke-dasharray="5,5"'
+BOLD = ' font-weight="bold"'
+
+NAME = r'[A-Za-z_][A-Za-z0-9_]*'
+TITLE_RE = re.compile(r'^title\s+(.+)$')
+PARTICIPANT_RE = re.compile(rf'^participant\s+(?:"([^"]+)"\s+as\s+({NAME})|({NAME}))$')
+MESSAGE_RE = re.compile(rf'^({NAME})\s*(-->|->)\s*({NAME})\s*(?::\s*(.*))?$')
+COMPONENT_RE = re.compile(rf'^component\s+(?:"([^"]+)"\s+as\s+({NAME})|\[([^\]]+)\](?:\s+as\s+({NAME}))?)$')
+CLASS_RE = re.compile(rf'^class\s+({NAME})\s*(\{{)?$')
+LINK_RE = re.compile(rf'^({NAME})\s*(-->|->|--)\s*({NAME})$')
+ACTION_RE = re.compile(r'^:(.+);$')
+
+
+# Model -----------------------------------------------------------------
+
+class Diagram:
+    """Parsed diagram: ``kind`` plus nodes (id -> label/members) and edges"""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.title: Optional[str] = None
+        self.nodes: Dict[str, Dict] = {}
+        self.edges: List[Dict] = []
+
+    def add_node(self, node_id: str, label: str, members: Optional[List[str]] = None):
+        self.nodes[node_id] = {'label': label, 'members': members if members is not None else []}
+
+    def labels(self) -> List[str]:
+        """Every text the rendered diagram must show"""
+        labels = [self.title] if self.title else []
+        for node in self.nodes.values():
+            labels.append(node['label'])
+            labels.extend(member.lstrip('+-#~ ').strip() for member in node['members'])
+        labels.extend(edge['label'] for edge in self.edges if edge.get('label'))
+        return labels
+
+
+def _content_lines(source: str) -> Optional[List[str]]:
+    lines = [line.strip() for line in source.replace('\r\n', '\n').split('\n')]
+    lines = [line for line in lines if line and not line.startswith("'")]
+    if not lines or lines[0] != '@startuml' or lines[-1] != '@enduml':
+        return None
+    return [line for line in lines[1:-1] if line != '!theme plain']
+
+
+def parse(source: str) -> Optional[Diagram]:
+    """Model of ``source`` if it is inside the supported subset, else None"""
+    lines = _content_lines(source)
+    if lines is None:
+        return None
+    title = None
+    if lines and TITLE_RE.match(lines[0]):
+        title = TITLE_RE.match(lines[0]).group(1).strip()
+        lines = lines[1:]
+    if not lines:
+        return None
+    first = lines[0]
+    if first.startswith('participant') or MESSAGE_RE.match(first):
+        diagram = _parse_sequence(lines)
+    elif first.startswith('component'):
+        diagram = _parse_component(lines)
+    elif first == 'start':
+        diagram = _parse_activity(lines)
+    elif first.startswith('class'):
+        diagram = _parse_class(lines)
+    else:
+        return None
+    if diagram is not None:
+        diagram.title = title
+    return diagram
+
+
+def _parse_sequence(lines: List[str]) -> Optional[Diagram]:
+    diagram = Diagram('sequence')
+    for line in lines:
+        match = PARTICIPANT_RE.match(line)
+        if match:
+            label, alias, bare = match.groups()
+            diagram.add_node(alias or bare, label or bare)
+            continue
+        match = MESSAGE_RE.match(line)
+        if match is None:
+            return None
+        source, arrow, target, label = match.groups()
+        for node_id in (source, target):
+            if node_id not in diagram.nodes:
+                # PlantUML creates undeclared participants on first use
+                diagram.add_node(node_id, node_id)
+        diagram.edges.append({'from': source, 'to': target, 'label': (label or '').strip(),
+                              'dashed': arrow == '-->'})
+    if not diagram.nodes or len(diagram.nodes) > MAX_PARTICIPANTS:
+        return None
+    return diagram
+
+
+def _parse_component(lines: List[str]) -> Optional[Diagram]:
+    diagram = Diagram('component')
+    for line in lines:
+        match = COMPONENT_RE.match(line)
+        if match:
+            quoted, alias, bracketed, bracket_alias = match.groups()
+            label = quoted or bracketed
+            diagram.add_node(alias or bracket_alias or label, label)
+            continue
+        match = LINK_RE.match(line)
+        if match is None or match.group(2) != '-->':
+            return None
+        source, _, target = match.groups()
+        if source not in diagram.nodes or target not in diagram.nodes:
+            return None
+        diagram.edges.append({'from': source, 'to': target})
+    order = list(diagram.nodes)
+    # Only a chain through the components in declaration order
+    if len(diagram.edges) >= len(order):
+        return None
+    expected = [{'from': order[i], 'to': order[i + 1]} for i in range(len(diagram.edges))]
+    if diagram.edges != expected:
+        return None
+    return diagram
+
+
+def _parse_activity(lines: List[str]) -> Optional[Diagram]:
+    if lines[0] != 'start' or lines[-1] not in ('stop', 'end'):
+        return None
+    diagram = Diagram('activity')
+    for index, line in enumerate(lines[1:-1]):
+        match = ACTION_RE.match(line)
+        if match:
+            diagram.add_node(f'a{index}', match.group(1).strip())
+        elif line != '->':
+            return None
+    return diagram
+
+
+def _parse_class(lines: List[str]) -> Optional[Diagram]:
+    diagram = Diagram('class')
+    body: Optional[List[str]] = None
+    for line in lines:
+        if body is not None:
+            if line == '}':
+                body = None
+            elif '{' in line or '}' in line:
+                return None
+            else:
+                body.append(line)
+            continue
+        match = CLASS_RE.match(line)
+        if match:
+            members: List[str] = []
+            diagram.add_node(match.group(1), match.group(1), members)
+            if match.group(2):
+                body = members
+            continue
+        match = LINK_RE.match(line)
+        if match is None:
+            return None
+        source, arrow, target = match.groups()
+        if source not in diagram.nodes or target not in diagram.nodes or source == target:
+            return None
+        diagram.edges.append({'from': source, 'to': target, 'arrow': arrow != '--'})
+    if body is not None or not diagram.nodes:
+        return None
+    if _ranks(diagram) is None:
+        return None
+    return diagram
+
+
+def _ranks(diagram: Diagram) -> Optional[Dict[str, int]]:
+    """Longest-path layering (sources on top); None for cycles"""
+    ranks = {node_id: 0 for node_id in diagram.nodes}
+    for _ in range(len(diagram.nodes)):
+        changed = False
+        for edge in diagram.edges:
+            if ranks[edge['to']] < ranks[edge['from']] + 1:
+                ranks[edge['to']] = ranks[edge['from']] + 1
+                changed = True
+        if not changed:
+            return ranks
+    return None
+
+
+# Layout ----------------------------------------------------------------
+
+def text_width(text: str, size: int = FONT_SIZE) -> float:
+    return len(text) * CHAR_WIDTH * size / FONT_SIZE
+
+
+class Canvas:
+    """Drawing primitives shared by the SVG and PNG back ends"""
+
+    def __init__(self):
+        self.items: List[Tuple] = []
+        self.width = 0.0
+        self.height = 0.0
+
+    def _extend(self, x: float, y: float):
+        self.width = max(self.width, x + MARGIN)
+        self.height = max(self.height, y + MARGIN)
+
+    def rect(self, x, y, w, h, fill=BOX_FILL, radius=0, dashed=False):
+        self.items.append(('rect', x, y, w, h, fill, radius, dashed))
+        self._extend(x + w, y + h)
+
+    def line(self, x1, y1, x2, y2, dashed=False):
+        self.items.append(('line', x1, y1, x2, y2, dashed))
+        self._extend(max(x1, x2), max(y1, y2))
+
+    def arrow(self, x1, y1, x2, y2, dashed=False, head=True):
+        self.line(x1, y1, x2, y2, dashed)
+        if head:
+            length = max(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5, 1e-6)
+            ux, uy = (x2 - x1) / length, (y2 - y1) / length
+            points = [(x2, y2),
+                      (x2 - 10 * ux + 4 * uy, y2 - 10 * uy - 4 * ux),
+                      (x2 - 10 * ux - 4 * uy, y2 - 10 * uy + 4 * ux)]
+            self.items.append(('polygon', points, STROKE))
+
+    def circle(self, cx, cy, r, fill=STROKE, ring=False):
+        self.items.append(('circle', cx, cy, r, fill, ring))
+        self._extend(cx + r, cy + r)
+
+    def text(self, x, y, value, size=FONT_SIZE, anchor='middle', bold=False):
+        """``y`` is the baseline"""
+        self.items.append(('text', x, y, value, size, anchor, bold))
+        width = text_width(value, size)
+        right = x + width / 2 if anchor == 'middle' else x + width
+        self._extend(right, y + 4)
+
+
+def layout(diagram: Diagram) -> Canvas:
+    canvas = Canvas()
+    top = MARGIN
+    if diagram.title:
+        top += TITLE_SIZE + PADDING
+    if diagram.kind == 'sequence':
+        _layout_sequence(diagram, canvas, top)
+    elif diagram.kind == 'component':
+        _layout_chain(diagram, canvas, top, radius=0, icon=True)
+    elif diagram.kind == 'activity':
+        _layout_activity(diagram, canvas, top)
+    else:
+        _layout_class(diagram, canvas, top)
+    if diagram.title:
+        canvas.width = max(canvas.width, text_width(diagram.title, TITLE_SIZE) + 2 * MARGIN)
+        canvas.text(canvas.width / 2, MARGIN + TITLE_SIZE, diagram.title, TITLE_SIZE, bold=True)
+    return canvas
+
+
+def _box_width(label: str) -> float:
+    return text_width(label) + 2 * PADDING
+
+
+def _layout_sequence(diagram: Diagram, canvas: Canvas, top: float):
+    box_height = LINE_HEIGHT + PADDING
+    ids = list(diagram.nodes)
+    centers: Dict[str, float] = {}
+    x = MARGIN
+    for index, node_id in enumerate(ids):
+        width = _box_width(diagram.nodes[node_id]['label'])
+        if index:
+            # Leave room for the labels of messages between neighbours
+            gap = max([text_width(edge['label']) + 2 * PADDING for edge in diagram.edges
+                       if {edge['from'], edge['to']} == {ids[index - 1], node_id}] + [40.0])
+            x = max(x + 20, centers[ids[index - 1]] + gap - width / 2)
+        centers[node_id] = x + width / 2
+        x += width
+    y = top + box_height + 20
+    rows = []
+    for edge in diagram.edges:
+        rows.append((edge, y + LINE_HEIGHT))
+        y += LINE_HEIGHT + 14
+    bottom = y + 10
+    for node_id in ids:
+        label = diagram.nodes[node_id]['label']
+        width = _box_width(label)
+        cx = centers[node_id]
+        canvas.line(cx, top + box_height, cx, bottom, dashed=True)
+        for box_top in (top, bottom):
+            canvas.rect(cx - width / 2, box_top, width, box_height, radius=3)
+            canvas.text(cx, box_top + box_height / 2 + 4.5, label)
+    for edge, row_y in rows:
+        x1, x2 = centers[edge['from']], centers[edge['to']]
+        if x1 == x2:
+            # Self message: a small loop to the right
+            canvas.line(x1, row_y - 6, x1 + 30, row_y - 6, edge['dashed'])
+            canvas.line(x1 + 30, row_y - 6, x1 + 30, row_y + 6, edge['dashed'])
+            canvas.arrow(x1 + 30, row_y + 6, x1, row_y + 6, edge['dashed'])
+            canvas.text(x1 + 36, row_y - 8, edge['label'], anchor='start')
+            continue
+        canvas.arrow(x1, row_y, x2, row_y, edge['dashed'])
+        if edge['label']:
+            canvas.text((x1 + x2) / 2, row_y - 5, edge['label'])
+
+
+def _layout_chain(diagram: Diagram, canvas: Canvas, top: float, radius: float, icon: bool):
+    widths = [_box_width(node['label']) + (16 if icon else 0) for node in diagram.nodes.values()]
+    column = max(widths) if widths else 0
+    height = LINE_HEIGHT + 2 * PADDING
+    y = top
+    previous = None
+    for node, width in zip(diagram.nodes.values(), widths):
+        x = MARGIN + (column - width) / 2
+        canvas.rect(x, y, width, height, radius=radius)
+        if icon:
+            canvas.rect(x + width - 16, y + 5, 10, 12, fill='#FFFFFF')
+            canvas.rect(x + width - 19, y + 7, 6, 3, fill='#FFFFFF')
+            canvas.rect(x + width - 19, y + 12, 6, 3, fill='#FFFFFF')
+        canvas.text(x + (width - (16 if icon else 0)) / 2, y + height / 2 + 4.5, node['label'])
+        if previous is not None:
+            canvas.arrow(MARGIN + column / 2, previous, MARGIN + column / 2, y)
+        previous = y + height
+        y += height + 40
+
+
+def _layout_activity(diagram: Diagram, canvas: Canvas, top: float):
+    widths = [_box_width(node['label']) for node in diagram.nodes.values()]
+    center = MARGIN + max(widths + [20]) / 2
+    canvas.circle(center, top + 10, 10)
+    y = top + 20
+    height = LINE_HEIGHT + 2 * PADDING
+    for node, width in zip(diagram.nodes.values(), widths):
+        canvas.arrow(center, y, center, y + 30)
+        y += 30
+        canvas.rect(center - width / 2, y, width, height, radius=12)
+        canvas.text(center, y + height / 2 + 4.5, node['label'])
+        y += height
+    canvas.arrow(center, y, center, y + 30)
+    canvas.circle(center, y + 41, 11, fill='#FFFFFF', ring=True)
+    canvas.circle(center, y + 41, 7)
+
+
+def _layout_class(diagram: Diagram, canvas: Canvas, top: float):
+    ranks = _ranks(diagram)
+    layers: Dict[int, List[str]] = {}
+    for node_id, rank in ranks.items():
+        layers.setdefault(rank, []).append(node_id)
+    header = LINE_HEIGHT + 2 * PADDING
+    sizes = {}
+    for node_id, node in diagram.nodes.items():
+        fields = [m for m in node['members'] if '(' not in m]
+        methods = [m for m in node['members'] if '(' in m]
+        width = max([text_width(node['label']) + 2 * PADDING + 26] +
+                    [text_width(m) + 2 * PADDING for m in node['members']])
+        sizes[node_id] = (width, fields, methods)
+    boxes = {}
+    y = top
+    for rank in sorted(layers):
+        x = MARGIN
+        row_height = 0
+        for node_id in layers[rank]:
+            width, fields, methods = sizes[node_id]
+            height = header + 8 + LINE_HEIGHT * len(fields) + 8 + LINE_HEIGHT * len(methods)
+            boxes[node_id] = (x, y, width, height)
+            canvas.rect(x, y, width, height)
+            canvas.circle(x + PADDING + 8, y + header / 2, 9, fill='#ADD1B2')
+            canvas.text(x + PADDING + 8, y + header / 2 + 4.5, 'C', bold=True)
+            canvas.text(x + PADDING + 22 + (width - PADDING - 22) / 2, y + header / 2 + 4.5,
+                        diagram.nodes[node_id]['label'])
+            line_y = y + header
+            canvas.line(x, line_y, x + width, line_y)
+            for member in fields:
+                line_y += LINE_HEIGHT
+                canvas.text(x + PADDING, line_y, member, anchor='start')
+            line_y += 8
+            canvas.line(x, line_y, x + width, line_y)
+            for member in methods:
+                line_y += LINE_HEIGHT
+                canvas.text(x + PADDING, line_y, member, anchor='start')
+            row_height = max(row_height, height)
+            x += width + 40
+        y += row_height + 50
+    for edge in diagram.edges:
+        fx, fy, fw, fh = boxes[edge['from']]
+        tx, ty, tw, _ = boxes[edge['to']]
+        canvas.arrow(fx + fw / 2, fy + fh, tx + tw / 2, ty, head=edge['arrow'])
+
+
+# Back ends -------------------------------------------------------------
+
+def to_svg(canvas: Canvas) -> str:
+    width, height = round(canvas.width), round(canvas.height)
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="0 0 {width} {height}" font-family="{FONT_FAMILY}">',
+           f'<rect width="{width}" height="{height}" fill="#FFFFFF"/>']
+    for item in canvas.items:
+        kind = item[0]
+        if kind == 'rect':
+            _, x, y, w, h, fill, radius, dashed = item
+            out.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{w:.1f}" height="{h:.1f}" rx="{radius}" '
+                       f'fill="{fill}" stroke="{STROKE}" stroke-width="1"'
+                       f'{DASHED if dashed else ""}/>')
+        elif kind == 'line':
+            _, x1, y1, x2, y2, dashed = item
+            out.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" stroke="{STROKE}" '
+                       f'stroke-width="1"{DASHED if dashed else ""}/>')
+        elif kind == 'polygon':
+            _, points, fill = item
+            coords = ' '.join(f'{px:.1f},{py:.1f}' for px, py in points)
+            out.append(f'<polygon points="{coords}" fill="{fill}" stroke="{STROKE}"/>')
+        elif kind == 'circle':
+            _, cx, cy, r, fill, _ = item
+            out.append(f'<circle cx="{cx:.1f}" cy="{cy:.1f}" r="{r}" fill="{fill}" stroke="{STROKE}"/>')
+        elif kind == 'text':
+            _, x, y, value, size, anchor, bold = item
+            out.append(f'<text x="{x:.1f}" y="{y:.1f}" font-size="{size}" text-anchor="{anchor}"'
+                       f'{BOLD if bold else ""}>{escape(value)}</text>')
+    out.append('</svg>')
+    return '\n'.join(out)
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 has a single bitmap size
+        return ImageFont.load_default()
+
+
+def to_png(canvas: Canvas, scale: float = 1.0) -> bytes:
+    if not PIL_AVAILABLE:
+        raise RuntimeError('Pillow is required for PNG output')
+    image = Image.new('RGB', (round(canvas.width * scale), round(canvas.height * scale)), '#FFFFFF')
+    draw = ImageDraw.Draw(image)
+    fonts = {}
+
+    def s(value):
+        return value * scale
+
+    def dashed_line(x1, y1, x2, y2):
+        length = max(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5, 1e-6)
+        steps = int(length // 10) + 1
+        for i in range(steps):
+            a, b = i * 10 / length, min((i * 10 + 5) / length, 1.0)
+            draw.line([(s(x1 + (x2 - x1) * a), s(y1 + (y2 - y1) * a)),
+                       (s(x1 + (x2 - x1) * b), s(y1 + (y2 - y1) * b))], fill=STROKE)
+
+    for item in canvas.items:
+        kind = item[0]
+        if kind == 'rect':
+            _, x, y, w, h, fill, radius, dashed = item
+            box = [s(x), s(y), s(x + w), s(y + h)]
+            if radius:
+                draw.rounded_rectangle(box, radius=s(radius), fill=fill, outline=STROKE)
+            else:
+                draw.rectangle(box, fill=fill, outline=STROKE)
+        elif kind == 'line':
+            _, x1, y1, x2, y2, dashed = item
+            if dashed:
+                dashed_line(x1, y1, x2, y2)
+            else:
+                draw.line([(s(x1), s(y1)), (s(x2), s(y2))], fill=STROKE)
+        elif kind == 'polygon':
+            _, points, fill = item
+            draw.polygon([(s(px), s(py)) for px, py in points], fill=fill, outline=STROKE)
+        elif kind == 'circle':
+            _, cx, cy, r, fill, _ = item
+            draw.ellipse([s(cx - r), s(cy - r), s(cx + r), s(cy + r)], fill=fill, outline=STROKE)
+        elif kind == 'text':
+            _, x, y, value, size, anchor, _ = item
+            font = fonts.get(size) or fonts.setdefault(size, _font(round(size * scale)))
+            draw.text((s(x), s(y)), value, fill=STROKE, font=font,
+                      anchor='ms' if anchor == 'middle' else 'ls')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def render(source: str, output_format: str) -> Optional[bytes]:
+    """Rendered diagram, or None when the source/format needs PlantUML"""
+    if output_format not in ('svg', 'png') or (output_format == 'png' and not PIL_AVAILABLE):
+        return None
+    diagram = parse(source)
+    if diagram is None:
+        return None
+    canvas = layout(diagram)
+    if output_format == 'svg':
+        return to_svg(canvas).encode('utf-8')
+    return to_png(canvas)
+
+
+# Fidelity check --------------------------------------------------------
+
+def _svg_texts(svg: str) -> List[str]:
+    texts = re.findall(r'<text[^>]*>([^<]*)</text>', svg)
+    return [re.sub(r'\s+', ' ', text.replace('&amp;', '&').replace('&lt;', '<').replace('&gt;', '>')
+                   .replace('&quot;', '"').replace('&#160;', ' ')).strip() for text in texts]
+
+
+def _svg_size(svg: str) -> Tuple[float, float]:
+    match = re.search(r'viewBox="[\d.\-]+ [\d.\-]+ ([\d.]+) ([\d.]+)"', svg)
+    return (float(match.group(1)), float(match.group(2))) if match else (0.0, 0.0)
+
+
+def verify(source: str) -> Optional[Dict]:
+    """Compare the native drawing of ``source`` with PlantUML's; None if unsupported"""
+    diagram = parse(source)
+    if diagram is None:
+        return None
+    started = time.perf_counter()
+    native = to_svg(layout(diagram))
+    native_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    result = subprocess.run(['plantuml', '-tsvg', '-pipe'], input=source.encode('utf-8'),
+                            capture_output=True, timeout=120)
+    plantuml_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        return {'ok': False, 'problems': ['plantuml failed'], 'native_ms': native_ms}
+    reference = result.stdout.decode('utf-8', 'replace')
+    native_texts, reference_texts = ' | '.join(_svg_texts(native)), ' | '.join(_svg_texts(reference))
+    problems = []
+    for label in diagram.labels():
+        label = re.sub(r'\s+', ' ', label).strip()
+        if label and label not in native_texts:
+            problems.append(f'label missing from native output: {label!r}')
+        if label and label not in reference_texts:
+            problems.append(f'label not in PlantUML output: {label!r}')
+    native_w, native_h = _svg_size(native)
+    reference_w, reference_h = _svg_size(reference)
+    if native_h and reference_h:
+        ratio = (native_w / native_h) / (reference_w / reference_h)
+        if not 0.5 <= ratio <= 2.0:
+            problems.append(f'aspect differs: native {native_w:.0f}x{native_h:.0f}, '
+                            f'PlantUML {reference_w:.0f}x{reference_h:.0f}')
+    return {'ok': not problems, 'problems': problems, 'kind': diagram.kind,
+            'native_ms': round(native_ms, 2), 'plantuml_ms': round(plantuml_ms, 2)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Render simple PlantUML diagrams natively')
+    parser.add_argument('source', nargs='?', help='.puml file to render')
+    parser.add_argument('-t', '--format', default='svg', choices=['svg', 'png'])
+    parser.add_argument('-o', '--output', default=None)
+    parser.add_argument('--verify', metavar='DIR', help='Compare native output with PlantUML for DIR/**/*.puml')
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        failures = checked = 0
+        for path in sorted(glob.glob(os.path.join(args.verify, '**', '*.puml'), recursive=True)):
+            with open(path, 'r', encoding='utf-8') as f:
+                report = verify(f.read())
+            if report is None:
+                continue
+            checked += 1
+            status = '✅' if report['ok'] else '❌'
+            print(f"{status} {path} ({report.get('kind')}): native {report['native_ms']}ms, "
+                  f"plantuml {report.get('plantuml_ms')}ms")
+            for problem in report['problems']:
+                print(f"     {problem}")
+            failures += not report['ok']
+        print(f"{checked} supported diagrams checked, {failures} mismatched")
+        return 1 if failures else 0
+
+    if not args.source:
+        parser.error('a source file or --verify DIR is required')
+    with open(args.source, 'r', encoding='utf-8') as f:
+        data = render(f.read(), args.format)
+    if data is None:
+        print('❌ Not in the natively supported subset (or Pillow missing for PNG); use PlantUML')
+        return 1
+    output = args.output or os.path.splitext(args.source)[0] + '.' + args.format
+    with open(output, 'wb') as f:
+        f.write(data)
+    print(f"✅ {output} ({len(data)} bytes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
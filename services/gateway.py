@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Local edge gateway: one origin for the portal, diagram API and chat API.
+
+The portal (3030), the diagram server (6060) and the chat server (7000) are
+separate origins, so the browser opens extra connections and pays a CORS
+preflight on every cross-service call. The gateway listens on a single port
+and routes by path prefix (``GATEWAY_ROUTES``, longest prefix wins):
+
+    /api/diagrams, /api/ai  -> diagram server
+    /api/chat               -> chat server
+    everything else         -> portal
+
+Each upstream gets its own keep-alive connection pool, request and response
+bodies are streamed through in chunks (SSE from ``/api/chat/stream`` arrives
+as the upstream flushes it, compressed bodies are passed on untouched), and
+every route has its own connect/read timeouts.
+
+WebSocket upgrades are not proxied; Socket.IO clients fall back to long
+polling through the gateway or can keep connecting to the portal directly.
+
+Usage: python3 -m services.gateway [--port 3050]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from flask import Flask, Response, jsonify, request, stream_with_context
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# RFC 7230 hop-by-hop headers, never forwarded in either direction
+HOP_BY_HOP = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade'
+}
+PROXY_METHODS = ['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS']
+CHUNK_SIZE = 64 * 1024
+# Request bodies up to this size are read whole; larger ones are streamed
+BUFFER_LIMIT = 256 * 1024
+
+
+class _BodyStream:
+    """Iterable request body with a known length (so no chunked re-encoding)"""
+
+    def __init__(self, stream, length: int):
+        self.stream = stream
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        while True:
+            chunk = self.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+class Route:
+    """A path prefix served by one upstream, with its own timeouts and pool"""
+
+    def __init__(self, prefix: str, upstream: str, connect_timeout: float = 3.0,
+                 read_timeout: float = 30.0, pool_size: int = 20):
+        self.prefix = prefix.rstrip('/')
+        self.upstream = upstream.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes_out = 0
+        self.total_latency = 0.0
+
+    def matches(self, path: str) -> bool:
+        return (not self.prefix or path == self.prefix
+                or path.startswith(self.prefix + '/'))
+
+    def stats(self) -> Dict:
+        return {
+            'prefix': self.prefix or '/',
+            'upstream': self.upstream,
+            'timeout': {'connect': self.timeout[0], 'read': self.timeout[1]},
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'bytes_out': self.bytes_out,
+            'avg_upstream_latency_ms': (round(self.total_latency / self.requests * 1000, 2)
+                                        if self.requests else 0.0)
+        }
+
+
+class Gateway:
+    """Routes requests to upstreams over pooled keep-alive connections"""
+
+    def __init__(self, routes: List[Dict]):
+        # Longest prefix first so /api/chat/stream beats /api/chat beats /
+        self.routes = sorted((Route(**route) for route in routes),
+                             key=lambda route: len(route.prefix), reverse=True)
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+        for route in self.routes:
+            self._session(route)
+
+    def _session(self, route: Route) -> requests.Session:
+        """One pooled session per upstream, shared by all of its routes"""
+        with self._lock:
+            session = self._sessions.get(route.upstream)
+            if session is None:
+                session = requests.Session()
+                session.trust_env = False
+                # Never let one user's cookies stick to the shared session
+                session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=route.pool_size,
+                                      max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[route.upstream] = session
+            return session
+
+    def match(self, path: str) -> Optional[Route]:
+        for route in self.routes:
+            if route.matches(path):
+                return route
+        return None
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def stats(self) -> Dict:
+        return {
+            'upstreams': sorted(self._sessions),
+            'routes': [route.stats() for route in self.routes]
+        }
+
+    def _request_headers(self) -> Dict[str, str]:
+        headers = {name: value for name, value in request.headers.items()
+                   if name.lower() not in HOP_BY_HOP and name.lower() not in ('host', 'content-length')}
+        headers['X-Forwarded-For'] = ', '.join(filter(None, [
+            request.headers.get('X-Forwarded-For'), request.remote_addr]))
+        headers['X-Forwarded-Host'] = request.host
+        headers['X-Forwarded-Proto'] = request.scheme
+        # Responses are relayed undecoded, so only ask for encodings the client accepts
+        headers['Accept-Encoding'] = request.headers.get('Accept-Encoding', 'identity')
+        return headers
+
+    def _request_body(self):
+        length = request.content_length
+        if not length:
+            return None
+        if length <= BUFFER_LIMIT:
+            return request.get_data(cache=False)
+        return _BodyStream(request.stream, length)
+
+    def forward(self, route: Route, path: str) -> Response:
+        url = f"{route.upstream}/{path.lstrip('/')}"
+        route.requests += 1
+        started = time.perf_counter()
+        try:
+            upstream = self._session(route).request(
+                request.method, url,
+                params=request.query_string,
+                headers=self._request_headers(),
+                data=self._request_body(),
+                timeout=route.timeout,
+                stream=True,
+                allow_redirects=False)
+        except requests.Timeout:
+            route.errors += 1
+            route.timeouts += 1
+            logger.warning(f"Upstream timeout: {request.method} {url}")
+            return jsonify({'status': 'error', 'message': f'Upstream {route.upstream} timed out'}), 504
+        except requests.RequestException as e:
+            route.errors += 1
+            logger.error(f"Upstream error: {request.method} {url}: {str(e)}")
+            return jsonify({'status': 'error', 'message': f'Upstream {route.upstream} unavailable'}), 502
+        route.total_latency += time.perf_counter() - started
+
+        # iteritems() keeps repeated headers such as Set-Cookie separate (urllib3 1.x)
+        raw_items = getattr(upstream.raw.headers, 'iteritems', upstream.raw.headers.items)
+        headers = [(name, value) for name, value in raw_items()
+                   if name.lower() not in HOP_BY_HOP]
+        return Response(stream_with_context(self._relay(route, upstream)),
+                        status=upstream.status_code, headers=headers, direct_passthrough=True)
+
+    def _relay(self, route: Route, upstream: requests.Response) -> Iterator[bytes]:
+        raw = upstream.raw
+        try:
+            # Chunked upstreams (SSE, streamed JSON) are relayed chunk by chunk
+            # as they arrive; everything else in fixed-size reads
+            chunks = (raw.read_chunked(decode_content=False) if raw.chunked
+                      else raw.stream(CHUNK_SIZE, decode_content=False))
+            for chunk in chunks:
+                route.bytes_out += len(chunk)
+                yield chunk
+        except Exception as e:
+            route.errors += 1
+            logger.error(f"Upstream stream from {route.upstream} broke: {str(e)}")
+        finally:
+            # Returns the connection to the pool (or drops it if unfinished)
+            upstream.close()
+
+
+def create_gateway_app(config_object: str = 'config.Config') -> Flask:
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    gateway = Gateway(app.config['GATEWAY_ROUTES'])
+    app.extensions['gateway'] = gateway
+
+    @app.route('/api/gateway/stats', methods=['GET'])
+    def gateway_stats():
+        """Per-route request, error, timeout and byte counters"""
+        return jsonify({'status': 'success', 'gateway': gateway.stats()})
+
+    @app.route('/', defaults={'path': ''}, methods=PROXY_METHODS)
+    @app.route('/<path:path>', methods=PROXY_METHODS)
+    def proxy(path):
+        route = gateway.match(request.path)
+        if route is None:
+            return jsonify({'status': 'error', 'message': 'No route'}), 404
+        return gateway.forward(route, request.path)
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Single-origin gateway for the AI Portal services')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    app = create_gateway_app()
+    port = args.port or app.config.get('GATEWAY_PORT', 3050)
+    print(f"🚦 AI Portal gateway on http://localhost:{port}")
+    for route in app.extensions['gateway'].routes:
+        print(f"   - {route.prefix or '/'} -> {route.upstream} (read timeout {route.timeout[1]}s)")
+    app.run(host=args.host, port=port, threaded=True, debug=False, use_reloader=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
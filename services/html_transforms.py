@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Site-wide HTML transform stage.
+
+    python3 -m services.html_transforms [--root .] [--out DIR] [--check] [--only NAME]
+
+Streams ``index.html`` and ``pages/*.html`` through a small HTML tokenizer and
+applies the registered :class:`Injection` s (nav links, the chatbot widget,
+...) at their anchors, e.g. just before ``</body>``. Every injected block is
+wrapped in marker comments::
+
+    <!-- transform:workflow-diagrams-link:begin 3f2a9c1b -->
+    ...
+    <!-- transform:workflow-diagrams-link:end -->
+
+so running the stage again replaces the block instead of adding a second
+copy, and changing an injection updates it everywhere. Files are processed in
+parallel; a file whose content and transform set hash the same as on the last
+run (``.html-transforms.json``) is skipped without being read through the
+tokenizer. Files are rewritten atomically and only when their content changes,
+so no backup copies are made - git history is the backup.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.diagram_history import atomic_write
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.html-transforms.json'
+PAGE_SOURCES = ['index.html', 'pages/*.html']
+CHUNK_SIZE = 64 * 1024
+# Elements whose content is raw text, never markup
+RAW_TEXT_ELEMENTS = {'script', 'style', 'textarea', 'title'}
+TAG_PATTERN = re.compile(r'<(/?)([A-Za-z][^\s/>]*)(?:[^>"\']|"[^"]*"|\'[^\']*\')*>')
+MARKER_PATTERN = re.compile(r'<!--\s*transform:([A-Za-z0-9_-]+):(begin|end)(?:\s+([0-9a-f]+))?\s*-->')
+
+
+class HTMLTokenizer:
+    """Incremental tokenizer: feed text chunks, get back ``(kind, name, raw)`` tokens.
+
+    ``kind`` is ``'start'``, ``'end'``, ``'comment'``, ``'decl'`` or ``'text'``;
+    ``name`` is the lower-cased tag name for tags. Concatenating every ``raw``
+    reproduces the input exactly.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._raw_text: Optional[str] = None
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, str, str]]:
+        self._buffer += chunk
+        return self._tokens(final=False)
+
+    def close(self) -> Iterator[Tuple[str, str, str]]:
+        return self._tokens(final=True)
+
+    def _tokens(self, final: bool) -> Iterator[Tuple[str, str, str]]:
+        while self._buffer:
+            token = self._next(final)
+            if token is None:
+                return
+            yield token
+
+    def _take(self, end: int) -> str:
+        raw, self._buffer = self._buffer[:end], self._buffer[end:]
+        return raw
+
+    def _next(self, final: bool) -> Optional[Tuple[str, str, str]]:
+        buffer = self._buffer
+        if self._raw_text is not None:
+            match = re.search(r'</%s[\s/>]' % self._raw_text, buffer, re.IGNORECASE)
+            if match is None:
+                if not final:
+                    # Keep enough to recognise a closing tag split across chunks
+                    keep = len(self._raw_text) + 3
+                    return ('text', '', self._take(len(buffer) - keep)) if len(buffer) > keep else None
+                return 'text', '', self._take(len(buffer))
+            self._raw_text = None
+            if match.start():
+                return 'text', '', self._take(match.start())
+            buffer = self._buffer
+
+        if not buffer.startswith('<'):
+            end = buffer.find('<')
+            if end == -1:
+                end = len(buffer)
+            return 'text', '', self._take(end)
+        if buffer.startswith('<!--'):
+            end = buffer.find('-->', 4)
+            if end == -1:
+                return ('text', '', self._take(len(buffer))) if final else None
+            return 'comment', '', self._take(end + 3)
+        if buffer.startswith(('<!', '<?')):
+            end = buffer.find('>')
+            if end == -1:
+                return ('text', '', self._take(len(buffer))) if final else None
+            return 'decl', '', self._take(end + 1)
+        match = TAG_PATTERN.match(buffer)
+        if match is None:
+            if not final and (len(buffer) < 2 or buffer[1] == '/' or buffer[1].isalpha()):
+                # Possibly a tag split across chunks
+                return None
+            # A stray '<' is text
+            return 'text', '', self._take(1)
+        name = match.group(2).lower()
+        if match.group(1):
+            return 'end', name, self._take(match.end())
+        if name in RAW_TEXT_ELEMENTS and not match.group(0).endswith('/>'):
+            self._raw_text = name
+        return 'start', name, self._take(match.end())
+
+
+class Injection:
+    """A marked block of HTML inserted at an anchor.
+
+    ``anchor`` is ``'head-end'`` (before ``</head>``), ``'body-start'`` (after
+    ``<body>``) or ``'body-end'`` (before ``</body>``). ``{root}`` in ``html``
+    is replaced by the page's relative path to the site root. The block is not
+    inserted into a page that already has a tag matching ``unless`` outside
+    the markers (e.g. a hand-written copy of the same script).
+    """
+
+    ANCHORS = ('head-end', 'body-start', 'body-end')
+
+    def __init__(self, name: str, html: str, anchor: str = 'body-end', unless: Optional[str] = None):
+        if anchor not in self.ANCHORS:
+            raise ValueError(f'Unknown anchor: {anchor}')
+        self.name = name
+        self.html = html
+        self.anchor = anchor
+        self.unless = re.compile(unless, re.IGNORECASE) if unless else None
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(f'{self.name}\0{self.anchor}\0{self.html}\0'
+                              f'{self.unless.pattern if self.unless else ""}'.encode('utf-8')).hexdigest()[:8]
+
+    def render(self, root: str) -> str:
+        return (f'<!-- transform:{self.name}:begin {self.digest} -->\n'
+                f'{self.html.replace("{root}", root).strip()}\n'
+                f'<!-- transform:{self.name}:end -->\n')
+
+
+_registry: Dict[str, Injection] = {}
+
+
+def register(injection: Injection) -> Injection:
+    _registry[injection.name] = injection
+    return injection
+
+
+def registered() -> List[Injection]:
+    return list(_registry.values())
+
+
+def transforms_hash(injections: List[Injection]) -> str:
+    return hashlib.sha256('\0'.join(injection.digest for injection in injections).encode('utf-8')).hexdigest()
+
+
+register(Injection('workflow-diagrams-link', '''
+<div class="workflow-diagrams-link" style="position: fixed; top: 20px; right: 20px; z-index: 1000;">
+    <a href="{root}workflow-diagrams.html"
+       style="display: inline-flex; align-items: center; gap: 8px; padding: 12px 20px;
+              background: linear-gradient(135deg, #00ff88, #00cc6a);
+              color: #000; text-decoration: none; border-radius: 25px;
+              font-weight: 600; font-size: 14px;
+              box-shadow: 0 4px 15px rgba(0, 255, 136, 0.3);">
+        <i class="fas fa-sitemap"></i>
+        Workflow Diagrams
+    </a>
+</div>
+'''))
+
+register(Injection('chatbot-widget', '''
+<script src="{root}assets/js/enhanced-chatbot-widget-fixed.js" defer></script>
+''', unless=r'<script[^>]+enhanced-chatbot-widget'))
+
+
+def transform_stream(chunks, injections: List[Injection], root: str = '') -> Iterator[str]:
+    """Rewrite a stream of HTML text chunks, yielding output chunks"""
+    by_name = {injection.name: injection for injection in injections}
+    done = set()
+    present = set()
+    skipping: Optional[str] = None
+    # render() ends a block with a newline; the one already following a replaced
+    # block's end marker is that same newline and must not be kept twice
+    after_block = False
+    tokenizer = HTMLTokenizer()
+
+    def insert(anchor: str) -> str:
+        out = []
+        for injection in injections:
+            if injection.anchor == anchor and injection.name not in done and injection.name not in present:
+                out.append(injection.render(root))
+                done.add(injection.name)
+        return ''.join(out)
+
+    def process(tokens) -> Iterator[str]:
+        nonlocal skipping, after_block
+        for kind, name, raw in tokens:
+            if after_block:
+                after_block = False
+                if kind == 'text':
+                    raw = raw[2:] if raw.startswith('\r\n') else raw[1:] if raw.startswith('\n') else raw
+                    if not raw:
+                        continue
+            if kind == 'comment':
+                marker = MARKER_PATTERN.match(raw)
+                # Blocks of transforms that are not being applied are left alone
+                if marker and marker.group(1) in by_name:
+                    marker_name, edge = marker.group(1), marker.group(2)
+                    if edge == 'begin' and skipping is None:
+                        skipping = marker_name
+                        if marker_name not in done and marker_name not in present:
+                            # Refresh the existing block where it stands
+                            yield by_name[marker_name].render(root)
+                            done.add(marker_name)
+                        continue
+                    if edge == 'end' and skipping == marker_name:
+                        skipping = None
+                        after_block = True
+                        continue
+            if skipping is not None:
+                continue
+            if kind == 'start':
+                for injection in injections:
+                    if injection.unless is not None and injection.unless.match(raw):
+                        present.add(injection.name)
+            if kind == 'end' and name in ('head', 'body'):
+                yield insert(f'{name}-end')
+            yield raw
+            if kind == 'start' and name == 'body':
+                yield insert('body-start')
+
+    for chunk in chunks:
+        yield from process(tokenizer.feed(chunk))
+    yield from process(tokenizer.close())
+
+
+def _read_chunks(path: str) -> Iterator[str]:
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), ''):
+            yield chunk
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def transform_file(source: str, target: str, rel_path: str, injections: List[Injection]) -> Dict:
+    """Transform one page; the target is only written when its content changes"""
+    root = '../' * rel_path.count('/')
+    output = ''.join(transform_stream(_read_chunks(source), injections, root)).encode('utf-8')
+    changed = True
+    if os.path.exists(target) and os.path.getsize(target) == len(output):
+        with open(target, 'rb') as f:
+            changed = f.read() != output
+    if changed:
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        atomic_write(target, output)
+    return {'path': rel_path, 'changed': changed, 'hash': hashlib.sha256(output).hexdigest()}
+
+
+class TransformPipeline:
+    def __init__(self, root: str = '.', out_dir: Optional[str] = None,
+                 injections: Optional[List[Injection]] = None, workers: Optional[int] = None):
+        self.root = root
+        self.out_dir = out_dir
+        self.injections = injections if injections is not None else registered()
+        self.workers = workers or os.cpu_count() or 1
+        self.manifest_path = os.path.join(out_dir or root, MANIFEST_NAME)
+
+    def pages(self) -> List[str]:
+        pages = []
+        for pattern in PAGE_SOURCES:
+            for path in sorted(glob.glob(os.path.join(self.root, pattern))):
+                pages.append(os.path.relpath(path, self.root).replace(os.sep, '/'))
+        return pages
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def run(self, check: bool = False) -> Dict:
+        """Apply the injections; with ``check`` nothing is written, changes are only reported"""
+        manifest = self._load_manifest()
+        signature = transforms_hash(self.injections)
+        recorded = manifest.get('files', {}) if manifest.get('transforms') == signature else {}
+        pending, skipped, files = [], [], {}
+        for rel_path in self.pages():
+            source = os.path.join(self.root, rel_path)
+            target = os.path.join(self.out_dir, rel_path) if self.out_dir else source
+            current = file_hash(source)
+            entry = recorded.get(rel_path)
+            if entry and entry['input'] == current and os.path.exists(target) and file_hash(target) == entry['output']:
+                skipped.append(rel_path)
+                files[rel_path] = entry
+            else:
+                pending.append((rel_path, source, target, current))
+
+        changed = []
+        if check:
+            for rel_path, source, target, _ in pending:
+                output = ''.join(transform_stream(_read_chunks(source), self.injections,
+                                                  '../' * rel_path.count('/')))
+                # Compare with what would be overwritten: the target, or the page itself in place
+                if not os.path.exists(target):
+                    changed.append(rel_path)
+                    continue
+                with open(target, 'r', encoding='utf-8', newline='') as f:
+                    if f.read() != output:
+                        changed.append(rel_path)
+            return {'pages': len(skipped) + len(pending), 'skipped': len(skipped), 'changed': changed}
+
+        with ProcessPoolExecutor(max_workers=min(self.workers, max(len(pending), 1))) as executor:
+            futures = [(rel_path, current, executor.submit(transform_file, source, target, rel_path,
+                                                           self.injections))
+                       for rel_path, source, target, current in pending]
+            for rel_path, current, future in futures:
+                result = future.result()
+                if result['changed']:
+                    changed.append(rel_path)
+                # In-place, the rewritten file is the next run's input
+                files[rel_path] = {'input': result['hash'] if self.out_dir is None else current,
+                                   'output': result['hash']}
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        atomic_write(self.manifest_path, json.dumps({'transforms': signature, 'files': files},
+                                                    indent=1, sort_keys=True).encode('utf-8'))
+        return {'pages': len(files), 'skipped': len(skipped), 'changed': changed}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Apply registered HTML injections to the site pages')
+    parser.add_argument('--root', default='.')
+    parser.add_argument('--out', default=None, help='Write transformed pages here instead of in place')
+    parser.add_argument('--only', action='append', default=None, help='Apply only this transform (repeatable)')
+    parser.add_argument('--check', action='store_true', help='Report pages that would change; write nothing')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    injections = registered()
+    if args.only:
+        unknown = set(args.only) - {injection.name for injection in injections}
+        if unknown:
+            print(f"❌ Unknown transform(s): {', '.join(sorted(unknown))}")
+            return 2
+        injections = [injection for injection in injections if injection.name in args.only]
+
+    pipeline = TransformPipeline(args.root, args.out, injections, args.workers)
+    print(f"🔧 Applying {', '.join(injection.name for injection in injections)}")
+    result = pipeline.run(check=args.check)
+    for rel_path in result['changed']:
+        print(f"   {'would update' if args.check else 'updated'} {rel_path}")
+    print(f"✅ {result['pages']} pages, {len(result['changed'])} changed, {result['skipped']} unchanged since last run")
+    return 1 if args.check and result['changed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,483 @@
+"""
+Log Dashboard backend: live tail and indexed search over the portal's logs.
+
+- ``LogTailer`` follows each configured log file (inotify on Linux, stat
+  polling elsewhere), survives rotation/truncation and hands new lines over in
+  batches.
+- ``LogIndex`` keeps a rolling, time-bucketed inverted index of recent lines
+  (level, service, request id and keywords) with a hard cap on the number of
+  lines held, so searches never grep whole files.
+- Subscribers receive new lines over the portal's SocketIO instance
+  (``logs_subscribe``) with a per-client token-bucket rate limit, sent within
+  the connection's backpressure budget (``services.realtime.ConnectionTracker``).
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import re
+import select
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set
+
+from flask import Blueprint, jsonify, request
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEVEL_PATTERN = re.compile(r'\b(DEBUG|INFO|WARN(?:ING)?|ERROR|CRITICAL|FATAL)\b', re.IGNORECASE)
+REQUEST_ID_PATTERN = re.compile(
+    r'(?:request[_-]?id|req[_-]?id|rid)["\']?\s*[=:]\s*["\']?([\w-]{4,})', re.IGNORECASE)
+WORD_PATTERN = re.compile(r'[a-z0-9_]{3,32}')
+LEVEL_ALIASES = {'warn': 'warning', 'fatal': 'critical'}
+
+
+def parse_line(service: str, text: str, ts: float) -> Dict:
+    """Structured view of a raw log line"""
+    level_match = LEVEL_PATTERN.search(text)
+    level = level_match.group(1).lower() if level_match else 'info'
+    request_match = REQUEST_ID_PATTERN.search(text)
+    return {
+        'ts': ts,
+        'service': service,
+        'level': LEVEL_ALIASES.get(level, level),
+        'request_id': request_match.group(1) if request_match else None,
+        'text': text
+    }
+
+
+def line_terms(entry: Dict) -> Set[str]:
+    terms = {f"service:{entry['service']}", f"level:{entry['level']}"}
+    if entry['request_id']:
+        terms.add(f"rid:{entry['request_id'].lower()}")
+    terms.update(WORD_PATTERN.findall(entry['text'].lower()))
+    return terms
+
+
+class LogIndex:
+    """Rolling inverted index over recent log lines.
+
+    Lines are grouped into ``bucket_seconds`` buckets, each with its own
+    postings (term -> line offsets). A bucket holds at most
+    ``max_lines // BUCKET_SEGMENTS`` lines; a burst that fills it continues in
+    a new bucket with the same start. When more than ``max_lines`` lines are
+    held the oldest bucket is dropped whole, so memory stays bounded even
+    within one time window and expiry is O(1) per bucket.
+    """
+
+    BUCKET_SEGMENTS = 16
+
+    def __init__(self, bucket_seconds: int = 300, max_lines: int = 200000):
+        self.bucket_seconds = bucket_seconds
+        self.max_lines = max_lines
+        self.max_bucket_lines = max(1, max_lines // self.BUCKET_SEGMENTS)
+        self._lock = threading.Lock()
+        # deque of (bucket start, lines, postings)
+        self._buckets: deque = deque()
+        self._line_count = 0
+
+    def add(self, entries: List[Dict]):
+        with self._lock:
+            for entry in entries:
+                start = int(entry['ts'] // self.bucket_seconds * self.bucket_seconds)
+                last_start = self._buckets[-1][0] if self._buckets else None
+                if (last_start is None or last_start < start
+                        or len(self._buckets[-1][1]) >= self.max_bucket_lines):
+                    # Starts never decrease, so search can stop at the first bucket before ``since``
+                    self._buckets.append((start if last_start is None else max(start, last_start), [], {}))
+                _, lines, postings = self._buckets[-1]
+                offset = len(lines)
+                lines.append(entry)
+                for term in line_terms(entry):
+                    postings.setdefault(term, []).append(offset)
+                self._line_count += 1
+            while self._line_count > self.max_lines and len(self._buckets) > 1:
+                self._line_count -= len(self._buckets.popleft()[1])
+
+    def search(self, keywords: str = '', level: Optional[str] = None, service: Optional[str] = None,
+               request_id: Optional[str] = None, since: Optional[float] = None,
+               until: Optional[float] = None, limit: int = 100) -> List[Dict]:
+        """Newest-first lines matching every given criterion"""
+        terms = WORD_PATTERN.findall((keywords or '').lower())
+        if level:
+            level = level.lower()
+            terms.append(f"level:{LEVEL_ALIASES.get(level, level)}")
+        if service:
+            terms.append(f"service:{service}")
+        if request_id:
+            terms.append(f"rid:{request_id.lower()}")
+
+        results = []
+        with self._lock:
+            for start, lines, postings in reversed(self._buckets):
+                if since is not None and start + self.bucket_seconds <= since:
+                    break
+                if until is not None and start > until:
+                    continue
+                if terms:
+                    lists = [postings.get(term) for term in terms]
+                    if not all(lists):
+                        continue
+                    # Intersect starting from the rarest term
+                    lists.sort(key=len)
+                    offsets = set(lists[0])
+                    for other in lists[1:]:
+                        offsets.intersection_update(other)
+                    candidates = sorted(offsets, reverse=True)
+                else:
+                    candidates = range(len(lines) - 1, -1, -1)
+                for offset in candidates:
+                    entry = lines[offset]
+                    if (since is not None and entry['ts'] < since) or (until is not None and entry['ts'] > until):
+                        continue
+                    results.append(entry)
+                    if len(results) >= limit:
+                        return results
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'lines': self._line_count,
+                'max_lines': self.max_lines,
+                'buckets': len(self._buckets),
+                'oldest': self._buckets[0][0] if self._buckets else None,
+                'terms': sum(len(postings) for _, _, postings in self._buckets)
+            }
+
+
+class _Inotify:
+    """Minimal ctypes binding for Linux inotify (directory watches)"""
+
+    IN_MODIFY = 0x00000002
+    IN_CREATE = 0x00000100
+    IN_MOVED_TO = 0x00000080
+    IN_CLOEXEC = 0o2000000
+    IN_NONBLOCK = 0o4000
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(self.IN_CLOEXEC | self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+    def watch(self, directory: str):
+        mask = self.IN_MODIFY | self.IN_CREATE | self.IN_MOVED_TO
+        if self._libc.inotify_add_watch(self.fd, directory.encode(), mask) < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed for {directory}')
+
+    def wait(self, timeout: float) -> bool:
+        """Wait for any event; returns True if something changed"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 64 * (struct.calcsize('iIII') + 256)):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _FollowedFile:
+    """One log file followed across rotation and truncation"""
+
+    def __init__(self, service: str, path: str, from_end: bool = True):
+        self.service = service
+        self.path = path
+        self._file = None
+        self._inode = None
+        self._partial = b''
+        self._open(seek_end=from_end)
+
+    def _open(self, seek_end: bool):
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            self._file = None
+            self._inode = None
+            return
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        if seek_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def read_lines(self) -> List[str]:
+        lines = self._drain()
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return lines
+        if self._file is None or stat.st_ino != self._inode:
+            # Rotated (or created): finish the old file above, then read the new one from the start
+            if self._file:
+                self._file.close()
+            self._partial = b''
+            self._open(seek_end=False)
+            lines.extend(self._drain())
+        elif stat.st_size < self._file.tell():
+            # Truncated in place
+            self._file.seek(0)
+            self._partial = b''
+            lines.extend(self._drain())
+        return lines
+
+    def _drain(self) -> List[str]:
+        if self._file is None:
+            return []
+        data = self._file.read()
+        if not data:
+            return []
+        data = self._partial + data
+        *complete, self._partial = data.split(b'\n')
+        return [line.decode('utf-8', 'replace').rstrip('\r') for line in complete if line]
+
+    def close(self):
+        if self._file:
+            self._file.close()
+
+
+class LogTailer:
+    """Background thread following several log files"""
+
+    def __init__(self, sources: Dict[str, str], on_lines: Callable[[List[Dict]], None],
+                 poll_interval: float = 0.5, from_end: bool = True):
+        self.sources = sources
+        self.on_lines = on_lines
+        self.poll_interval = poll_interval
+        self._files = [_FollowedFile(service, path, from_end) for service, path in sources.items()]
+        self._stop = threading.Event()
+        self._inotify = None
+        try:
+            self._inotify = _Inotify()
+            for directory in {os.path.dirname(os.path.abspath(path)) for path in sources.values()}:
+                if os.path.isdir(directory):
+                    self._inotify.watch(directory)
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify unavailable ({str(e)}), polling log files every {poll_interval}s")
+            if self._inotify:
+                self._inotify.close()
+            self._inotify = None
+        self.mode = 'inotify' if self._inotify else 'polling'
+        self.lines_read = 0
+        self._thread = threading.Thread(target=self._run, name='log-tailer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(2)
+        for followed in self._files:
+            followed.close()
+        if self._inotify:
+            self._inotify.close()
+
+    def poll_once(self) -> int:
+        now = time.time()
+        entries = []
+        for followed in self._files:
+            entries.extend(parse_line(followed.service, line, now) for line in followed.read_lines())
+        if entries:
+            self.lines_read += len(entries)
+            self.on_lines(entries)
+        return len(entries)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Log tailer error: {str(e)}")
+            if self._inotify:
+                # Still wake up periodically to catch rotation into new directories
+                self._inotify.wait(5.0)
+            else:
+                self._stop.wait(self.poll_interval)
+
+
+class _Subscriber:
+    """Per-client filters and token bucket"""
+
+    def __init__(self, services: Optional[List[str]], level: Optional[str], rate: float, burst: int):
+        self.services = set(services) if services else None
+        self.level = level.lower() if level else None
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.dropped = 0
+
+    def wants(self, entry: Dict) -> bool:
+        if self.services and entry['service'] not in self.services:
+            return False
+        return not self.level or LEVEL_ALIASES.get(self.level, self.level) == entry['level']
+
+    def take(self, wanted: int) -> int:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        granted = min(wanted, int(self.tokens))
+        self.tokens -= granted
+        self.dropped += wanted - granted
+        return granted
+
+
+class LogService:
+    """Ties the tailer, the index and SocketIO subscribers together"""
+
+    def __init__(self, sources: Dict[str, str], socketio=None, bucket_seconds: int = 300,
+                 max_lines: int = 200000, default_rate: float = 50, default_burst: int = 200,
+                 connection_tracker=None):
+        self.sources = sources
+        self.socketio = socketio
+        self.connection_tracker = connection_tracker
+        self.index = LogIndex(bucket_seconds, max_lines)
+        self.recent: deque = deque(maxlen=1000)
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._subscribers: Dict[str, _Subscriber] = {}
+        self._lock = threading.Lock()
+        self.tailer = LogTailer(sources, self._on_lines)
+
+    def start(self):
+        self.tailer.start()
+
+    def subscribe(self, sid: str, services: Optional[List[str]] = None, level: Optional[str] = None,
+                  rate: Optional[float] = None):
+        rate = min(float(rate or self.default_rate), self.default_rate)
+        with self._lock:
+            self._subscribers[sid] = _Subscriber(services, level, rate, self.default_burst)
+
+    def unsubscribe(self, sid: str):
+        with self._lock:
+            self._subscribers.pop(sid, None)
+
+    def _on_lines(self, entries: List[Dict]):
+        self.index.add(entries)
+        self.recent.extend(entries)
+        if self.socketio is None:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for sid, subscriber in subscribers:
+            matching = [entry for entry in entries if subscriber.wants(entry)]
+            if not matching:
+                continue
+            granted = subscriber.take(len(matching))
+            # Under pressure keep the newest lines
+            if granted and not self._emit(sid, 'log_lines', {'lines': matching[-granted:]}):
+                # The client is not keeping up with the socket either
+                subscriber.dropped += granted
+                granted = 0
+            if granted < len(matching):
+                self._emit(sid, 'log_lines_dropped', {
+                    'dropped': len(matching) - granted,
+                    'total_dropped': subscriber.dropped
+                })
+
+    def _emit(self, sid: str, event: str, data: Dict) -> bool:
+        if self.connection_tracker is None:
+            self.socketio.emit(event, data, to=sid)
+            return True
+        return self.connection_tracker.emit_to(self.socketio, sid, event, data)
+
+    def stats(self) -> Dict:
+        return {
+            'mode': self.tailer.mode,
+            'sources': self.sources,
+            'lines_read': self.tailer.lines_read,
+            'subscribers': len(self._subscribers),
+            'index': self.index.stats()
+        }
+
+
+logs_bp = Blueprint('logs', __name__, url_prefix='/api/logs')
+log_service: Optional[LogService] = None
+
+
+def init_log_service(app, socketio, connection_tracker) -> LogService:
+    """Start tailing the configured logs and register the SocketIO handlers"""
+    global log_service
+
+    sources = dict(app.config.get('LOG_SOURCES') or {})
+    sources.setdefault('portal', app.config.get('LOG_FILE', 'ai_portal.log'))
+    log_service = LogService(
+        sources, socketio,
+        bucket_seconds=app.config.get('LOG_INDEX_BUCKET_SECONDS', 300),
+        max_lines=app.config.get('LOG_INDEX_MAX_LINES', 200000),
+        default_rate=app.config.get('LOG_STREAM_RATE', 50),
+        default_burst=app.config.get('LOG_STREAM_BURST', 200),
+        connection_tracker=connection_tracker)
+
+    @socketio.on('logs_subscribe')
+    def handle_logs_subscribe(data=None):
+        data = data or {}
+        log_service.subscribe(request.sid, data.get('services'), data.get('level'), data.get('rate'))
+        return {'status': 'subscribed', 'sources': list(log_service.sources)}
+
+    @socketio.on('logs_unsubscribe')
+    def handle_logs_unsubscribe(data=None):
+        log_service.unsubscribe(request.sid)
+
+    connection_tracker.on_disconnect(log_service.unsubscribe)
+
+    log_service.start()
+    logger.info(f"Log service tailing {len(sources)} files ({log_service.tailer.mode})")
+    return log_service
+
+
+@logs_bp.route('/search', methods=['GET'])
+def search_logs():
+    """Search recent logs (?q=&level=&service=&request_id=&since=&until=&limit=)"""
+    try:
+        started = time.perf_counter()
+        results = log_service.index.search(
+            keywords=request.args.get('q', ''),
+            level=request.args.get('level'),
+            service=request.args.get('service'),
+            request_id=request.args.get('request_id'),
+            since=request.args.get('since', type=float),
+            until=request.args.get('until', type=float),
+            limit=min(request.args.get('limit', 100, type=int), 1000))
+        return jsonify({
+            'status': 'success',
+            'results': results,
+            'count': len(results),
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+    except Exception as e:
+        logger.error(f"Error searching logs: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to search logs: {str(e)}'
+        }), 500
+
+
+@logs_bp.route('/tail', methods=['GET'])
+def tail_logs():
+    """Most recent lines, optionally for one service (?service=&lines=)"""
+    service = request.args.get('service')
+    count = max(0, min(request.args.get('lines', 100, type=int), 1000))
+    lines = [entry for entry in log_service.recent if not service or entry['service'] == service]
+    return jsonify({
+        'status': 'success',
+        'lines': lines[len(lines) - count:] if count else []
+    })
+
+
+@logs_bp.route('/stats', methods=['GET'])
+def log_stats():
+    """Tailer mode, sources and index size"""
+    return jsonify({
+        'status': 'success',
+        'logs': log_service.stats()
+    })
@@ -0,0 +1,360 @@
+"""
+System metrics sampler for the Server Management dashboard.
+
+A background thread reads CPU, memory, disk, network and per-service process
+stats straight from ``/proc`` once per interval (no subprocesses, no psutil).
+Each metric lives in fixed-size, array-backed ring buffers at three
+resolutions (1s, 1m, 1h); coarser rings are fed by averaging the finer
+samples, so memory is constant no matter how long the portal runs.
+"""
+
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from flask import Blueprint, jsonify, request
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# resolution -> (seconds per point, points kept)
+RESOLUTIONS = {
+    '1s': (1, 3600),     # last hour
+    '1m': (60, 1440),    # last day
+    '1h': (3600, 720),   # last 30 days
+}
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class RingBuffer:
+    """Fixed-capacity (timestamp, value) ring backed by two C double arrays"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._ts = array('d', bytes(8 * capacity))
+        self._values = array('d', bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+
+    def append(self, ts: float, value: float):
+        self._ts[self._next] = ts
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def points(self, since: Optional[float] = None) -> List[Tuple[float, float]]:
+        """Oldest-first points, optionally only those newer than ``since``"""
+        start = (self._next - self._size) % self.capacity
+        result = []
+        for i in range(self._size):
+            index = (start + i) % self.capacity
+            if since is None or self._ts[index] > since:
+                result.append((self._ts[index], self._values[index]))
+        return result
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        if not self._size:
+            return None
+        index = (self._next - 1) % self.capacity
+        return self._ts[index], self._values[index]
+
+
+class MultiResolutionSeries:
+    """One metric at 1s/1m/1h resolution; coarser points are means of finer ones"""
+
+    def __init__(self):
+        self.rings = {name: RingBuffer(capacity) for name, (_, capacity) in RESOLUTIONS.items()}
+        # resolution -> [bucket start, sum, count] being accumulated
+        self._pending = {name: [None, 0.0, 0] for name in RESOLUTIONS if name != '1s'}
+
+    def add(self, ts: float, value: float):
+        self.rings['1s'].append(ts, value)
+        for name, state in self._pending.items():
+            width = RESOLUTIONS[name][0]
+            bucket = ts // width * width
+            if state[0] is not None and bucket != state[0]:
+                self.rings[name].append(state[0], state[1] / state[2])
+                state[1], state[2] = 0.0, 0
+            state[0] = bucket
+            state[1] += value
+            state[2] += 1
+
+
+def _read(path: str) -> str:
+    with open(path, 'r') as f:
+        return f.read()
+
+
+class SystemSampler:
+    """Samples /proc at a fixed interval into multi-resolution series"""
+
+    def __init__(self, services: Optional[Dict[str, str]] = None, interval: float = 1.0,
+                 disk_path: str = '/', proc_root: str = '/proc', rescan_every: int = 30):
+        self.services = services or {}
+        self.interval = interval
+        self.disk_path = disk_path
+        self.proc_root = proc_root
+        self.rescan_every = rescan_every
+        self.available = os.path.exists(os.path.join(proc_root, 'stat'))
+        self.series: Dict[str, MultiResolutionSeries] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners = []
+
+        self._last_cpu: Optional[Tuple[int, int]] = None
+        self._last_net: Optional[Tuple[float, int, int]] = None
+        self._service_pids: Dict[str, List[int]] = {}
+        self._last_proc_ticks: Dict[str, Tuple[float, int]] = {}
+        self._samples = 0
+        self._sampler_cpu = 0.0
+
+    def add_listener(self, callback):
+        """Call ``callback(snapshot)`` after every sample"""
+        self._listeners.append(callback)
+
+    def start(self):
+        if not self.available:
+            logger.info(f"{self.proc_root} not available, system metrics sampler disabled")
+            return
+        self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(2)
+
+    # Sampling ----------------------------------------------------------
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            cpu_before = time.thread_time()
+            try:
+                snapshot = self.sample()
+                for listener in self._listeners:
+                    listener(snapshot)
+            except Exception as e:
+                logger.error(f"Metrics sample failed: {str(e)}")
+            self._sampler_cpu += time.thread_time() - cpu_before
+            next_tick += self.interval
+            self._stop.wait(max(0.0, next_tick - time.monotonic()))
+
+    def sample(self) -> Dict[str, float]:
+        ts = time.time()
+        values: Dict[str, float] = {}
+        self._sample_cpu(values)
+        self._sample_memory(values)
+        self._sample_disk(values)
+        self._sample_network(ts, values)
+        if self._samples % self.rescan_every == 0:
+            self._rescan_services()
+        self._sample_services(ts, values)
+        self._samples += 1
+
+        with self._lock:
+            for name, value in values.items():
+                series = self.series.get(name)
+                if series is None:
+                    series = self.series[name] = MultiResolutionSeries()
+                series.add(ts, value)
+        return {'ts': ts, **values}
+
+    def _sample_cpu(self, values: Dict[str, float]):
+        fields = _read(os.path.join(self.proc_root, 'stat')).split('\n', 1)[0].split()[1:]
+        ticks = [int(field) for field in fields]
+        idle = ticks[3] + (ticks[4] if len(ticks) > 4 else 0)
+        total = sum(ticks[:8])
+        if self._last_cpu:
+            total_delta = total - self._last_cpu[0]
+            idle_delta = idle - self._last_cpu[1]
+            if total_delta > 0:
+                values['cpu.percent'] = round(100.0 * (total_delta - idle_delta) / total_delta, 2)
+        self._last_cpu = (total, idle)
+        load1 = _read(os.path.join(self.proc_root, 'loadavg')).split()[0]
+        values['cpu.load1'] = float(load1)
+
+    def _sample_memory(self, values: Dict[str, float]):
+        meminfo = {}
+        for line in _read(os.path.join(self.proc_root, 'meminfo')).splitlines():
+            key, _, rest = line.partition(':')
+            if key in ('MemTotal', 'MemAvailable', 'SwapTotal', 'SwapFree'):
+                meminfo[key] = int(rest.split()[0]) * 1024
+        total = meminfo.get('MemTotal', 0)
+        if total:
+            used = total - meminfo.get('MemAvailable', 0)
+            values['memory.used_bytes'] = used
+            values['memory.percent'] = round(100.0 * used / total, 2)
+        if meminfo.get('SwapTotal'):
+            values['swap.percent'] = round(
+                100.0 * (meminfo['SwapTotal'] - meminfo.get('SwapFree', 0)) / meminfo['SwapTotal'], 2)
+
+    def _sample_disk(self, values: Dict[str, float]):
+        stat = os.statvfs(self.disk_path)
+        total = stat.f_blocks * stat.f_frsize
+        if total:
+            free = stat.f_bavail * stat.f_frsize
+            values['disk.free_bytes'] = free
+            values['disk.percent'] = round(100.0 * (total - free) / total, 2)
+
+    def _sample_network(self, ts: float, values: Dict[str, float]):
+        rx = tx = 0
+        for line in _read(os.path.join(self.proc_root, 'net', 'dev')).splitlines()[2:]:
+            name, _, counters = line.partition(':')
+            if name.strip() == 'lo':
+                continue
+            fields = counters.split()
+            rx += int(fields[0])
+            tx += int(fields[8])
+        if self._last_net:
+            elapsed = ts - self._last_net[0]
+            if elapsed > 0:
+                values['network.rx_bytes_per_sec'] = round(max(0, rx - self._last_net[1]) / elapsed, 1)
+                values['network.tx_bytes_per_sec'] = round(max(0, tx - self._last_net[2]) / elapsed, 1)
+        self._last_net = (ts, rx, tx)
+
+    def _rescan_services(self):
+        """Map each service to the pids whose command line contains its pattern"""
+        if not self.services:
+            return
+        found: Dict[str, List[int]] = {name: [] for name in self.services}
+        for entry in os.listdir(self.proc_root):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(os.path.join(self.proc_root, entry, 'cmdline'), 'rb') as f:
+                    cmdline = f.read().replace(b'\0', b' ').decode('utf-8', 'replace')
+            except OSError:
+                continue
+            for name, pattern in self.services.items():
+                if pattern in cmdline:
+                    found[name].append(int(entry))
+        self._service_pids = found
+
+    def _sample_services(self, ts: float, values: Dict[str, float]):
+        for name, pids in self._service_pids.items():
+            ticks = rss = 0
+            alive = 0
+            for pid in pids:
+                try:
+                    stat = _read(os.path.join(self.proc_root, str(pid), 'stat'))
+                    statm = _read(os.path.join(self.proc_root, str(pid), 'statm'))
+                except OSError:
+                    continue
+                # Fields after the parenthesised command name; utime/stime are 14th/15th overall
+                fields = stat.rsplit(')', 1)[1].split()
+                ticks += int(fields[11]) + int(fields[12])
+                rss += int(statm.split()[1]) * PAGE_SIZE
+                alive += 1
+            values[f'service.{name}.up'] = 1.0 if alive else 0.0
+            if not alive:
+                self._last_proc_ticks.pop(name, None)
+                continue
+            values[f'service.{name}.rss_bytes'] = rss
+            last = self._last_proc_ticks.get(name)
+            if last and ts > last[0] and ticks >= last[1]:
+                values[f'service.{name}.cpu_percent'] = round(
+                    100.0 * (ticks - last[1]) / CLOCK_TICKS / (ts - last[0]), 2)
+            self._last_proc_ticks[name] = (ts, ticks)
+
+    # Queries -----------------------------------------------------------
+
+    def metric_names(self) -> List[str]:
+        with self._lock:
+            return sorted(self.series)
+
+    def query(self, names: List[str], resolution: str = '1s',
+              since: Optional[float] = None) -> Dict[str, List[Tuple[float, float]]]:
+        with self._lock:
+            return {name: self.series[name].rings[resolution].points(since)
+                    for name in names if name in self.series}
+
+    def latest(self) -> Dict[str, float]:
+        with self._lock:
+            result = {}
+            for name, series in self.series.items():
+                point = series.rings['1s'].latest()
+                if point:
+                    result[name] = point[1]
+            return result
+
+    def stats(self) -> Dict:
+        elapsed = self._samples * self.interval
+        return {
+            'available': self.available,
+            'interval': self.interval,
+            'samples': self._samples,
+            'metrics': len(self.series),
+            'services': {name: len(pids) for name, pids in self._service_pids.items()},
+            # Share of one CPU spent sampling
+            'sampler_cpu_percent': round(100.0 * self._sampler_cpu / elapsed, 4) if elapsed else None
+        }
+
+
+server_bp = Blueprint('server_metrics', __name__, url_prefix='/api/server')
+metrics_sampler: Optional[SystemSampler] = None
+
+METRICS_ROOM = 'server_metrics'
+
+
+def init_metrics_sampler(app, socketio) -> SystemSampler:
+    """Start sampling and push each sample to the 'server_metrics' SocketIO room"""
+    global metrics_sampler
+    from flask_socketio import join_room, leave_room
+
+    metrics_sampler = SystemSampler(
+        services=app.config.get('METRICS_SERVICES'),
+        interval=app.config.get('METRICS_SAMPLE_INTERVAL', 1.0),
+        disk_path=app.config.get('METRICS_DISK_PATH', '/'))
+    metrics_sampler.add_listener(
+        lambda snapshot: socketio.emit('server_metrics', snapshot, to=METRICS_ROOM))
+
+    @socketio.on('server_metrics_subscribe')
+    def handle_metrics_subscribe(data=None):
+        join_room(METRICS_ROOM)
+        return {'status': 'subscribed', 'latest': metrics_sampler.latest()}
+
+    @socketio.on('server_metrics_unsubscribe')
+    def handle_metrics_unsubscribe(data=None):
+        leave_room(METRICS_ROOM)
+
+    metrics_sampler.start()
+    return metrics_sampler
+
+
+@server_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Metric series (?metric=cpu.percent&metric=...&resolution=1s|1m|1h&since=)"""
+    resolution = request.args.get('resolution', '1s')
+    if resolution not in RESOLUTIONS:
+        return jsonify({
+            'status': 'error',
+            'message': f"resolution must be one of {', '.join(RESOLUTIONS)}"
+        }), 400
+    names = request.args.getlist('metric') or metrics_sampler.metric_names()
+    series = metrics_sampler.query(names, resolution, request.args.get('since', type=float))
+    return jsonify({
+        'status': 'success',
+        'resolution': resolution,
+        'series': {name: [[ts, value] for ts, value in points] for name, points in series.items()}
+    })
+
+
+@server_bp.route('/metrics/latest', methods=['GET'])
+def get_latest_metrics():
+    """Most recent value of every metric"""
+    return jsonify({
+        'status': 'success',
+        'metrics': metrics_sampler.latest(),
+        'sampler': metrics_sampler.stats()
+    })
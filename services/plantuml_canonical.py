@@ -0,0 +1,227 @@
+"""
+Canonical form of PlantUML sources and the render cache keyed by it.
+
+Two sources that differ only cosmetically render the same diagram, so they
+should share one rendered artifact. :func:`canonicalize` normalises every
+``@startuml`` ... ``@enduml`` block of a source:
+
+- line endings become ``\\n``, a BOM and trailing whitespace are dropped
+- ``'`` line comments and ``/' ... '/`` block comments are removed
+- indentation, blank lines and repeated spaces outside labels are dropped,
+  except inside text blocks (multi-line notes, legends, titles,
+  headers/footers, activity labels), where they are displayed
+- runs of ``skinparam`` lines are sorted when no key repeats (a repeated key
+  is an override, so its order matters)
+
+Other diagram blocks (``@startyaml``, ``@startjson``, ``@startditaa``,
+``@startsalt``, ...) give meaning to whitespace, so they are kept byte for
+byte after line-ending normalisation.
+
+:func:`canonical_hash` hashes that form; :class:`RenderCache` stores rendered
+output under ``(canonical hash, format)``, passing each new artifact through
+an optional :class:`~services.render_optimizer.RenderOptimizer` first. Sources
+using ``!include`` or ``!import`` depend on other files and are never cached.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import List, Optional
+
+from services.diagram_history import atomic_write
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump when canonicalize() changes, so old cache entries are not reused
+CANONICAL_VERSION = 2
+
+# Multi-line blocks whose content is displayed text: start pattern -> end pattern
+TEXT_BLOCKS = [
+    (re.compile(r'^[rh]?note\b(?!.*:)', re.IGNORECASE), re.compile(r'^end\s?note$', re.IGNORECASE)),
+    (re.compile(r'^legend\b', re.IGNORECASE), re.compile(r'^end\s?legend$', re.IGNORECASE)),
+    (re.compile(r'^(title|header|footer|caption)$', re.IGNORECASE),
+     re.compile(r'^end\s?(title|header|footer|caption)$', re.IGNORECASE)),
+    # Activity label spanning lines: ':first line' ... 'last line;'
+    (re.compile(r'^:(?!.*[;|<>\]}/]$)'), re.compile(r'[;|<>\]}/]$')),
+]
+SKINPARAM_RE = re.compile(r'^skinparam\s+(\S+)\s+\S', re.IGNORECASE)
+START_RE = re.compile(r'^\s*@start(\w+)', re.IGNORECASE)
+END_RE = re.compile(r'^\s*@end(\w+)', re.IGNORECASE)
+INCLUDE_RE = re.compile(r'^\s*!(include|includeurl|includesub|import)\b', re.IGNORECASE | re.MULTILINE)
+
+
+def _strip_block_comments(lines: List[str]) -> List[str]:
+    out = []
+    in_comment = False
+    for line in lines:
+        stripped = line.strip()
+        if in_comment:
+            if stripped.endswith("'/"):
+                in_comment = False
+            continue
+        if stripped.startswith("/'"):
+            if not stripped.endswith("'/") or stripped == "/'/":
+                in_comment = True
+            continue
+        out.append(line)
+    return out
+
+
+def _sort_skinparams(lines: List[str]) -> List[str]:
+    out: List[str] = []
+    run: List[str] = []
+
+    def flush():
+        keys = [SKINPARAM_RE.match(line).group(1).lower() for line in run]
+        out.extend(sorted(run, key=str.lower) if len(set(keys)) == len(keys) else run)
+        run.clear()
+
+    for line in lines:
+        if SKINPARAM_RE.match(line) and not line.rstrip().endswith('{'):
+            run.append(line)
+            continue
+        if run:
+            flush()
+        out.append(line)
+    if run:
+        flush()
+    return out
+
+
+def _collapse_spaces(line: str) -> str:
+    """Collapse whitespace runs up to the first label (':' or quote), which is displayed text"""
+    match = re.search(r'[:"\[]', line)
+    head, tail = (line[:match.start()], line[match.start():]) if match else (line, '')
+    return re.sub(r'[ \t]+', ' ', head) + tail
+
+
+def _canonicalize_uml(lines: List[str]) -> List[str]:
+    """Cosmetics-free lines of one ``@startuml`` block"""
+    lines = _strip_block_comments(lines)
+    structural: List[str] = []
+    block_end = None
+    for line in lines:
+        if block_end is not None:
+            # Text block content is kept as written, minus trailing whitespace
+            structural.append(line.rstrip())
+            if block_end.search(line.strip()):
+                block_end = None
+            continue
+        stripped = line.strip()
+        if not stripped or stripped.startswith("'"):
+            continue
+        structural.append(_collapse_spaces(stripped))
+        for start, end in TEXT_BLOCKS:
+            if start.search(stripped):
+                block_end = end
+                break
+    return _sort_skinparams(structural)
+
+
+def canonicalize(source: str) -> str:
+    """Cosmetics-free form of a PlantUML source (see module docstring)"""
+    text = source.lstrip('\ufeff').replace('\r\n', '\n').replace('\r', '\n')
+    out: List[str] = []
+    block: List[str] = []
+    kind = None
+    for line in text.split('\n'):
+        if kind is None:
+            start = START_RE.match(line)
+            if start:
+                kind = start.group(1).lower()
+            elif not line.strip():
+                # Outside any block (ignored by PlantUML) only blank lines are cosmetic
+                continue
+        if kind == 'uml':
+            block.append(line)
+        else:
+            out.append(line)
+        end = END_RE.match(line)
+        if kind is not None and end and end.group(1).lower() == kind:
+            if kind == 'uml':
+                out.extend(_canonicalize_uml(block))
+                block = []
+            kind = None
+    if block:
+        out.extend(_canonicalize_uml(block))
+    return '\n'.join(out) + '\n'
+
+
+def canonical_hash(source: str) -> str:
+    canonical = canonicalize(source)
+    return hashlib.sha256(f'{CANONICAL_VERSION}\n{canonical}'.encode('utf-8')).hexdigest()
+
+
+def cache_key(source: str) -> Optional[str]:
+    """Render cache key for ``source``, or None if it cannot be cached"""
+    if INCLUDE_RE.search(source):
+        return None
+    return canonical_hash(source)
+
+
+class RenderCache:
+    """Content-addressed store of rendered diagrams: ``<dir>/<key>.<format>``"""
+
+    def __init__(self, cache_dir: str, max_entries: int = 2000, optimizer=None):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.optimizer = optimizer
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str, output_format: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.{output_format}')
+
+    def get(self, key: Optional[str], output_format: str) -> Optional[bytes]:
+        if key is None:
+            return None
+        path = self.path(key, output_format)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # eviction is least-recently-used by mtime
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: Optional[str], output_format: str, data: bytes) -> bytes:
+        """Store a new render (optimised once, here) and return the bytes to serve"""
+        if key is None:
+            return data
+        if self.optimizer is not None:
+            data = self.optimizer.optimize(output_format, data)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            atomic_write(self.path(key, output_format), data)
+            self._evict()
+        except OSError as e:
+            logger.warning(f"Could not cache render {key[:12]}.{output_format}: {str(e)}")
+        return data
+
+    def _evict(self):
+        with self._lock:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.is_file()]
+            if len(entries) <= self.max_entries:
+                return
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_entries]:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {'hits': self.hits, 'misses': self.misses}
+        if self.optimizer is not None:
+            stats['optimizer'] = self.optimizer.stats()
+        return stats
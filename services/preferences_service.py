@@ -0,0 +1,344 @@
+"""
+Per-user preferences (theme and workspace settings).
+
+Preferences live in the ``user_preferences`` table but are served from a
+bounded in-process cache: reads go to SQLite only on a miss, and writes only
+update the cache and mark the entry dirty. A background flusher persists dirty
+entries once they have been quiet for ``flush_delay`` seconds, so a burst of
+updates (a user clicking through themes) becomes a single SQLite write, and
+everything due is written in one transaction.
+
+Every entry carries a version that is bumped on each change and exposed as the
+ETag of ``/api/preferences/<user_id>``; ``If-Match`` turns a write into a
+compare-and-set and ``If-None-Match`` lets clients revalidate for free.
+"""
+
+import atexit
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import Blueprint, jsonify, request
+
+from services.chat_store import ChatStore, get_store
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = '_version'
+
+
+class PreferencesConflict(Exception):
+    """Raised when ``If-Match`` names a version other than the current one"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f'Preferences changed (current version {current_version})')
+        self.current_version = current_version
+
+
+class _Entry:
+    __slots__ = ('preferences', 'version', 'dirty', 'changed_at')
+
+    def __init__(self, preferences: Dict, version: int):
+        self.preferences = preferences
+        self.version = version
+        self.dirty = False
+        self.changed_at = 0.0
+
+
+class PreferencesCache:
+    """Read-through, write-behind LRU cache over ``ChatStore`` preferences.
+
+    Dirty entries are never evicted; the cache may temporarily exceed
+    ``max_entries`` until the flusher has written them.
+    """
+
+    def __init__(self, store: Callable[[], ChatStore] = get_store, max_entries: int = 10000,
+                 flush_delay: float = 2.0, default_theme: str = 'space',
+                 themes: Optional[List[str]] = None):
+        self._store = store
+        self.max_entries = max_entries
+        self.flush_delay = flush_delay
+        self.default_theme = default_theme
+        self.themes = list(themes or [default_theme])
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.coalesced = 0
+        self.writes = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def configure(self, max_entries: Optional[int] = None, flush_delay: Optional[float] = None,
+                  default_theme: Optional[str] = None, themes: Optional[List[str]] = None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if flush_delay is not None:
+                self.flush_delay = flush_delay
+            if default_theme is not None:
+                self.default_theme = default_theme
+            if themes is not None:
+                self.themes = list(themes)
+
+    def defaults(self) -> Dict:
+        return {'theme': self.default_theme}
+
+    # Reads -------------------------------------------------------------
+
+    def get(self, user_id: str) -> Tuple[Dict, int]:
+        """(preferences, version) for ``user_id``; defaults at version 0 if unknown"""
+        with self._lock:
+            entry = self._entry(user_id)
+            return copy.deepcopy(entry.preferences), entry.version
+
+    def theme(self, user_id: Optional[str]) -> str:
+        if not user_id:
+            return self.default_theme
+        preferences, _ = self.get(user_id)
+        return preferences.get('theme', self.default_theme)
+
+    def _entry(self, user_id: str) -> _Entry:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+        self.misses += 1
+        entry = self._load(user_id)
+        self._entries[user_id] = entry
+        self._evict()
+        return entry
+
+    def _load(self, user_id: str) -> _Entry:
+        row = self._store().get_preferences(user_id)
+        if row is None or not isinstance(row['preferences'], dict):
+            return _Entry(self.defaults(), 0)
+        preferences = dict(row['preferences'])
+        version = int(preferences.pop(VERSION_KEY, 1))
+        return _Entry({**self.defaults(), **preferences}, version)
+
+    def _evict(self):
+        if len(self._entries) <= self.max_entries:
+            return
+        for user_id in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if not self._entries[user_id].dirty:
+                del self._entries[user_id]
+
+    # Writes ------------------------------------------------------------
+
+    def validate(self, preferences: Dict):
+        if not isinstance(preferences, dict):
+            raise ValueError('Preferences must be a JSON object')
+        theme = preferences.get('theme')
+        if theme is not None and theme not in self.themes:
+            raise ValueError(f"Unknown theme '{theme}' (available: {', '.join(self.themes)})")
+
+    def update(self, user_id: str, changes: Dict, replace: bool = False,
+               expected_version: Optional[int] = None) -> Tuple[Dict, int]:
+        """Merge (or with ``replace`` overwrite) preferences; persisted later.
+
+        Keys set to ``None`` are removed when merging. Raises ``ValueError`` for
+        invalid preferences and ``PreferencesConflict`` when ``expected_version``
+        is stale.
+        """
+        self.validate(changes)
+        with self._lock:
+            entry = self._entry(user_id)
+            if expected_version is not None and expected_version != entry.version:
+                raise PreferencesConflict(entry.version)
+            preferences = self.defaults() if replace else dict(entry.preferences)
+            for key, value in changes.items():
+                if key == VERSION_KEY:
+                    continue
+                if value is None and not replace:
+                    preferences.pop(key, None)
+                else:
+                    preferences[key] = copy.deepcopy(value)
+            entry.preferences = preferences
+            if entry.dirty:
+                # Not yet persisted: this update rides along with the pending write
+                self.coalesced += 1
+            entry.version += 1
+            entry.dirty = True
+            entry.changed_at = time.monotonic()
+            self.updates += 1
+            self._ensure_flusher()
+            return copy.deepcopy(preferences), entry.version
+
+    # Write-behind ------------------------------------------------------
+
+    def _ensure_flusher(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='preferences-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(max(self.flush_delay / 2, 0.05))
+            self._wake.clear()
+            self.flush(force=False)
+
+    def flush(self, force: bool = True) -> int:
+        """Persist dirty entries (only quiet ones unless ``force``); returns rows written"""
+        with self._flush_lock:
+            cutoff = time.monotonic() - self.flush_delay
+            with self._lock:
+                due = {user_id: (entry.version, {**entry.preferences, VERSION_KEY: entry.version})
+                       for user_id, entry in self._entries.items()
+                       if entry.dirty and (force or entry.changed_at <= cutoff)}
+            if not due:
+                return 0
+            try:
+                self._store().save_preferences_many({user_id: prefs for user_id, (_, prefs) in due.items()})
+            except Exception as e:
+                # Entries stay dirty and are retried on the next pass
+                self.failed_flushes += 1
+                logger.error(f"Could not flush {len(due)} user preferences: {str(e)}")
+                return 0
+            with self._lock:
+                for user_id, (version, _) in due.items():
+                    entry = self._entries.get(user_id)
+                    # Changed again while we were writing: stays dirty for the next pass
+                    if entry is not None and entry.version == version:
+                        entry.dirty = False
+                self._evict()
+            self.flushes += 1
+            self.writes += len(due)
+            return len(due)
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            dirty = sum(1 for entry in self._entries.values() if entry.dirty)
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'dirty': dirty,
+                'max_entries': self.max_entries,
+                'flush_delay': self.flush_delay,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'updates': self.updates,
+                'writes': self.writes,
+                'coalesced_updates': self.coalesced,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes
+            }
+
+
+preferences_cache = PreferencesCache()
+
+preferences_bp = Blueprint('preferences', __name__, url_prefix='/api/preferences')
+
+
+@preferences_bp.record_once
+def _configure_cache(state):
+    config = state.app.config
+    preferences_cache.configure(
+        max_entries=config.get('PREFERENCES_CACHE_SIZE', 10000),
+        flush_delay=config.get('PREFERENCES_FLUSH_DELAY', 2.0),
+        default_theme=config.get('DEFAULT_THEME', 'space'),
+        themes=config.get('AVAILABLE_THEMES'))
+    atexit.register(preferences_cache.close)
+
+
+def etag_for(version: int) -> str:
+    return f'"v{version}"'
+
+
+def _parse_etag(value: Optional[str]) -> Optional[int]:
+    if not value or value.strip() == '*':
+        return None
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    value = value.strip('"')
+    if value.startswith('v') and value[1:].isdigit():
+        return int(value[1:])
+    return -1  # never matches a real version
+
+
+def _preferences_response(user_id: str, preferences: Dict, version: int, status_code: int = 200):
+    response = jsonify({
+        'status': 'success',
+        'user_id': user_id,
+        'version': version,
+        'preferences': preferences
+    })
+    response.status_code = status_code
+    response.headers['ETag'] = etag_for(version)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@preferences_bp.route('/stats', methods=['GET'])
+def preferences_stats():
+    """Cache and write-behind flusher counters"""
+    return jsonify({'status': 'success', 'cache': preferences_cache.stats()})
+
+
+@preferences_bp.route('/<user_id>', methods=['GET'])
+def get_preferences(user_id):
+    """A user's preferences (from memory unless this is the first read)"""
+    try:
+        preferences, version = preferences_cache.get(user_id)
+        if request.if_none_match and etag_for(version).strip('"') in request.if_none_match:
+            response = jsonify()
+            response.status_code = 304
+            response.headers['ETag'] = etag_for(version)
+            return response
+        return _preferences_response(user_id, preferences, version)
+    except Exception as e:
+        logger.error(f"Error reading preferences for {user_id}: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to read preferences: {str(e)}'
+        }), 500
+
+
+@preferences_bp.route('/<user_id>', methods=['PUT', 'PATCH'])
+def update_preferences(user_id):
+    """Replace (PUT) or merge (PATCH) a user's preferences; honours If-Match"""
+    changes = request.get_json(silent=True)
+    if not isinstance(changes, dict):
+        return jsonify({'status': 'error', 'message': 'Request body must be a JSON object'}), 400
+    try:
+        preferences, version = preferences_cache.update(
+            user_id, changes, replace=request.method == 'PUT',
+            expected_version=_parse_etag(request.headers.get('If-Match')))
+        return _preferences_response(user_id, preferences, version)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except PreferencesConflict as e:
+        response = jsonify({
+            'status': 'error',
+            'message': str(e),
+            'version': e.current_version
+        })
+        response.status_code = 412
+        response.headers['ETag'] = etag_for(e.current_version)
+        return response
+    except Exception as e:
+        logger.error(f"Error updating preferences for {user_id}: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to update preferences: {str(e)}'
+        }), 500
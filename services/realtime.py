@@ -0,0 +1,237 @@
+"""
+Realtime (SocketIO) deployment helpers for the AI Portal.
+
+Builds the portal's SocketIO instance from config so the same code can run
+with the default threading workers or with gevent/eventlet async workers,
+optionally sharing rooms across several server processes through a message
+queue. Also tracks live connections and applies per-connection backpressure.
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from flask_socketio import SocketIO
+
+try:
+    from socketio import PubSubManager
+    PUBSUB_AVAILABLE = True
+except ImportError:
+    PubSubManager = object
+    PUBSUB_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOCAL_QUEUE_URL = 'local://'
+
+
+class LocalQueueManager(PubSubManager):
+    """In-process message queue stand-in for Redis/Kombu.
+
+    Every manager subscribed to the same channel receives every published
+    message, which is exactly what a real broker does across processes. Use it
+    in tests (or with several SocketIO servers in one process) by setting
+    ``SOCKETIO_MESSAGE_QUEUE = 'local://'``.
+    """
+
+    name = 'local'
+    _subscribers: Dict[str, list] = {}
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, url: str = LOCAL_QUEUE_URL, channel: str = 'socketio',
+                 write_only: bool = False, logger=None):
+        self._inbox: 'queue.Queue[Dict]' = queue.Queue()
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _publish(self, data: Dict):
+        with self._subscribers_lock:
+            inboxes = list(self._subscribers.get(self.channel, []))
+        for inbox in inboxes:
+            inbox.put(data)
+
+    def _listen(self):
+        with self._subscribers_lock:
+            self._subscribers.setdefault(self.channel, []).append(self._inbox)
+        while True:
+            yield self._inbox.get()
+
+    @classmethod
+    def reset(cls):
+        """Drop all subscribers (test helper)"""
+        with cls._subscribers_lock:
+            cls._subscribers.clear()
+
+
+class ConnectionTracker:
+    """Connection-count gauge and per-connection outbound backpressure.
+
+    Every message sent through :meth:`emit_to` holds one of the receiving
+    connection's ``max_pending`` slots until the client acknowledges it, or
+    ``ack_timeout`` seconds have passed for clients that never ack. Without
+    acks (``acks=False``, e.g. emits published through a message queue) a slot
+    is held only while the emit is being handed off. Messages to a saturated
+    connection are dropped (and counted), or with ``wait`` delayed until a
+    slot frees up.
+    """
+
+    def __init__(self, max_pending: int = 64, ack_timeout: float = 2.0, acks: bool = True):
+        self.max_pending = max_pending
+        self.ack_timeout = ack_timeout
+        self.acks = acks
+        self._lock = threading.Lock()
+        self._slot_freed = threading.Condition(self._lock)
+        # sid -> {slot id: expiry (monotonic)}
+        self._pending: Dict[str, Dict[int, float]] = {}
+        self._slot_ids = itertools.count()
+        self._connected_at: Dict[str, float] = {}
+        self.peak_connections = 0
+        self.total_connections = 0
+        self.dropped_messages = 0
+        self.expired_slots = 0
+        self._disconnect_callbacks = []
+
+    def on_disconnect(self, callback):
+        """Call ``callback(sid)`` whenever a client disconnects.
+
+        Flask-SocketIO keeps a single handler per event, so services hook in
+        here instead of registering their own ``disconnect`` handler.
+        """
+        self._disconnect_callbacks.append(callback)
+
+    def connected(self, sid: str):
+        with self._lock:
+            self._pending[sid] = {}
+            self._connected_at[sid] = time.time()
+            self.total_connections += 1
+            self.peak_connections = max(self.peak_connections, len(self._pending))
+
+    def disconnected(self, sid: str):
+        with self._lock:
+            self._pending.pop(sid, None)
+            self._connected_at.pop(sid, None)
+            self._slot_freed.notify_all()
+        for callback in self._disconnect_callbacks:
+            try:
+                callback(sid)
+            except Exception as e:
+                logger.error(f"Disconnect callback failed for {sid}: {str(e)}")
+
+    @property
+    def active_connections(self) -> int:
+        return len(self._pending)
+
+    def _expire(self, slots: Dict[int, float], now: float):
+        expired = [slot for slot, expiry in slots.items() if expiry <= now]
+        for slot in expired:
+            del slots[slot]
+        self.expired_slots += len(expired)
+
+    def try_reserve(self, sid: str, wait: float = 0.0) -> Optional[int]:
+        """Reserve an outbound slot for ``sid``; None if the client stays saturated"""
+        deadline = time.monotonic() + wait
+        with self._lock:
+            while True:
+                slots = self._pending.get(sid)
+                if slots is None:
+                    return None
+                now = time.monotonic()
+                self._expire(slots, now)
+                if len(slots) < self.max_pending:
+                    slot = next(self._slot_ids)
+                    slots[slot] = now + self.ack_timeout
+                    return slot
+                if now >= deadline:
+                    self.dropped_messages += 1
+                    return None
+                # Wake up when a slot is released or the oldest one expires
+                self._slot_freed.wait(min(deadline, min(slots.values())) - now)
+
+    def release(self, sid: str, slot: int):
+        with self._lock:
+            slots = self._pending.get(sid)
+            if slots is not None and slots.pop(slot, None) is not None:
+                self._slot_freed.notify_all()
+
+    def emit_to(self, socketio: SocketIO, sid: str, event: str, data: Any,
+                namespace: Optional[str] = None, wait: float = 0.0) -> bool:
+        """Emit ``event`` to a single client, honouring its backpressure budget"""
+        slot = self.try_reserve(sid, wait)
+        if slot is None:
+            return False
+        if not self.acks:
+            try:
+                socketio.emit(event, data, to=sid, namespace=namespace)
+            finally:
+                self.release(sid, slot)
+            return True
+        try:
+            socketio.emit(event, data, to=sid, namespace=namespace,
+                          callback=lambda *args: self.release(sid, slot))
+        except Exception:
+            self.release(sid, slot)
+            raise
+        return True
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.monotonic()
+            for slots in self._pending.values():
+                self._expire(slots, now)
+            pending = sum(len(slots) for slots in self._pending.values())
+            saturated = sum(1 for slots in self._pending.values() if len(slots) >= self.max_pending)
+            return {
+                'active_connections': len(self._pending),
+                'peak_connections': self.peak_connections,
+                'total_connections': self.total_connections,
+                'pending_messages': pending,
+                'saturated_connections': saturated,
+                'dropped_messages': self.dropped_messages,
+                'expired_slots': self.expired_slots,
+                'max_pending_per_connection': self.max_pending,
+                'ack_timeout': self.ack_timeout,
+                'acks': self.acks
+            }
+
+
+def create_socketio(app) -> SocketIO:
+    """Create the SocketIO instance described by the app config"""
+    async_mode = app.config.get('SOCKETIO_ASYNC_MODE', 'threading')
+    message_queue = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    options = {
+        'cors_allowed_origins': '*',
+        'async_mode': async_mode,
+        # Idle dashboard sockets only cost a ping every ping_interval seconds
+        'ping_interval': app.config.get('SOCKETIO_PING_INTERVAL', 25),
+        'ping_timeout': app.config.get('SOCKETIO_PING_TIMEOUT', 20),
+        'max_http_buffer_size': app.config.get('SOCKETIO_MAX_HTTP_BUFFER_SIZE', 1_000_000),
+    }
+
+    if message_queue == LOCAL_QUEUE_URL:
+        if not PUBSUB_AVAILABLE:
+            raise RuntimeError('python-socketio is required for the local message queue')
+        options['client_manager'] = LocalQueueManager(
+            channel=app.config.get('SOCKETIO_CHANNEL', 'socketio'))
+    elif message_queue:
+        options['message_queue'] = message_queue
+        options['channel'] = app.config.get('SOCKETIO_CHANNEL', 'socketio')
+
+    logger.info(f"SocketIO async_mode={async_mode}, message_queue={message_queue or 'none'}")
+    return SocketIO(app, **options)
+
+
+def register_connection_tracking(socketio: SocketIO, tracker: ConnectionTracker):
+    """Keep ``tracker`` in sync with the default namespace's connections"""
+    from flask import request
+
+    @socketio.on('connect')
+    def _track_connect(auth=None):
+        tracker.connected(request.sid)
+
+    @socketio.on('disconnect')
+    def _track_disconnect(*args):
+        tracker.disconnected(request.sid)
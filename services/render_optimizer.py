@@ -0,0 +1,264 @@
+"""
+Post-render optimisation of diagram artifacts.
+
+PlantUML's SVG is verbose (4-decimal coordinates, default-valued attributes,
+comments carrying the source, empty or unused ``<defs>``) and its PNGs are
+written with fast zlib settings. :class:`RenderOptimizer` shrinks each
+artifact once, before it enters the render cache, so every later request is
+served the small version:
+
+- SVG: comments removed, numbers in geometry attributes and inline styles
+  rounded to ``svg_precision`` decimals (trailing zeros dropped),
+  default-valued and empty attributes removed, unused ``xmlns:xlink`` dropped,
+  unreferenced ``<defs>`` children and empty ``<defs>`` removed, indentation
+  between tags collapsed. The result must still parse as XML.
+- PNG (lossless): the image data is recompressed with zlib level 9; with
+  Pillow, images of at most 256 colours are also tried as palette PNGs (kept
+  only if every pixel round-trips) and re-encoded with ``optimize``. Text
+  chunks are preserved.
+
+The smaller of the original and optimised bytes is kept. Optimisation runs
+in a bounded worker pool and original/optimised sizes are counted per format
+(:meth:`RenderOptimizer.stats`).
+"""
+
+import logging
+import re
+import struct
+import threading
+import time
+import zlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Dict
+
+try:
+    from PIL import Image, PngImagePlugin
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OPTIMIZED_FORMATS = ('svg', 'png')
+
+# Attributes whose numbers are geometry and can be rounded
+NUMERIC_ATTRIBUTES = {'x', 'y', 'x1', 'x2', 'y1', 'y2', 'cx', 'cy', 'r', 'rx', 'ry', 'width',
+                      'height', 'points', 'd', 'viewBox', 'textLength', 'font-size', 'transform',
+                      'stroke-width', 'style'}
+# Attribute values that are the SVG default (or ignored by renderers)
+DEFAULT_ATTRIBUTES = {('lengthAdjust', 'spacing'), ('zoomAndPan', 'magnify'),
+                      ('contentStyleType', 'text/css'), ('fill-opacity', '1'),
+                      ('stroke-opacity', '1'), ('opacity', '1')}
+
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+TAG_RE = re.compile(r'<([A-Za-z][\w:.-]*)((?:\s+[\w:.-]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*(/?)>')
+ATTRIBUTE_RE = re.compile(r'\s+([\w:.-]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+NUMBER_RE = re.compile(r'-?\d+\.\d+')
+DEFS_RE = re.compile(r'<defs(?:\s[^>]*)?>(.*?)</defs>', re.DOTALL)
+ELEMENT_TOKEN_RE = re.compile(r'<(/?)([A-Za-z][\w:.-]*)([^>]*?)(/?)>')
+ID_RE = re.compile(r'\sid\s*=\s*"([^"]+)"')
+INDENT_RE = re.compile(r'>\s*\n\s*<')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Chunks Pillow carries over when re-encoding; anything else rules it out
+PILLOW_SAFE_CHUNKS = {b'IHDR', b'PLTE', b'tRNS', b'IDAT', b'IEND', b'tEXt', b'zTXt', b'iTXt',
+                      b'pHYs', b'iCCP'}
+
+
+def _format_number(match: re.Match, precision: int) -> str:
+    text = f'{round(float(match.group(0)), precision):.{precision}f}'.rstrip('0').rstrip('.')
+    return '0' if text in ('-0', '') else text
+
+
+def _minify_tag(match: re.Match, precision: int) -> str:
+    name, attributes, self_closing = match.group(1), match.group(2), match.group(3)
+    kept = []
+    for attribute in ATTRIBUTE_RE.finditer(attributes):
+        key, value = attribute.group(1), attribute.group(2)[1:-1]
+        if (key, value) in DEFAULT_ATTRIBUTES or (not value and key in ('style', 'class')):
+            continue
+        if key in NUMERIC_ATTRIBUTES:
+            value = NUMBER_RE.sub(lambda m: _format_number(m, precision), value)
+        quote = "'" if '"' in value else '"'
+        kept.append(f' {key}={quote}{value}{quote}')
+    return f"<{name}{''.join(kept)}{'/' if self_closing else ''}>"
+
+
+def _prune_defs(svg: str) -> str:
+    """Drop ``<defs>`` children whose id is never referenced, then empty ``<defs>``"""
+    def prune(match: re.Match) -> str:
+        body = match.group(1)
+        rest = svg[:match.start()] + svg[match.end():]
+        kept, depth, start, element_id = [], 0, 0, None
+        for token in ELEMENT_TOKEN_RE.finditer(body):
+            closing, self_closing = token.group(1), token.group(4)
+            if depth == 0 and not closing:
+                start = token.start()
+                found = ID_RE.search(token.group(0))
+                element_id = found.group(1) if found else None
+            if closing:
+                depth -= 1
+            elif not self_closing:
+                depth += 1
+            if depth == 0:
+                element = body[start:token.end()]
+                pattern = rf'(?:url\(\s*#|href\s*=\s*"#){re.escape(element_id or "")}(?![\w.-])'
+                if element_id is None or re.search(pattern, rest + body.replace(element, '')):
+                    kept.append(element)
+        return f"<defs>{''.join(kept)}</defs>" if kept else ''
+
+    svg = DEFS_RE.sub(prune, svg)
+    return re.sub(r'<defs\s*/>', '', svg)
+
+
+def optimize_svg(data: bytes, precision: int = 2) -> bytes:
+    """Minified SVG; the input is returned unchanged if it cannot be handled safely"""
+    try:
+        svg = data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data
+    svg = COMMENT_RE.sub('', svg)
+    svg = INDENT_RE.sub('><', svg)
+    svg = TAG_RE.sub(lambda m: _minify_tag(m, precision), svg)
+    svg = _prune_defs(svg)
+    if 'xlink:' not in svg.replace('xmlns:xlink=', ''):
+        svg = re.sub(r'\s+xmlns:xlink\s*=\s*"[^"]*"', '', svg)
+    result = svg.strip().encode('utf-8')
+    try:
+        ET.fromstring(result)
+    except ET.ParseError as e:
+        logger.warning(f"SVG optimisation produced invalid XML, keeping original: {str(e)}")
+        return data
+    return result
+
+
+def _png_chunks(data: bytes):
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, chunk_type = struct.unpack('>I4s', data[offset:offset + 8])
+        yield chunk_type, data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+
+
+def _png_chunk(chunk_type: bytes, body: bytes) -> bytes:
+    return (struct.pack('>I', len(body)) + chunk_type + body +
+            struct.pack('>I', zlib.crc32(chunk_type + body) & 0xffffffff))
+
+
+def _recompress_png(data: bytes) -> bytes:
+    """Same chunks, image data re-deflated at level 9 into a single IDAT"""
+    chunks = list(_png_chunks(data))
+    idat = b''.join(body for chunk_type, body in chunks if chunk_type == b'IDAT')
+    raw = zlib.decompress(idat)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9)
+    deflated = compressor.compress(raw) + compressor.flush()
+    out = [PNG_SIGNATURE]
+    for chunk_type, body in chunks:
+        if chunk_type == b'IDAT':
+            if deflated is not None:
+                out.append(_png_chunk(b'IDAT', deflated))
+                deflated = None
+        else:
+            out.append(_png_chunk(chunk_type, body))
+    return b''.join(out)
+
+
+def _pillow_candidates(data: bytes):
+    """Pillow re-encodings: plain ``optimize``, and a palette version when lossless"""
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+        info = PngImagePlugin.PngInfo()
+        for key, value in getattr(image, 'text', {}).items():
+            info.add_text(key, value, zip=len(value) > 1024)
+        options = {'optimize': True, 'pnginfo': info}
+        for key in ('dpi', 'icc_profile'):
+            if key in image.info:
+                options[key] = image.info[key]
+        candidates = [(image, {'transparency': image.info['transparency']}
+                       if 'transparency' in image.info else {})]
+        if (image.mode == 'RGB' and 'transparency' not in image.info
+                and image.getcolors(256) is not None):
+            palette = image.convert('P', palette=Image.ADAPTIVE, colors=256)
+            if palette.convert('RGB').tobytes() == image.tobytes():
+                candidates.insert(0, (palette, {}))
+        for candidate, extra in candidates:
+            buffer = BytesIO()
+            candidate.save(buffer, format='PNG', **options, **extra)
+            yield buffer.getvalue()
+
+
+def optimize_png(data: bytes) -> bytes:
+    """Losslessly smallest PNG among the original and its re-encodings"""
+    if not data.startswith(PNG_SIGNATURE):
+        return data
+    best = data
+    try:
+        candidate = _recompress_png(data)
+        if len(candidate) < len(best):
+            best = candidate
+    except (zlib.error, struct.error) as e:
+        logger.warning(f"PNG recompression failed: {str(e)}")
+        return data
+    if PIL_AVAILABLE and {chunk_type for chunk_type, _ in _png_chunks(data)} <= PILLOW_SAFE_CHUNKS:
+        try:
+            for candidate in _pillow_candidates(data):
+                if len(candidate) < len(best):
+                    best = candidate
+        except Exception as e:
+            logger.warning(f"Pillow PNG optimisation failed: {str(e)}")
+    return best
+
+
+class RenderOptimizer:
+    """Bounded pool that optimises rendered artifacts and counts the savings"""
+
+    def __init__(self, workers: int = 2, svg_precision: int = 2, timeout: float = 30.0):
+        self.svg_precision = svg_precision
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='render-optimizer')
+        self._lock = threading.Lock()
+        self._stats = {output_format: {'artifacts': 0, 'original_bytes': 0, 'optimized_bytes': 0,
+                                       'failures': 0, 'took_ms': 0.0}
+                       for output_format in OPTIMIZED_FORMATS}
+
+    def _optimize(self, output_format: str, data: bytes) -> bytes:
+        if output_format == 'svg':
+            return optimize_svg(data, self.svg_precision)
+        return optimize_png(data)
+
+    def optimize(self, output_format: str, data: bytes) -> bytes:
+        """Optimised ``data`` (never larger); other formats are returned as-is"""
+        if output_format not in OPTIMIZED_FORMATS or not data:
+            return data
+        started = time.perf_counter()
+        try:
+            result = self._executor.submit(self._optimize, output_format, data).result(self.timeout)
+        except Exception as e:
+            logger.warning(f"Could not optimise {output_format} render: {str(e)}")
+            with self._lock:
+                self._stats[output_format]['failures'] += 1
+            return data
+        if len(result) >= len(data):
+            result = data
+        with self._lock:
+            stats = self._stats[output_format]
+            stats['artifacts'] += 1
+            stats['original_bytes'] += len(data)
+            stats['optimized_bytes'] += len(result)
+            stats['took_ms'] += (time.perf_counter() - started) * 1000
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            result = {}
+            for output_format, stats in self._stats.items():
+                original = stats['original_bytes']
+                result[output_format] = dict(
+                    stats,
+                    took_ms=round(stats['took_ms'], 2),
+                    saved_ratio=round(1 - stats['optimized_bytes'] / original, 4) if original else None)
+            return result
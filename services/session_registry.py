@@ -0,0 +1,356 @@
+"""
+Bounded per-user session registry.
+
+Replaces the portal's unbounded module-level ``ai_assistants`` dict. Entries
+are evicted least-recently-used first when the registry exceeds its entry
+count or memory budget, and after sitting idle for longer than the TTL. Evicted values can optionally be spilled
+to SQLite and are transparently rehydrated when the user comes back; spilled
+rows older than the spill TTL are deleted by the periodic sweep.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate in-memory footprint of ``value`` in bytes"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class SpillStore:
+    """SQLite table holding the pickled state of evicted sessions"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS session_spill (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    state BLOB NOT NULL,
+                    spilled_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def save(self, namespace: str, key: str, state: bytes):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO session_spill (namespace, key, state, spilled_at) '
+                'VALUES (?, ?, ?, ?)',
+                (namespace, key, state, time.time()))
+
+    def take(self, namespace: str, key: str) -> Optional[bytes]:
+        """Return and delete the spilled state for ``key``, if any"""
+        with self._connection() as conn:
+            row = conn.execute(
+                'SELECT state FROM session_spill WHERE namespace = ? AND key = ?',
+                (namespace, key)).fetchone()
+            if row is None:
+                return None
+            conn.execute('DELETE FROM session_spill WHERE namespace = ? AND key = ?',
+                         (namespace, key))
+            return row[0]
+
+    def delete(self, namespace: str, key: str):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM session_spill WHERE namespace = ? AND key = ?',
+                         (namespace, key))
+
+    def prune(self, namespace: str, max_age: float) -> int:
+        """Delete rows spilled more than ``max_age`` seconds ago; returns rows deleted"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                'DELETE FROM session_spill WHERE namespace = ? AND spilled_at < ?',
+                (namespace, time.time() - max_age))
+            return cursor.rowcount
+
+    def exists(self, namespace: str, key: str) -> bool:
+        """Whether ``key`` has spilled state, without taking it"""
+        row = self._connection().execute(
+            'SELECT 1 FROM session_spill WHERE namespace = ? AND key = ?',
+            (namespace, key)).fetchone()
+        return row is not None
+
+    def count(self, namespace: str) -> int:
+        row = self._connection().execute(
+            'SELECT COUNT(*) FROM session_spill WHERE namespace = ?', (namespace,)).fetchone()
+        return row[0]
+
+
+class SessionRegistry:
+    """Thread-safe, dict-like LRU/TTL cache of per-user session objects.
+
+    Args:
+        name: Registry name, used in metrics and as the spill namespace
+        max_entries: Maximum number of live entries
+        idle_ttl: Seconds an entry may go untouched before it is evicted (None = never)
+        memory_budget: Maximum estimated bytes across live entries (None = unbounded)
+        spill: Optional SpillStore; evicted values are pickled into it
+        spill_ttl: Seconds a spilled value is kept before sweeps delete it (None = forever)
+        sizeof: Size estimator used for the memory budget
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_entries: int = 1000,
+                 idle_ttl: Optional[float] = 1800,
+                 memory_budget: Optional[int] = None,
+                 spill: Optional[SpillStore] = None,
+                 spill_ttl: Optional[float] = None,
+                 sizeof: Callable[[Any], int] = estimate_size,
+                 sweep_interval: float = 30):
+        self.name = name
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.memory_budget = memory_budget
+        self.spill = spill
+        self.spill_ttl = spill_ttl
+        self.sizeof = sizeof
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.RLock()
+        # key -> (value, last_access, size); ordered oldest access first
+        self._entries: 'OrderedDict[str, Tuple[Any, float, int]]' = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.rehydrations = 0
+        self.evictions = {'lru': 0, 'ttl': 0, 'memory': 0}
+        self.spill_failures = 0
+        self.spill_expired = 0
+
+    # Dict-style access -------------------------------------------------
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any):
+        self.put(key, value)
+
+    def __delitem__(self, key: str):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        """Whether ``get`` would find ``key``, live or spilled (nothing is rehydrated)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[1], time.monotonic()):
+                return True
+            # An idle entry is spilled (and so still found) on its next access
+            if entry is not None and self.spill is not None:
+                return True
+            return self._spilled(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def items(self):
+        with self._lock:
+            return [(key, entry[0]) for key, entry in self._entries.items()]
+
+    def values(self):
+        with self._lock:
+            return [entry[0] for entry in self._entries.values()]
+
+    # Core operations ---------------------------------------------------
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._entries[key] = (entry[0], now, entry[2])
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._evict(key, 'ttl')
+
+            value = self._rehydrate(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._insert(key, value, now)
+            return value
+
+    def get_or_create(self, key: str, factory: Callable[[], Any]) -> Any:
+        """Return the live (or rehydrated) value for ``key``, creating it if absent"""
+        with self._lock:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                value = factory()
+                self.put(key, value)
+            return value
+
+    def put(self, key: str, value: Any):
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._insert(key, value, now)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        """Remove ``key`` from memory and from the spill store"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                value = self._rehydrate(key)
+                return default if value is _MISSING else value
+            self._bytes -= entry[2]
+            if self.spill is not None:
+                try:
+                    self.spill.delete(self.name, key)
+                except Exception as e:
+                    self.spill_failures += 1
+                    logger.warning(f"Could not delete spilled {self.name}[{key}]: {str(e)}")
+            return entry[0]
+
+    def sweep(self) -> int:
+        """Evict every idle entry; returns the number evicted"""
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            self._last_sweep = now
+            self._prune_spill()
+            if self.idle_ttl is None:
+                return 0
+            # Entries are ordered by last access, so stop at the first live one
+            for key, entry in list(self._entries.items()):
+                if not self._expired(entry[1], now):
+                    break
+                self._evict(key, 'ttl')
+                evicted += 1
+        return evicted
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'occupancy': round(len(self._entries) / self.max_entries, 4) if self.max_entries else None,
+                'estimated_bytes': self._bytes,
+                'memory_budget': self.memory_budget,
+                'idle_ttl': self.idle_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': dict(self.evictions),
+                'rehydrations': self.rehydrations,
+                'spilled': self.spill.count(self.name) if self.spill else 0,
+                'spill_failures': self.spill_failures,
+                'spill_expired': self.spill_expired
+            }
+
+    # Internals ---------------------------------------------------------
+
+    def _expired(self, last_access: float, now: float) -> bool:
+        return self.idle_ttl is not None and now - last_access > self.idle_ttl
+
+    def _insert(self, key: str, value: Any, now: float):
+        size = self.sizeof(value) if self.memory_budget is not None else 0
+        self._entries[key] = (value, now, size)
+        self._bytes += size
+
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep()
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)), 'lru')
+        if self.memory_budget is not None:
+            # Never evict the entry we just inserted
+            while self._bytes > self.memory_budget and len(self._entries) > 1:
+                self._evict(next(iter(self._entries)), 'memory')
+
+    def _evict(self, key: str, reason: str):
+        value, _, size = self._entries.pop(key)
+        self._bytes -= size
+        self.evictions[reason] += 1
+        if self.spill is None:
+            return
+        try:
+            self.spill.save(self.name, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            self.spill_failures += 1
+            logger.warning(f"Could not spill {self.name}[{key}]: {str(e)}")
+
+    def _prune_spill(self):
+        if self.spill is None or self.spill_ttl is None:
+            return
+        try:
+            self.spill_expired += self.spill.prune(self.name, self.spill_ttl)
+        except Exception as e:
+            logger.warning(f"Could not prune spilled {self.name} entries: {str(e)}")
+
+    def _spilled(self, key: str) -> bool:
+        if self.spill is None:
+            return False
+        try:
+            return self.spill.exists(self.name, key)
+        except Exception as e:
+            logger.warning(f"Could not look up spilled {self.name}[{key}]: {str(e)}")
+            return False
+
+    def _rehydrate(self, key: str) -> Any:
+        if self.spill is None:
+            return _MISSING
+        try:
+            state = self.spill.take(self.name, key)
+            if state is None:
+                return _MISSING
+            value = pickle.loads(state)
+        except Exception as e:
+            logger.warning(f"Could not rehydrate {self.name}[{key}]: {str(e)}")
+            return _MISSING
+        self.rehydrations += 1
+        return value
+
+
+_MISSING = object()
+
+
+def spill_store_from_uri(database_uri: str) -> Optional[SpillStore]:
+    """Build a SpillStore from a ``sqlite:///path`` URI (None for other schemes)"""
+    prefix = 'sqlite:///'
+    if not database_uri or not database_uri.startswith(prefix):
+        return None
+    db_path = database_uri[len(prefix):]
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    return SpillStore(db_path)
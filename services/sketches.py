@@ -0,0 +1,207 @@
+"""
+Mergeable approximate-counting sketches used by the analytics rollups.
+
+- HyperLogLog: distinct counts (unique sessions) in at most 2**p bytes
+- QuantileSketch: relative-error quantiles (session durations) in a bounded
+  number of logarithmic buckets
+
+Both can be merged, so hourly and daily figures are exact merges of the
+finer-grained buckets, and both serialise to plain JSON.
+"""
+
+import base64
+import hashlib
+import math
+from typing import Dict, Optional
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter with a sparse representation for small sets.
+
+    Args:
+        p: Precision; 2**p registers, standard error ~1.04 / sqrt(2**p)
+    """
+
+    SPARSE_LIMIT_DIVISOR = 8
+
+    def __init__(self, p: int = 12):
+        if not 4 <= p <= 16:
+            raise ValueError('HyperLogLog precision must be between 4 and 16')
+        self.p = p
+        self.m = 1 << p
+        self._sparse: Optional[Dict[int, int]] = {}
+        self._registers: Optional[bytearray] = None
+
+    def add(self, value: str):
+        x = _hash64(value)
+        index = x >> (64 - self.p)
+        remaining = (x << self.p) & ((1 << 64) - 1)
+        # Position of the leftmost 1-bit in the remaining 64 - p bits
+        rho = min(64 - remaining.bit_length() + 1, 64 - self.p + 1)
+        self._set(index, rho)
+
+    def _set(self, index: int, rho: int):
+        if self._registers is not None:
+            if rho > self._registers[index]:
+                self._registers[index] = rho
+            return
+        if rho > self._sparse.get(index, 0):
+            self._sparse[index] = rho
+            if len(self._sparse) > self.m // self.SPARSE_LIMIT_DIVISOR:
+                self._densify()
+
+    def _densify(self):
+        self._registers = bytearray(self.m)
+        for index, rho in self._sparse.items():
+            self._registers[index] = rho
+        self._sparse = None
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        if other.p != self.p:
+            raise ValueError('Cannot merge HyperLogLogs of different precision')
+        if other._registers is None:
+            for index, rho in other._sparse.items():
+                self._set(index, rho)
+            return self
+        if self._registers is None:
+            self._densify()
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+    def count(self) -> int:
+        if self._registers is None:
+            # Sparse: linear counting over the registers that are set
+            zeros = self.m - len(self._sparse)
+            return round(self.m * math.log(self.m / zeros)) if zeros else len(self._sparse)
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * math.log(self.m / zeros)
+        return round(estimate)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def to_dict(self) -> Dict:
+        if self._registers is None:
+            return {'p': self.p, 'sparse': {str(k): v for k, v in self._sparse.items()}}
+        return {'p': self.p, 'dense': base64.b64encode(bytes(self._registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'HyperLogLog':
+        hll = cls(data['p'])
+        if 'dense' in data:
+            hll._registers = bytearray(base64.b64decode(data['dense']))
+            hll._sparse = None
+        else:
+            hll._sparse = {int(k): v for k, v in data['sparse'].items()}
+        return hll
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch-style) with bounded relative error.
+
+    Every value lands in bucket ``ceil(log(v) / log(gamma))``; any quantile is
+    answered within ``relative_accuracy`` of the true value. The bucket count is
+    capped by collapsing the lowest buckets.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, weight: int = 1):
+        if value < 0:
+            raise ValueError('QuantileSketch only accepts non-negative values')
+        self.count += weight
+        self.sum += value * weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value == 0:
+            self.zero_count += weight
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + weight
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.buckets)
+        overflow = len(keys) - self.max_buckets + 1
+        target = keys[overflow]
+        for key in keys[:overflow]:
+            self.buckets[target] += self.buckets.pop(key)
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        for key, weight in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + weight
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        if len(self.buckets) > self.max_buckets:
+            self._collapse()
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket in relative terms
+                value = 2 * self.gamma ** key / (1 + self.gamma)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99)
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'buckets': {str(k): v for k, v in self.buckets.items()},
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'])
+        sketch.buckets = {int(k): v for k, v in data['buckets'].items()}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.sum = data['sum']
+        sketch.min = data['min']
+        sketch.max = data['max']
+        return sketch
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Content-hash fingerprinting for static assets.
+
+Build stage:
+
+    python3 -m services.static_assets [--out build/static]
+
+Copies every file under ``assets/`` to ``<out>/assets/`` as
+``<name>.<hash>.<ext>`` (hash of the content, after CSS ``url()`` references
+have themselves been rewritten) and writes gzip/Brotli siblings for text
+assets. ``asset-manifest.json`` maps original to fingerprinted paths.
+
+Pages are not copied: the portal rewrites asset references in ``index.html``
+and ``templates/*.html`` when it serves them (:meth:`FingerprintIndex.rewrite_html`,
+:class:`FingerprintLoader`), and the static export rewrites ``pages/*.html``
+and the other copied pages as it writes them. Edits to a page show up without
+a rebuild; a rebuild only has to happen when assets change.
+
+Serving: a fingerprinted URL can never change content, so the portal sends it
+with ``Cache-Control: public, max-age=31536000, immutable`` (repeat visits
+make no asset requests at all), picks a precompressed sibling from
+``Accept-Encoding``, and streams the file with ``send_file`` so WSGI servers
+that provide ``wsgi.file_wrapper`` (gunicorn) use ``sendfile(2)``.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from flask import request, send_file
+from jinja2 import BaseLoader
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'asset-manifest.json'
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.xml', '.ico'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+HASH_LENGTH = 10
+FINGERPRINT_PATTERN = re.compile(r'\.[0-9a-f]{%d}(?=\.[^./]+$)' % HASH_LENGTH)
+# Quoted strings and unquoted CSS url(...) arguments
+REFERENCE_PATTERN = re.compile(r'"([^"<>\n]*)"|\'([^\'<>\n]*)\'|url\(([^()\'"\s]+)\)')
+
+
+def fingerprinted_name(name: str, digest: str) -> str:
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{digest[:HASH_LENGTH]}{extension}"
+
+
+class ReferenceRewriter:
+    """Rewrites local asset URLs in HTML/CSS text using a path manifest"""
+
+    def __init__(self, manifest: Dict[str, str]):
+        self.manifest = manifest
+
+    def rewrite(self, text: str, base_dir: str) -> Tuple[str, int]:
+        """Rewrite references in a file located in ``base_dir`` (relative to the root)"""
+        count = 0
+
+        def replace(match):
+            nonlocal count
+            group = next(i for i in (1, 2, 3) if match.group(i) is not None)
+            value = match.group(group)
+            rewritten = self._rewrite_value(value, base_dir)
+            if rewritten == value:
+                return match.group(0)
+            count += 1
+            start, end = match.span(group)
+            offset = match.start(0)
+            whole = match.group(0)
+            return whole[:start - offset] + rewritten + whole[end - offset:]
+
+        return REFERENCE_PATTERN.sub(replace, text), count
+
+    def _rewrite_value(self, value: str, base_dir: str) -> str:
+        rewritten = self._rewrite_url(value.strip(), base_dir)
+        if rewritten is not None:
+            return value.replace(value.strip(), rewritten)
+        if ',' in value:
+            # srcset="a.png 1x, b.png 2x"
+            parts = []
+            for candidate in value.split(','):
+                tokens = candidate.strip().split(None, 1)
+                url = self._rewrite_url(tokens[0], base_dir) if tokens else None
+                parts.append(candidate if url is None else candidate.replace(tokens[0], url, 1))
+            return ','.join(parts)
+        return value
+
+    def _rewrite_url(self, url: str, base_dir: str) -> Optional[str]:
+        if not url or '://' in url or url.startswith(('data:', '#', 'mailto:', 'javascript:', '//')):
+            return None
+        path, suffix = url, ''
+        for separator in ('#', '?'):
+            if separator in path:
+                path, rest = path.split(separator, 1)
+                suffix = separator + rest + suffix
+        if not path or path.endswith('/'):
+            return None
+        decoded = unquote(path)
+        if decoded.startswith('/'):
+            resolved = posixpath.normpath(decoded.lstrip('/'))
+        else:
+            resolved = posixpath.normpath(posixpath.join(base_dir, decoded))
+        target = self.manifest.get(resolved)
+        if target is None:
+            return None
+        new_name = posixpath.basename(target)
+        if path != decoded:
+            new_name = quote(new_name)
+        head = path.rsplit('/', 1)[0] + '/' if '/' in path else ''
+        return head + new_name + suffix
+
+
+def _write_if_changed(path: str, data: bytes) -> bool:
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def _precompress(path: str, data: bytes) -> List[str]:
+    """Write .gz (and .br) siblings when they are actually smaller"""
+    written = []
+    encoded = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(encoded) < len(data):
+        _write_if_changed(f"{path}.gz", encoded)
+        written.append(f"{path}.gz")
+    if BROTLI_AVAILABLE:
+        encoded = brotli.compress(data, quality=11)
+        if len(encoded) < len(data):
+            _write_if_changed(f"{path}.br", encoded)
+            written.append(f"{path}.br")
+    return written
+
+
+def build_static(root: str = '.', out_dir: str = 'build/static', assets_dir: str = 'assets',
+                 exclude: Optional[List[str]] = None) -> Dict:
+    """Fingerprint ``assets_dir`` and rewrite HTML references into ``out_dir``"""
+    exclude_real = {os.path.realpath(os.path.join(root, path)) for path in (exclude or [])}
+    exclude_real.add(os.path.realpath(out_dir))
+    sources = []
+    for directory, dirs, files in os.walk(os.path.join(root, assets_dir)):
+        dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(directory, d)) not in exclude_real)
+        for name in sorted(files):
+            if not name.startswith('.'):
+                sources.append(os.path.relpath(os.path.join(directory, name), root).replace(os.sep, '/'))
+
+    manifest: Dict[str, str] = {}
+    rewriter = ReferenceRewriter(manifest)
+    keep = set()
+    stats = {'assets': 0, 'written': 0, 'compressed': 0, 'references': 0}
+    # CSS last, so its url() references already resolve to fingerprinted names
+    for rel_path in sorted(sources, key=lambda path: (path.endswith('.css'), path)):
+        with open(os.path.join(root, rel_path), 'rb') as f:
+            data = f.read()
+        if rel_path.endswith('.css'):
+            text, count = rewriter.rewrite(data.decode('utf-8'), posixpath.dirname(rel_path))
+            data = text.encode('utf-8')
+            stats['references'] += count
+        digest = hashlib.sha256(data).hexdigest()
+        target = posixpath.join(posixpath.dirname(rel_path),
+                                fingerprinted_name(posixpath.basename(rel_path), digest))
+        manifest[rel_path] = target
+        path = os.path.join(out_dir, target)
+        if _write_if_changed(path, data):
+            stats['written'] += 1
+        keep.add(os.path.realpath(path))
+        if os.path.splitext(rel_path)[1].lower() in COMPRESSIBLE:
+            siblings = _precompress(path, data)
+            keep.update(os.path.realpath(sibling) for sibling in siblings)
+            stats['compressed'] += len(siblings)
+        stats['assets'] += 1
+
+    # Old fingerprints are removed once nothing references them
+    for directory, _, files in os.walk(os.path.join(out_dir, assets_dir)):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.realpath(path) not in keep:
+                os.unlink(path)
+
+    _write_if_changed(os.path.join(out_dir, MANIFEST_NAME),
+                      json.dumps({'assets': manifest}, indent=1, sort_keys=True).encode('utf-8'))
+    return {'manifest': manifest, 'stats': stats}
+
+
+class FingerprintIndex:
+    """The asset manifest in both directions; reloads on rebuild"""
+
+    def __init__(self, build_dir: str):
+        self.build_dir = build_dir
+        self._manifest: Dict[str, str] = {}
+        self._by_target: Dict[str, str] = {}
+        self._mtime = None
+        self._pages: Dict[str, Tuple[tuple, str]] = {}
+        self._lock = threading.Lock()
+
+    def _current(self) -> Dict[str, str]:
+        path = os.path.join(self.build_dir, MANIFEST_NAME)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return self._by_target
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            manifest = json.load(f)['assets']
+                        self._manifest = manifest
+                        self._by_target = {target: source for source, target in manifest.items()}
+                        self._mtime = mtime
+                    except (OSError, ValueError, KeyError) as e:
+                        logger.error(f"Could not load asset manifest: {str(e)}")
+        return self._by_target
+
+    def original(self, rel_path: str) -> Optional[str]:
+        """Original path of a fingerprinted asset path, or None"""
+        if not FINGERPRINT_PATTERN.search(rel_path):
+            return None
+        return self._current().get(rel_path)
+
+    @property
+    def version(self):
+        """Changes whenever a rebuilt manifest is loaded"""
+        self._current()
+        return self._mtime
+
+    def rewrite_html(self, text: str, rel_path: str) -> str:
+        """``text`` of the page at ``rel_path`` with asset references fingerprinted"""
+        self._current()
+        if not self._manifest:
+            return text
+        return ReferenceRewriter(self._manifest).rewrite(text, posixpath.dirname(rel_path))[0]
+
+    def render_file(self, path: str, rel_path: str) -> str:
+        """Rewritten content of a page file, cached until the page or the manifest changes"""
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size, self.version)
+        cached = self._pages.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            text = self.rewrite_html(f.read(), rel_path)
+        self._pages[path] = (key, text)
+        return text
+
+
+class FingerprintLoader(BaseLoader):
+    """Jinja loader rewriting asset references of templates as they are loaded"""
+
+    def __init__(self, loader: BaseLoader, index: FingerprintIndex, prefix: str = 'templates'):
+        self.loader = loader
+        self.index = index
+        self.prefix = prefix
+        self._loaded = False
+        self._version = None
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = self.loader.get_source(environment, template)
+        version = self._version = self.index.version
+        self._loaded = True
+        source = self.index.rewrite_html(source, posixpath.join(self.prefix, template))
+        # Reloaded when the template changes or the assets are rebuilt
+        return source, filename, lambda: (uptodate is None or uptodate()) and self.index.version == version
+
+    def list_templates(self):
+        return self.loader.list_templates()
+
+    def drop_stale(self, environment):
+        """Forget compiled templates after an asset rebuild.
+
+        Without ``auto_reload`` Jinja never asks a cached template whether it
+        is up to date, so call this per request.
+        """
+        if self._loaded and self.index.version != self._version:
+            if environment.cache is not None:
+                environment.cache.clear()
+            self._loaded = False
+
+
+def send_immutable(path: str, mimetype: Optional[str] = None):
+    """Send a fingerprinted file, preferring a precompressed sibling"""
+    accepted = request.accept_encodings
+    encoding = None
+    for candidate, extension in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[candidate] and os.path.exists(path + extension):
+            encoding = candidate
+            break
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = send_file(path + ('.br' if encoding == 'br' else '.gz') if encoding else path,
+                         mimetype=mimetype, conditional=True, etag=True, max_age=31536000)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Fingerprint assets/ for immutable caching')
+    parser.add_argument('--root', default='.')
+    parser.add_argument('--out', default='build/static')
+    parser.add_argument('--exclude', action='append', default=['assets/derived'],
+                        help='Asset subdirectory to leave out (repeatable)')
+    args = parser.parse_args(argv)
+
+    print(f"🔖 Fingerprinting assets -> {args.out}")
+    try:
+        result = build_static(args.root, args.out, exclude=args.exclude)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"❌ Build failed: {e}")
+        return 1
+    stats = result['stats']
+    print(f"✅ {stats['assets']} assets ({stats['written']} new), {stats['compressed']} precompressed, "
+          f"{stats['references']} CSS references rewritten")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
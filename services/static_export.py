@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Incremental static export of the portal for backend-less hosting (GitHub Pages).
+
+    python3 -m services.static_export [--out build/site] [--diagrams PATH] [--workers N]
+
+Renders the Flask routes in ``STATIC_EXPORT_ROUTES`` (pages and read-only
+JSON endpoints) through the test client, pre-renders every catalog diagram
+to SVG and PNG with PlantUML, exports the diagram list/source JSON the
+workflow-diagrams page reads, and copies the static tree
+(``STATIC_EXPORT_COPY``) into the build directory. When the asset build
+exists, copied ``.html`` files get their asset references fingerprinted, to
+match the ``assets/`` tree shipped alongside them.
+
+Every output records the content hash of its inputs in
+``.export-manifest.json``; an output whose inputs hash the same as last time
+(and still exists) is skipped, so a rebuild after editing one diagram renders
+one diagram. Rendering runs in a thread pool (PlantUML runs out of process).
+
+Exported HTML gets a ``<meta name="static-export-base">`` tag with the
+relative path to the site root, which pages use to read the exported files
+instead of calling the live API.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.export-manifest.json'
+# Bump when the export logic changes so every output is rebuilt once
+EXPORT_VERSION = 1
+DIAGRAM_FORMATS = ['svg', 'png']
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def output_path_for(route: str) -> str:
+    """Site-relative file for a route: pages become <route>/index.html"""
+    route = route.strip('/')
+    if not route:
+        return 'index.html'
+    if route.startswith('api/') or os.path.splitext(route)[1]:
+        # JSON endpoints keep their exact URL, so fetch('/api/...') works unchanged
+        return route
+    return posixpath.join(route, 'index.html')
+
+
+def inputs_hash(key: str, inputs: Iterable[str]) -> str:
+    digest = hashlib.sha256(f'{EXPORT_VERSION}\0{key}'.encode('utf-8'))
+    for path in sorted(set(inputs)):
+        digest.update(b'\0' + path.encode('utf-8') + b'\0')
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        else:
+            digest.update(b'<missing>')
+    return digest.hexdigest()
+
+
+def inject_static_base(html: str, output: str) -> str:
+    depth = output.count('/')
+    base = '../' * depth
+    tag = f'<meta name="static-export-base" content="{base}">'
+    match = re.search(r'<head[^>]*>', html, re.IGNORECASE)
+    if match is None:
+        return tag + html
+    return html[:match.end()] + '\n    ' + tag + html[match.end():]
+
+
+def _write(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class Target:
+    """One output file, the input files it depends on and how to build it.
+
+    ``fingerprint`` overrides the hash of the input files as the rebuild key.
+    """
+
+    def __init__(self, output: str, inputs: List[str], build: Callable[[str], None],
+                 fingerprint: Optional[Callable[[], str]] = None):
+        self.output = output
+        self.inputs = inputs
+        self.build = build
+        self.fingerprint = fingerprint
+
+    def key(self) -> str:
+        if self.fingerprint is not None:
+            return f'{EXPORT_VERSION}:{self.output}:{self.fingerprint()}'
+        return inputs_hash(self.output, self.inputs)
+
+
+class StaticExporter:
+    def __init__(self, out_dir: str, app=None, diagrams_path: Optional[str] = None,
+                 routes: Optional[List[str]] = None, copy: Optional[List[str]] = None,
+                 workers: Optional[int] = None):
+        self.out_dir = out_dir
+        self.app = app
+        self.diagrams_path = diagrams_path
+        self.routes = routes or []
+        self.copy = copy or []
+        self.workers = workers or min(8, (os.cpu_count() or 1) * 2)
+        self.manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+
+    # Targets -----------------------------------------------------------
+
+    def targets(self) -> List[Target]:
+        targets = []
+        targets.extend(self._copy_targets())
+        targets.extend(self._route_targets())
+        targets.extend(self._diagram_targets())
+        return targets
+
+    def _copy_targets(self) -> List[Target]:
+        from services.static_assets import MANIFEST_NAME as ASSET_MANIFEST_NAME, FingerprintIndex
+
+        targets = []
+        build_dir = os.path.join(ROOT, self.app.config.get('STATIC_BUILD_DIR', 'build/static')) if self.app else None
+        asset_manifest = os.path.join(build_dir, ASSET_MANIFEST_NAME) if build_dir else None
+        # Copied pages reference the fingerprinted assets shipped below
+        fingerprints = (FingerprintIndex(build_dir)
+                        if asset_manifest and os.path.isfile(asset_manifest) else None)
+        exclude = {os.path.realpath(os.path.join(ROOT, 'assets', 'derived')),
+                   os.path.realpath(self.out_dir)}
+        for entry in self.copy:
+            source = os.path.join(ROOT, entry)
+            if os.path.isfile(source):
+                files = [source]
+            elif os.path.isdir(source):
+                files = []
+                for directory, dirs, names in os.walk(source):
+                    dirs[:] = [d for d in dirs if os.path.realpath(os.path.join(directory, d)) not in exclude]
+                    files.extend(os.path.join(directory, name) for name in names)
+            else:
+                continue
+            for path in files:
+                rel_path = os.path.relpath(path, ROOT).replace(os.sep, '/')
+                if fingerprints is not None and rel_path.endswith('.html'):
+                    targets.append(Target(rel_path, [path, asset_manifest],
+                                          self._page_copier(path, rel_path, fingerprints)))
+                else:
+                    targets.append(Target(rel_path, [path], self._copier(path)))
+        # Fingerprinted assets (python3 -m services.static_assets), if built
+        if build_dir and os.path.isdir(os.path.join(build_dir, 'assets')):
+            for directory, _, names in os.walk(os.path.join(build_dir, 'assets')):
+                for name in names:
+                    path = os.path.join(directory, name)
+                    rel_path = os.path.relpath(path, build_dir).replace(os.sep, '/')
+                    targets.append(Target(rel_path, [path], self._copier(path)))
+        return targets
+
+    def _copier(self, source: str) -> Callable[[str], None]:
+        def build(output: str):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            shutil.copyfile(source, output)
+        return build
+
+    def _page_copier(self, source: str, rel_path: str, fingerprints) -> Callable[[str], None]:
+        def build(output: str):
+            _write(output, fingerprints.render_file(source, rel_path).encode('utf-8'))
+        return build
+
+    def _route_targets(self) -> List[Target]:
+        if self.app is None:
+            return []
+        # Route output depends on the server code and whichever page sources exist
+        common = [os.path.join(ROOT, name) for name in ('app.py', 'config.py')]
+        # Pages are fingerprinted from the asset manifest when they are served
+        manifest = os.path.join(ROOT, self.app.config.get('STATIC_BUILD_DIR', 'build/static'),
+                                'asset-manifest.json')
+        pages = {
+            '/': ['index.html', manifest],
+            '/enhanced': ['templates/enhanced_portal.html', manifest],
+            '/workflow-diagrams': ['templates/workflow_diagrams.html', manifest],
+        }
+        targets = []
+        for route in self.routes:
+            inputs = common + [os.path.join(ROOT, path) for path in pages.get(route, [])]
+            output = output_path_for(route)
+            targets.append(Target(output, inputs, self._route_renderer(route, output)))
+        return targets
+
+    def _route_renderer(self, route: str, output: str) -> Callable[[str], None]:
+        def build(path: str):
+            with self.app.test_client() as client:
+                response = client.get(route)
+            if response.status_code != 200:
+                raise RuntimeError(f'{route} returned HTTP {response.status_code}')
+            data = response.get_data()
+            if response.mimetype == 'text/html':
+                data = inject_static_base(data.decode('utf-8'), output).encode('utf-8')
+            _write(path, data)
+        return build
+
+    def _diagram_targets(self) -> List[Target]:
+        if not self.diagrams_path or not os.path.isdir(self.diagrams_path):
+            logger.warning(f"Diagram catalog not found ({self.diagrams_path}); skipping diagrams")
+            return []
+        from services.diagram_service import DiagramGenerator
+        from services.diagram_history import source_hash
+        from services.plantuml_canonical import canonical_hash
+
+        generator = DiagramGenerator(self.diagrams_path)
+        diagrams = generator.get_available_diagrams()
+        sources = [diagram['source_file'] for diagram in diagrams]
+        targets = []
+
+        def build_list(path: str):
+            listing = [{'type': diagram['type'], 'name': diagram['name'], 'formats': DIAGRAM_FORMATS,
+                        'static_urls': {fmt: f'diagrams/{diagram["type"]}.{fmt}' for fmt in DIAGRAM_FORMATS}}
+                       for diagram in diagrams]
+            _write(path, json.dumps({'status': 'success', 'diagrams': listing}).encode('utf-8'))
+
+        targets.append(Target('api/diagrams/list', sources, build_list))
+        for diagram in diagrams:
+            diagram_type, source_file = diagram['type'], diagram['source_file']
+
+            def build_source(path: str, diagram_type=diagram_type):
+                source = generator.get_diagram_source(diagram_type)
+                _write(path, json.dumps({'status': 'success', 'source': source, 'type': diagram_type,
+                                         'hash': source_hash(source)}).encode('utf-8'))
+
+            targets.append(Target(f'api/diagrams/source/{diagram_type}', [source_file], build_source))
+            # Images are keyed by the canonical source, so cosmetic edits don't re-render
+            def fingerprint(source_file=source_file):
+                with open(source_file, 'r', encoding='utf-8') as f:
+                    return canonical_hash(f.read())
+
+            for fmt in DIAGRAM_FORMATS:
+                targets.append(Target(f'diagrams/{diagram_type}.{fmt}', [source_file],
+                                      self._diagram_renderer(source_file, fmt), fingerprint))
+        return targets
+
+    @staticmethod
+    def _diagram_renderer(source_file: str, fmt: str) -> Callable[[str], None]:
+        def build(path: str):
+            with open(source_file, 'rb') as f:
+                result = subprocess.run(['plantuml', f'-t{fmt}', '-pipe'], stdin=f,
+                                        capture_output=True, cwd=os.path.dirname(source_file),
+                                        timeout=120)
+            if result.returncode != 0 or not result.stdout:
+                raise RuntimeError(f'PlantUML failed: {result.stderr.decode("utf-8", "replace")[:500]}')
+            _write(path, result.stdout)
+        return build
+
+    # Build -------------------------------------------------------------
+
+    def _load_manifest(self) -> Dict[str, str]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get('outputs', {})
+        except (OSError, ValueError):
+            return {}
+
+    def run(self, force: bool = False) -> Dict:
+        os.makedirs(self.out_dir, exist_ok=True)
+        previous = self._load_manifest()
+        targets = self.targets()
+        hashes = {target.output: target.key() for target in targets}
+        stale = [target for target in targets
+                 if force or previous.get(target.output) != hashes[target.output]
+                 or not os.path.exists(os.path.join(self.out_dir, target.output))]
+
+        manifest = {output: digest for output, digest in previous.items() if output in hashes}
+        failed = []
+
+        def build(target: Target):
+            target.build(os.path.join(self.out_dir, target.output))
+            return target
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [(target, executor.submit(build, target)) for target in stale]
+            for target, future in futures:
+                try:
+                    future.result()
+                    manifest[target.output] = hashes[target.output]
+                except Exception as e:
+                    # A failed output is retried next run (its old hash is dropped)
+                    manifest.pop(target.output, None)
+                    failed.append(target.output)
+                    logger.error(f"Could not export {target.output}: {str(e)}")
+
+        # Outputs that no longer have a target are removed
+        for output in set(previous) - set(hashes):
+            try:
+                os.unlink(os.path.join(self.out_dir, output))
+            except OSError:
+                pass
+
+        _write(self.manifest_path, json.dumps({'version': EXPORT_VERSION, 'outputs': manifest},
+                                              indent=1, sort_keys=True).encode('utf-8'))
+        return {
+            'targets': len(targets),
+            'built': len(stale) - len(failed),
+            'skipped': len(targets) - len(stale),
+            'failed': failed
+        }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Export the portal and pre-rendered diagrams as a static site')
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--diagrams', default=None, help='Workflow diagram catalog directory')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='Rebuild every output')
+    args = parser.parse_args(argv)
+
+    from app import app
+    from services.diagram_service import WORKFLOW_DIAGRAMS_PATH
+
+    out_dir = args.out or app.config.get('STATIC_EXPORT_DIR', 'build/site')
+    exporter = StaticExporter(
+        out_dir, app=app,
+        diagrams_path=args.diagrams or os.environ.get('WORKFLOW_DIAGRAMS_PATH', WORKFLOW_DIAGRAMS_PATH),
+        routes=app.config.get('STATIC_EXPORT_ROUTES', []),
+        copy=app.config.get('STATIC_EXPORT_COPY', []),
+        workers=args.workers)
+    print(f"📦 Exporting static site -> {out_dir}")
+    result = exporter.run(force=args.force)
+    print(f"✅ {result['built']} built, {result['skipped']} unchanged, {len(result['failed'])} failed "
+          f"({result['targets']} outputs)")
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
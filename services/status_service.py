@@ -0,0 +1,235 @@
+"""
+Aggregated dependency status for the portal (``/api/status``).
+
+Probes the diagram server, the chat server, PlantUML, the chat SQLite
+database and free disk space concurrently, each with its own strict timeout,
+and returns one consolidated document with per-probe latencies. Results are
+cached for ``STATUS_CACHE_TTL`` seconds and refreshed by a single caller at a
+time, so monitors polling the endpoint never fan out into N slow checks.
+"""
+
+import logging
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import requests
+from flask import Blueprint, jsonify, request
+
+from services.chat_store import get_store
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ProbeError(Exception):
+    """A probe ran but found its dependency unhealthy"""
+
+    def __init__(self, message: str, details: Optional[Dict] = None):
+        super().__init__(message)
+        self.details = details or {}
+
+
+class Probe:
+    """A named health check with a timeout; ``critical`` failures make the portal unhealthy"""
+
+    def __init__(self, name: str, check: Callable[[float], Dict], timeout: float = 2.0,
+                 critical: bool = False):
+        self.name = name
+        self.check = check
+        self.timeout = timeout
+        self.critical = critical
+
+
+class StatusAggregator:
+    """Runs probes in parallel and caches the consolidated result"""
+
+    def __init__(self, probes=None, cache_ttl: float = 5.0):
+        self.probes = list(probes or [])
+        self.cache_ttl = cache_ttl
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='status-probe')
+        self._in_flight: Dict[str, Future] = {}
+        self._cached: Optional[Dict] = None
+        self._cached_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    def status(self, refresh: bool = False) -> Dict:
+        if not refresh:
+            cached = self._fresh()
+            if cached is not None:
+                return cached
+        with self._refresh_lock:
+            # Another caller may have refreshed while we waited for the lock
+            if not refresh:
+                cached = self._fresh()
+                if cached is not None:
+                    return cached
+            result = self._run()
+            self._cached, self._cached_at = result, time.monotonic()
+            return dict(result, cached=False, age_ms=0)
+
+    def _fresh(self) -> Optional[Dict]:
+        age = time.monotonic() - self._cached_at
+        if self._cached is None or age > self.cache_ttl:
+            return None
+        return dict(self._cached, cached=True, age_ms=round(age * 1000))
+
+    def _submit(self, probe: Probe) -> Future:
+        # A probe still stuck from an earlier round is not started again
+        previous = self._in_flight.get(probe.name)
+        if previous is not None and not previous.done():
+            return previous
+        future = self._executor.submit(self._timed, probe)
+        self._in_flight[probe.name] = future
+        return future
+
+    @staticmethod
+    def _timed(probe: Probe) -> Dict:
+        started = time.perf_counter()
+        try:
+            result = {'status': 'ok', **(probe.check(probe.timeout) or {})}
+        except ProbeError as e:
+            result = {'status': 'down', 'error': str(e), **e.details}
+        except Exception as e:
+            result = {'status': 'down', 'error': str(e)}
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def _run(self) -> Dict:
+        started = time.perf_counter()
+        futures = {probe.name: self._submit(probe) for probe in self.probes}
+        results = {}
+        for probe in self.probes:
+            remaining = probe.timeout - (time.perf_counter() - started)
+            try:
+                results[probe.name] = futures[probe.name].result(timeout=max(remaining, 0))
+            except FutureTimeout:
+                results[probe.name] = {
+                    'status': 'timeout',
+                    'error': f'No answer within {probe.timeout}s',
+                    'latency_ms': round(probe.timeout * 1000, 2)
+                }
+            results[probe.name]['critical'] = probe.critical
+
+        failing = [name for name, result in results.items() if result['status'] != 'ok']
+        if any(results[name]['critical'] for name in failing):
+            overall = 'unhealthy'
+        elif failing:
+            overall = 'degraded'
+        else:
+            overall = 'healthy'
+        return {
+            'status': overall,
+            'checked_at': datetime.now().isoformat(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'failing': failing,
+            'probes': results
+        }
+
+
+# Probes ----------------------------------------------------------------
+
+_http = requests.Session()
+_http.trust_env = False
+
+
+def http_probe(url: str) -> Callable[[float], Dict]:
+    def check(timeout: float) -> Dict:
+        try:
+            response = _http.get(url, timeout=timeout)
+        except requests.RequestException as e:
+            raise ProbeError(f'Unreachable: {e.__class__.__name__}', {'url': url})
+        details = {'url': url, 'http_status': response.status_code}
+        if response.status_code >= 400:
+            raise ProbeError(f'HTTP {response.status_code}', details)
+        return details
+    return check
+
+
+def plantuml_probe(timeout: float) -> Dict:
+    executable = shutil.which('plantuml')
+    if executable is None:
+        raise ProbeError('plantuml not found on PATH')
+    try:
+        result = subprocess.run([executable, '-version'], capture_output=True, text=True,
+                                timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise ProbeError(f'plantuml -version took longer than {timeout}s')
+    if result.returncode != 0:
+        raise ProbeError(f'plantuml exited with {result.returncode}')
+    version = next((line for line in result.stdout.splitlines() if line.strip()), '')
+    return {'version': version.strip()}
+
+
+def sqlite_probe(timeout: float) -> Dict:
+    store = get_store()
+    conn = store.pool.connection()
+    tables = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+    return {
+        'db_path': store.pool.db_path,
+        'tables': tables,
+        'journal_mode': conn.execute('PRAGMA journal_mode').fetchone()[0],
+        'pending_writes': store.writer.pending
+    }
+
+
+def disk_probe(path: str, min_free_percent: float) -> Callable[[float], Dict]:
+    def check(timeout: float) -> Dict:
+        usage = shutil.disk_usage(path)
+        free_percent = round(usage.free / usage.total * 100, 2) if usage.total else 0.0
+        details = {
+            'path': path,
+            'free_bytes': usage.free,
+            'total_bytes': usage.total,
+            'free_percent': free_percent
+        }
+        if free_percent < min_free_percent:
+            raise ProbeError(f'Only {free_percent}% free (minimum {min_free_percent}%)', details)
+        return details
+    return check
+
+
+def default_probes(config) -> list:
+    timeouts = config.get('STATUS_PROBE_TIMEOUTS', {})
+    return [
+        Probe('diagram_server', http_probe(config.get('STATUS_DIAGRAM_URL', 'http://127.0.0.1:6060/api/health')),
+              timeouts.get('diagram_server', 2.0)),
+        Probe('chat_server', http_probe(config.get('STATUS_CHAT_URL', 'http://127.0.0.1:7000/api/health')),
+              timeouts.get('chat_server', 2.0)),
+        Probe('plantuml', plantuml_probe, timeouts.get('plantuml', 3.0)),
+        Probe('sqlite', sqlite_probe, timeouts.get('sqlite', 1.0), critical=True),
+        Probe('disk', disk_probe(config.get('METRICS_DISK_PATH', '/'),
+                                 config.get('STATUS_DISK_MIN_FREE_PERCENT', 5.0)),
+              timeouts.get('disk', 1.0), critical=True),
+    ]
+
+
+status_aggregator = StatusAggregator()
+
+status_bp = Blueprint('status', __name__, url_prefix='/api')
+
+
+@status_bp.record_once
+def _configure_probes(state):
+    status_aggregator.probes = default_probes(state.app.config)
+    status_aggregator.cache_ttl = state.app.config.get('STATUS_CACHE_TTL', 5.0)
+
+
+@status_bp.route('/status', methods=['GET'])
+def get_status():
+    """Consolidated dependency status (?refresh=1 bypasses the cache)"""
+    try:
+        result = status_aggregator.status(refresh=request.args.get('refresh') in ('1', 'true'))
+        return jsonify(result), 503 if result['status'] == 'unhealthy' else 200
+    except Exception as e:
+        logger.error(f"Error collecting status: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to collect status: {str(e)}'
+        }), 500
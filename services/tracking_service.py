@@ -0,0 +1,136 @@
+"""
+Visitor-tracking ingestion endpoints.
+
+Receives the events posted by ``assets/js/visitor-tracker.js`` and appends them
+to a segmented NDJSON event log. Requests are answered with ``204`` as soon as
+the events are queued; disk writes happen in the log's background writer.
+When the write queue is full the endpoints answer ``503`` with ``Retry-After``
+so clients back off instead of the server buffering without bound.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import Blueprint, Response, current_app, jsonify, request
+
+from services.event_log import SegmentedEventLog
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Event type recorded for each tracker endpoint
+TRACK_ENDPOINTS = {
+    'track-page': 'page',
+    'track-interaction': 'interaction',
+    'track-duration': 'duration',
+    'track-event': 'event',
+}
+
+MAX_BODY_BYTES = 256 * 1024
+MAX_EVENTS_PER_REQUEST = 500
+
+tracking_bp = Blueprint('tracking', __name__, url_prefix='/api')
+
+_event_log: Optional[SegmentedEventLog] = None
+_event_log_lock = threading.Lock()
+# Callables invoked with each accepted batch (e.g. analytics rollups)
+event_listeners = []
+
+
+def get_event_log() -> SegmentedEventLog:
+    """The process-wide visitor event log (created from app config on first use)"""
+    global _event_log
+    if _event_log is None:
+        # Two first requests must not each open a log (and writer thread) on the same segment
+        with _event_log_lock:
+            if _event_log is None:
+                config = current_app.config
+                _event_log = SegmentedEventLog(
+                    config.get('VISITOR_EVENT_LOG_DIR', 'logs/events'),
+                    segment_bytes=config.get('VISITOR_EVENT_SEGMENT_BYTES', 64 * 1024 * 1024),
+                    max_queue=config.get('VISITOR_EVENT_QUEUE_SIZE', 100000),
+                    fsync=config.get('VISITOR_EVENT_FSYNC', True))
+    return _event_log
+
+
+def parse_events(body: bytes) -> List[Dict]:
+    """Decode a tracker payload.
+
+    Accepts a single event object, a JSON array of events, ``{"events": [...]}``
+    or NDJSON. ``navigator.sendBeacon`` bodies arrive as ``text/plain`` or
+    without a content type, so the body is parsed regardless of headers.
+    """
+    text = body.decode('utf-8').strip()
+    if not text:
+        return []
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        payload = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(payload, dict):
+        payload = payload['events'] if isinstance(payload.get('events'), list) else [payload]
+    if not isinstance(payload, list) or not all(isinstance(event, dict) for event in payload):
+        raise ValueError('Events must be JSON objects')
+    return payload
+
+
+def ingest(event_type: str):
+    if request.content_length and request.content_length > MAX_BODY_BYTES:
+        return jsonify({'status': 'error', 'message': 'Payload too large'}), 413
+
+    try:
+        events = parse_events(request.get_data(cache=False))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'status': 'error', 'message': f'Invalid tracking payload: {str(e)}'}), 400
+    if len(events) > MAX_EVENTS_PER_REQUEST:
+        return jsonify({
+            'status': 'error',
+            'message': f'At most {MAX_EVENTS_PER_REQUEST} events per request'
+        }), 413
+
+    received_at = int(time.time() * 1000)
+    user_agent = request.headers.get('User-Agent')
+    for event in events:
+        event['type'] = event.get('type') or event_type
+        event['receivedAt'] = received_at
+        if user_agent and 'userAgent' not in event:
+            event['userAgent'] = user_agent
+
+    event_log = get_event_log()
+    if not event_log.append(events):
+        response = jsonify({'status': 'error', 'message': 'Tracking queue full, retry later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    for listener in event_listeners:
+        try:
+            listener(events)
+        except Exception as e:
+            logger.error(f"Tracking listener failed: {str(e)}")
+    return Response(status=204)
+
+
+def _make_view(event_type: str):
+    def view():
+        return ingest(event_type)
+    view.__doc__ = f"Ingest {event_type} tracking events (single, batched or sendBeacon)"
+    return view
+
+
+for _endpoint, _event_type in TRACK_ENDPOINTS.items():
+    tracking_bp.add_url_rule(f'/{_endpoint}', _endpoint.replace('-', '_'),
+                             _make_view(_event_type), methods=['POST'])
+
+
+@tracking_bp.route('/track/stats', methods=['GET'])
+def tracking_stats():
+    """Event log throughput and backpressure counters"""
+    return jsonify({
+        'status': 'success',
+        'event_log': get_event_log().stats()
+    })
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Columnar visitor archive and one-shot migration of logs/visitors.json.
+
+``logs/visitors.json`` is a single JSON document that has to be parsed and
+rewritten as a whole. This module streams it (bounded memory: one visitor
+object at a time) into a day-partitioned columnar store:
+
+    <root>/manifest.json
+    <root>/dictionaries/<name>.txt           one value per line, index = line
+    <root>/<table>/day=YYYY-MM-DD/<column>.<typecode>
+
+Every column is a flat little-endian array file, so a query memory-maps just
+the columns and partitions it needs. URLs, session ids, visitor ids, referers
+and user agents are dictionary-encoded as uint32 indexes.
+
+Usage: python3 -m services.visitor_archive [logs/visitors.json] [--out logs/visitor_archive] [--force]
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# table -> [(column, array typecode, dictionary or None)]
+TABLES = {
+    'pageviews': [
+        ('ts', 'q', None),
+        ('visitor', 'I', 'visitor'),
+        ('session', 'I', 'session'),
+        ('url', 'I', 'url'),
+    ],
+    'sessions': [
+        ('start', 'q', None),
+        ('end', 'q', None),
+        ('duration', 'q', None),
+        ('pages', 'I', None),
+        ('visitor', 'I', 'visitor'),
+        ('session', 'I', 'session'),
+        ('referer', 'I', 'referer'),
+        ('user_agent', 'I', 'user_agent'),
+    ],
+}
+
+DAY_MS = 86400 * 1000
+
+
+def iso_to_ms(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp() * 1000)
+    except ValueError:
+        return None
+
+
+def day_partition(ts_ms: int) -> str:
+    return 'day=' + datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+
+class Dictionary:
+    """Append-only string dictionary persisted one value per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._add(json.loads(line))
+        self._file = None
+
+    def _add(self, value: str) -> int:
+        position = len(self.values)
+        self.values.append(value)
+        self.index[value] = position
+        return position
+
+    def encode(self, value: Optional[str]) -> int:
+        value = value or ''
+        position = self.index.get(value)
+        if position is None:
+            position = self._add(value)
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            # JSON-encode so values containing newlines stay on one line
+            self._file.write(json.dumps(value) + '\n')
+        return position
+
+    def decode(self, position: int) -> str:
+        return self.values[position]
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class ColumnarStore:
+    """Day-partitioned, dictionary-encoded columnar files"""
+
+    def __init__(self, root: str, flush_rows: int = 65536):
+        self.root = root
+        self.flush_rows = flush_rows
+        os.makedirs(os.path.join(root, 'dictionaries'), exist_ok=True)
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {
+                'version': 1,
+                'tables': {table: {'columns': [[c, t, d] for c, t, d in columns], 'partitions': {}}
+                           for table, columns in TABLES.items()}
+            }
+        dictionary_names = {d for columns in TABLES.values() for _, _, d in columns if d}
+        self.dictionaries = {name: Dictionary(os.path.join(root, 'dictionaries', f'{name}.txt'))
+                             for name in dictionary_names}
+        # (table, partition) -> {column: array}
+        self._buffers: Dict[Tuple[str, str], Dict[str, array]] = {}
+        self._buffered_rows = 0
+
+    # Writing -----------------------------------------------------------
+
+    def append(self, table: str, row: Dict):
+        """Buffer one row; ``row`` holds raw values, keyed by column name"""
+        partition = day_partition(row[TABLES[table][0][0]])
+        buffers = self._buffers.get((table, partition))
+        if buffers is None:
+            buffers = {column: array(typecode) for column, typecode, _ in TABLES[table]}
+            self._buffers[(table, partition)] = buffers
+        for column, _, dictionary in TABLES[table]:
+            value = row.get(column)
+            buffers[column].append(self.dictionaries[dictionary].encode(value) if dictionary else int(value or 0))
+        self._buffered_rows += 1
+        if self._buffered_rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        for (table, partition), buffers in self._buffers.items():
+            directory = os.path.join(self.root, table, partition)
+            os.makedirs(directory, exist_ok=True)
+            rows = 0
+            for column, typecode, _ in TABLES[table]:
+                values = buffers[column]
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                with open(os.path.join(directory, f'{column}.{typecode}'), 'ab') as f:
+                    values.tofile(f)
+                rows = len(values)
+            partitions = self.manifest['tables'][table]['partitions']
+            partitions[partition] = partitions.get(partition, 0) + rows
+        self._buffers.clear()
+        self._buffered_rows = 0
+
+    def close(self):
+        self.flush()
+        for dictionary in self.dictionaries.values():
+            dictionary.close()
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    # Reading -----------------------------------------------------------
+
+    def partitions(self, table: str, start_ms: Optional[int] = None,
+                   end_ms: Optional[int] = None) -> List[str]:
+        """Partitions of ``table`` overlapping [start_ms, end_ms), oldest first"""
+        selected = []
+        for partition in sorted(self.manifest['tables'][table]['partitions']):
+            day_start = iso_to_ms(partition[len('day='):] + 'T00:00:00+00:00')
+            if start_ms is not None and day_start + DAY_MS <= start_ms:
+                continue
+            if end_ms is not None and day_start >= end_ms:
+                continue
+            selected.append(partition)
+        return selected
+
+    def scan(self, table: str, columns: List[str], start_ms: Optional[int] = None,
+             end_ms: Optional[int] = None) -> Iterator[Dict[str, memoryview]]:
+        """Yield {column: memoryview} per partition, memory-mapping only ``columns``"""
+        typecodes = {column: typecode for column, typecode, _ in TABLES[table]}
+        for partition in self.partitions(table, start_ms, end_ms):
+            directory = os.path.join(self.root, table, partition)
+            maps, raw_views, views = [], [], {}
+            try:
+                for column in columns:
+                    path = os.path.join(directory, f'{column}.{typecodes[column]}')
+                    if os.path.getsize(path) == 0:
+                        views[column] = memoryview(array(typecodes[column]))
+                        continue
+                    with open(path, 'rb') as f:
+                        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    maps.append(mapped)
+                    raw_views.append(memoryview(mapped))
+                    views[column] = raw_views[-1].cast(typecodes[column])
+                yield views
+            finally:
+                # Views are only valid until the caller advances to the next partition
+                for view in list(views.values()) + raw_views:
+                    view.release()
+                for mapped in maps:
+                    mapped.close()
+
+    def decode(self, dictionary: str, position: int) -> str:
+        return self.dictionaries[dictionary].decode(position)
+
+    def pageviews_by_url(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                         top: int = 10) -> List[Tuple[str, int]]:
+        """Most viewed URLs in a time range (reads only the ts and url columns)"""
+        counts: Counter = Counter()
+        for columns in self.scan('pageviews', ['ts', 'url'], start_ms, end_ms):
+            ts, urls = columns['ts'], columns['url']
+            if start_ms is None and end_ms is None:
+                counts.update(urls)
+                continue
+            for i in range(len(urls)):
+                if (start_ms is None or ts[i] >= start_ms) and (end_ms is None or ts[i] < end_ms):
+                    counts[urls[i]] += 1
+        return [(self.decode('url', position), count) for position, count in counts.most_common(top)]
+
+
+def stream_visitors(path: str, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, Dict]]:
+    """Incrementally yield (visitor_id, visitor) pairs from visitors.json.
+
+    Reads ``chunk_size`` bytes at a time and decodes one visitor object at a
+    time with ``raw_decode``, so memory stays bounded by the largest single
+    visitor rather than the whole document.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        position = 0
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, position, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+                return False
+            buffer = buffer[position:] + chunk
+            position = 0
+            return True
+
+        def skip_whitespace():
+            nonlocal position
+            while True:
+                while position < len(buffer) and buffer[position] in ' \t\r\n':
+                    position += 1
+                if position < len(buffer) or not fill():
+                    return
+
+        def expect(char: str) -> bool:
+            nonlocal position
+            skip_whitespace()
+            if position < len(buffer) and buffer[position] == char:
+                position += 1
+                return True
+            return False
+
+        def decode_value():
+            nonlocal position
+            while True:
+                skip_whitespace()
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # A number at the buffer edge may be truncated; make sure it ended
+                    if end < len(buffer) or eof:
+                        position = end
+                        return value
+                except ValueError:
+                    if eof:
+                        raise
+                if not fill():
+                    value, position = decoder.raw_decode(buffer, position)
+                    return value
+
+        if not expect('{'):
+            raise ValueError(f'{path} is not a JSON object')
+        while not expect('}'):
+            key = decode_value()
+            if not expect(':'):
+                raise ValueError(f'Expected ":" after key {key!r}')
+            if key == 'visitors':
+                if not expect('{'):
+                    raise ValueError('"visitors" must be an object')
+                while not expect('}'):
+                    visitor_id = decode_value()
+                    expect(':')
+                    yield visitor_id, decode_value()
+                    expect(',')
+            else:
+                decode_value()
+            expect(',')
+
+
+def migrate_visitors(source: str, root: str, force: bool = False) -> Dict:
+    """Convert visitors.json into a columnar archive at ``root``"""
+    if os.path.exists(os.path.join(root, 'manifest.json')):
+        if not force:
+            raise FileExistsError(f'{root} already contains an archive (use force=True to rebuild)')
+        shutil.rmtree(root)
+
+    store = ColumnarStore(root)
+    visitors = sessions = pageviews = 0
+    try:
+        for visitor_id, visitor in stream_visitors(source):
+            visitors += 1
+            for index, session in enumerate(visitor.get('sessions') or []):
+                start = iso_to_ms(session.get('start')) or iso_to_ms(visitor.get('firstVisit'))
+                if start is None:
+                    continue
+                end = iso_to_ms(session.get('end')) or start
+                session_id = f'{visitor_id}:{index}'
+                pages = session.get('pages') or []
+                store.append('sessions', {
+                    'start': start,
+                    'end': end,
+                    'duration': session.get('duration') or end - start,
+                    'pages': len(pages),
+                    'visitor': visitor_id,
+                    'session': session_id,
+                    'referer': visitor.get('referer'),
+                    'user_agent': visitor.get('userAgent'),
+                })
+                sessions += 1
+                # visitors.json only records which pages a session saw, not when
+                for url in pages:
+                    store.append('pageviews', {
+                        'ts': start, 'visitor': visitor_id, 'session': session_id, 'url': url})
+                    pageviews += 1
+    finally:
+        store.close()
+    return {'visitors': visitors, 'sessions': sessions, 'pageviews': pageviews, 'archive': root}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Migrate logs/visitors.json into a columnar archive')
+    parser.add_argument('source', nargs='?', default='logs/visitors.json')
+    parser.add_argument('--out', default='logs/visitor_archive')
+    parser.add_argument('--force', action='store_true', help='Replace an existing archive')
+    args = parser.parse_args(argv)
+
+    print(f"📦 Migrating {args.source} -> {args.out}")
+    try:
+        result = migrate_visitors(args.source, args.out, force=args.force)
+    except (OSError, ValueError) as e:
+        print(f"❌ Migration failed: {e}")
+        return 1
+    print(f"✅ {result['visitors']} visitors, {result['sessions']} sessions, "
+          f"{result['pageviews']} page views archived")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
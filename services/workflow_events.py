@@ -0,0 +1,120 @@
+"""
+Workflow event recording and the AI Project Monitoring query API.
+
+``track_workflow`` wraps a Flask view so every call is appended to
+``workflow_history`` (type, status, duration) through the chat store's
+background batch writer. ``/api/workflows/stats`` serves bucketed counts,
+durations and failure rates from the table's covering indexes.
+"""
+
+import functools
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from flask import Blueprint, Response, jsonify, request
+
+from services.chat_store import ChatStore, get_store
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _request_session_id() -> str:
+    data = request.get_json(silent=True) if request.is_json else None
+    return ((data or {}).get('session_id')
+            or request.headers.get('X-Session-Id')
+            or request.args.get('session_id')
+            or 'anonymous')
+
+
+def _outcome(rv) -> str:
+    """'success' or 'error' from a view's return value"""
+    response, status_code = rv, 200
+    if isinstance(rv, tuple):
+        response = rv[0]
+        status_code = rv[1] if len(rv) > 1 and isinstance(rv[1], int) else 200
+    if isinstance(response, Response):
+        status_code = response.status_code if status_code == 200 else status_code
+        # Several endpoints report failures as 200 with {"status": "error"}
+        if response.is_json and not response.is_streamed:
+            body = response.get_json(silent=True)
+            if isinstance(body, dict) and body.get('status') == 'error':
+                return 'error'
+    return 'success' if status_code < 400 else 'error'
+
+
+def track_workflow(workflow_type: str, store: Callable[[], ChatStore] = get_store):
+    """Decorator recording each call of a view as a ``workflow_type`` event"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                rv = view(*args, **kwargs)
+                status = _outcome(rv)
+                return rv
+            finally:
+                try:
+                    store().record_workflow(
+                        _request_session_id(), workflow_type, status,
+                        metadata={'endpoint': request.path},
+                        duration_ms=round((time.perf_counter() - started) * 1000, 2))
+                except Exception as e:
+                    # Monitoring must never break the request itself
+                    logger.error(f"Could not record {workflow_type} workflow event: {str(e)}")
+        return wrapper
+    return decorator
+
+
+workflows_bp = Blueprint('workflows', __name__, url_prefix='/api/workflows')
+
+
+def _parse_datetime(value: Optional[str], default: datetime) -> datetime:
+    """Naive UTC datetime from epoch seconds or ISO 8601 (naive = UTC); ValueError if invalid"""
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if moment.tzinfo is not None:
+            # Stored timestamps are naive UTC strings
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment
+    try:
+        return datetime.utcfromtimestamp(seconds)
+    except (OverflowError, OSError) as e:
+        raise ValueError(f'Timestamp out of range: {value}') from e
+
+
+@workflows_bp.route('/stats', methods=['GET'])
+def workflow_stats():
+    """Bucketed workflow counts, durations and failure rates (?from=&to=&interval=&type=)"""
+    try:
+        try:
+            end = _parse_datetime(request.args.get('to'), datetime.utcnow())
+            start = _parse_datetime(request.args.get('from'), end - timedelta(days=1))
+        except ValueError:
+            return jsonify({
+                'status': 'error',
+                'message': 'from and to must be epoch seconds or ISO 8601 timestamps'
+            }), 400
+        interval = request.args.get('interval', 3600, type=int)
+        buckets = get_store().workflow_stats(start, end, interval, request.args.get('type'))
+        return jsonify({
+            'status': 'success',
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'interval': max(60, interval),
+            'buckets': buckets
+        })
+    except Exception as e:
+        logger.error(f"Error querying workflow stats: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to query workflow stats: {str(e)}'
+        }), 500
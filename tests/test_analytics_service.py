@@ -0,0 +1,56 @@
+from services.analytics_service import RollupEngine
+
+BASE = 1_700_000_000
+
+
+def _durations(session, count, start):
+    return [{'type': 'duration', 'sessionId': session, 'duration': 1000 * (i + 1),
+             'timestamp': start + i * 10} for i in range(count)]
+
+
+def test_rebuild_finishes_a_session_across_batches_once():
+    engine = RollupEngine(session_idle=1800)
+    events = _durations('s1', 6, BASE) + _durations('s2', 1, BASE + 5000)
+    engine.rebuild(events, batch_size=4)
+
+    durations = engine.query_durations('day', BASE - 86400, BASE + 86400)
+    assert durations['summary']['count'] == 1
+    assert durations['summary']['max'] == 6000.0
+    # The newest session may still be live; the next ingest closes it
+    assert durations['open_sessions'] == 1
+
+
+MALFORMED = [
+    {'type': 'duration', 'sessionId': 's', 'duration': -5},
+    {'type': 'duration', 'sessionId': 's', 'duration': float('nan')},
+    {'type': 'duration', 'sessionId': 's', 'duration': float('inf')},
+    {'type': ['page'], 'sessionId': 's'},
+    {'type': 'page', 'sessionId': {'id': 1}},
+]
+
+
+def test_malformed_events_are_skipped_not_raised():
+    engine = RollupEngine()
+    good = {'type': 'page', 'url': 'https://example.com/docs', 'sessionId': 'ok', 'timestamp': BASE}
+    engine.ingest(MALFORMED + [good])
+
+    stats = engine.stats()
+    assert stats['events_rejected'] == len(MALFORMED)
+    assert stats['events_ingested'] == 1
+    assert engine.query_counts('hour', BASE - 3600, BASE + 3600)['total'] == 1
+
+
+def test_rebuild_survives_malformed_events():
+    engine = RollupEngine()
+    engine.rebuild(MALFORMED + _durations('s1', 2, BASE), batch_size=2)
+    assert engine.stats()['events_ingested'] == 2
+
+
+def test_unusable_timestamps_fall_back_to_receive_time():
+    engine = RollupEngine()
+    received_ms = BASE * 1000
+    for stamp in (1e400, float('nan'), -1, 10 ** 400, '9999-99-99', True):
+        engine.ingest([{'type': 'page', 'timestamp': stamp, 'receivedAt': received_ms}])
+
+    assert engine.stats()['events_rejected'] == 0
+    assert engine.query_counts('hour', BASE - 3600, BASE + 3600)['total'] == 6
@@ -0,0 +1,24 @@
+import pytest
+
+from services.asset_pipeline import build_variants
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def test_cleanup_removes_only_stale_variants(tmp_path):
+    src, out = tmp_path / 'assets', tmp_path / 'derived'
+    src.mkdir()
+    out.mkdir()
+    Image.new('RGB', (400, 200), '#336699').save(src / 'hero.png')
+    (out / 'nested').mkdir()
+    (out / 'README.md').write_text('kept')
+    (out / '0123456789abcdef-320w.webp').write_bytes(b'stale')
+
+    manifest = build_variants(str(src), str(out), widths=[320], formats=['png'])
+
+    assert (out / 'nested').is_dir()
+    assert (out / 'README.md').read_text() == 'kept'
+    assert not (out / '0123456789abcdef-320w.webp').exists()
+    for entry in manifest['images'].values():
+        for variant in entry['variants']:
+            assert (out / variant['file']).is_file()
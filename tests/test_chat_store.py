@@ -0,0 +1,45 @@
+import base64
+
+import pytest
+
+from services.chat_store import ChatStore, _decode_cursor, _encode_cursor
+
+
+def test_cursor_round_trip():
+    assert _decode_cursor(_encode_cursor(-1.5, 42)) == (-1.5, 42)
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    base64.urlsafe_b64encode(b'{"rank": 1}').decode(),
+    base64.urlsafe_b64encode(b'[1.0]').decode(),
+    base64.urlsafe_b64encode(b'["x", 3]').decode(),
+    base64.urlsafe_b64encode(b'[1.0, "3"]').decode(),
+    base64.urlsafe_b64encode(b'[NaN, 3]').decode(),
+    base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        _decode_cursor(cursor)
+
+
+def test_search_rejects_malformed_cursor(tmp_path):
+    store = ChatStore(str(tmp_path / 'chat.db'))
+    try:
+        with pytest.raises(ValueError):
+            store.search('hello', cursor='garbage')
+    finally:
+        store.close()
+
+
+def test_search_snippets_escape_stored_markup(tmp_path):
+    store = ChatStore(str(tmp_path / 'chat.db'))
+    try:
+        store.record_turn('s1', 'u1', 'hello <script>alert(1)</script>', '<img src=x onerror=alert(1)> hello')
+        store.writer.flush()
+        result = store.search('hello')['results'][0]
+    finally:
+        store.close()
+
+    assert result['message_snippet'] == '<mark>hello</mark> &lt;script&gt;alert(1)&lt;/script&gt;'
+    assert result['response_snippet'] == '&lt;img src=x onerror=alert(1)&gt; <mark>hello</mark>'
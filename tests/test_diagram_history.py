@@ -0,0 +1,30 @@
+import threading
+
+from services.diagram_history import DiagramSourceStore
+
+CRLF_SOURCE = '@startuml\r\nA -> B\r\n@enduml\r\n'
+
+
+def test_crlf_source_is_not_reimported(tmp_path):
+    store = DiagramSourceStore(str(tmp_path))
+    first = store.write('sequence', CRLF_SOURCE)
+    again = store.write('sequence', CRLF_SOURCE)
+
+    assert store.read('sequence') == CRLF_SOURCE
+    assert again['changed'] is False
+    assert again['revision'] == first['revision']
+    assert [entry['message'] for entry in store.history('sequence')] == [None]
+
+
+def test_concurrent_stores_allocate_distinct_revisions(tmp_path):
+    stores = [DiagramSourceStore(str(tmp_path)) for _ in range(2)]
+    threads = [threading.Thread(target=stores[i % 2].write, args=('sequence', f'A -> B{i}\n'))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    revisions = [entry['revision'] for entry in stores[0].history('sequence')]
+    assert revisions == list(range(len(revisions), 0, -1))
+    assert len(revisions) >= 8
@@ -0,0 +1,29 @@
+import flask
+import pytest
+
+from services.diagram_thumbnails import VERSION_LENGTH, DiagramThumbnails, thumbnail_response
+from services.static_assets import IMMUTABLE_CACHE_CONTROL
+
+KEY = '0123456789abcdef' * 4
+
+
+@pytest.fixture
+def thumbnails():
+    thumbnails = DiagramThumbnails(render_cache=None)
+    yield thumbnails
+    thumbnails._executor.shutdown()
+
+
+def cache_control(thumbnails, query):
+    app = flask.Flask(__name__)
+    with app.test_request_context(f'/thumbnail/x{query}'):
+        return thumbnail_response(thumbnails, b'image', KEY, 240).headers['Cache-Control']
+
+
+def test_current_version_is_cached_immutably(thumbnails):
+    assert cache_control(thumbnails, f'?v={KEY[:VERSION_LENGTH]}') == IMMUTABLE_CACHE_CONTROL
+
+
+@pytest.mark.parametrize('query', ['', '?v=', '?v=0', f'?v={KEY[:VERSION_LENGTH - 1]}', f'?v={KEY}'])
+def test_other_versions_are_revalidated(thumbnails, query):
+    assert cache_control(thumbnails, query) == 'no-cache'
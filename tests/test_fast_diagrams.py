@@ -0,0 +1,184 @@
+import shutil
+
+import pytest
+
+from services import fast_diagrams
+from services.fast_diagrams import layout, parse, to_svg
+
+SUPPORTED = {
+    'sequence': """@startuml
+!theme plain
+title Login & Checkout
+participant "Web App" as Web
+participant API
+Web -> API: POST /login
+API --> Web: token
+Web -> Store: checkout
+Store --> DB: write
+@enduml
+""",
+    'component': """@startuml
+component [Gateway]
+component "Auth Service" as Auth
+component [Orders] as Orders
+Gateway --> Auth
+Auth --> Orders
+@enduml
+""",
+    'activity': """@startuml
+start
+:Receive request;
+->
+:Validate input;
+:Store result;
+stop
+@enduml
+""",
+    'class': """@startuml
+' domain model
+class User {
+  +name: str
+  -password_hash: str
+}
+class Order {
+  +total(): float
+}
+class Invoice
+User --> Order
+Order -> Invoice
+User -- Invoice
+@enduml
+""",
+}
+
+UNSUPPORTED = {
+    'sequence with five participants': """@startuml
+A -> B: one
+B -> C: two
+C -> D: three
+D -> E: four
+@enduml
+""",
+    'sequence with an unsupported line': """@startuml
+A -> B: one
+activate B
+@enduml
+""",
+    'component branch': """@startuml
+component [A]
+component [B]
+component [C]
+A --> B
+A --> C
+@enduml
+""",
+    'component link out of declaration order': """@startuml
+component [A]
+component [B]
+B --> A
+@enduml
+""",
+    'component back link': """@startuml
+component [A]
+component [B]
+A --> B
+B --> A
+@enduml
+""",
+    'component repeated link': """@startuml
+component [A]
+component [B]
+A --> B
+A --> B
+@enduml
+""",
+    'component undeclared target': """@startuml
+component [A]
+A --> B
+@enduml
+""",
+    'activity without stop': """@startuml
+start
+:Do something;
+@enduml
+""",
+    'activity with a branch': """@startuml
+start
+if (ok?) then (yes)
+:Do something;
+endif
+stop
+@enduml
+""",
+    'class cycle': """@startuml
+class A
+class B
+A --> B
+B --> A
+@enduml
+""",
+    'class self link': """@startuml
+class A
+A --> A
+@enduml
+""",
+    'class unclosed body': """@startuml
+class A {
+  +x: int
+@enduml
+""",
+    'missing @enduml': """@startuml
+A -> B: hello
+""",
+    'unknown diagram': """@startuml
+usecase (Login)
+@enduml
+""",
+}
+
+
+@pytest.mark.parametrize('kind', sorted(SUPPORTED))
+def test_parse_accepts_supported_kind(kind):
+    diagram = parse(SUPPORTED[kind])
+    assert diagram is not None
+    assert diagram.kind == kind
+
+
+def test_parse_builds_the_model():
+    sequence = parse(SUPPORTED['sequence'])
+    assert sequence.title == 'Login & Checkout'
+    assert list(sequence.nodes) == ['Web', 'API', 'Store', 'DB']
+    assert [edge['dashed'] for edge in sequence.edges] == [False, True, False, True]
+
+    classes = parse(SUPPORTED['class'])
+    assert classes.nodes['User']['members'] == ['+name: str', '-password_hash: str']
+    assert [edge['arrow'] for edge in classes.edges] == [True, True, False]
+
+
+def test_parse_accepts_crlf_sources():
+    assert parse(SUPPORTED['activity'].replace('\n', '\r\n')) is not None
+
+
+@pytest.mark.parametrize('name', sorted(UNSUPPORTED))
+def test_parse_rejects_unsupported_source(name):
+    assert parse(UNSUPPORTED[name]) is None
+
+
+@pytest.mark.parametrize('kind', sorted(SUPPORTED))
+def test_svg_contains_every_label(kind):
+    diagram = parse(SUPPORTED[kind])
+    texts = ' | '.join(fast_diagrams._svg_texts(to_svg(layout(diagram))))
+    for label in diagram.labels():
+        assert label in texts
+
+
+def test_render_falls_back_for_unsupported_formats():
+    assert fast_diagrams.render(SUPPORTED['activity'], 'pdf') is None
+    assert fast_diagrams.render(UNSUPPORTED['class cycle'], 'svg') is None
+
+
+@pytest.mark.skipif(shutil.which('plantuml') is None, reason='plantuml is not installed')
+@pytest.mark.parametrize('kind', sorted(SUPPORTED))
+def test_matches_plantuml(kind):
+    report = fast_diagrams.verify(SUPPORTED[kind])
+    assert report['ok'], report['problems']
@@ -0,0 +1,27 @@
+import pytest
+
+from config import Config
+
+pytest.importorskip('requests')
+from services.gateway import Gateway  # noqa: E402
+
+
+@pytest.fixture
+def gateway():
+    gateway = Gateway(Config.GATEWAY_ROUTES)
+    yield gateway
+    gateway.close()
+
+
+@pytest.mark.parametrize('path, upstream', [
+    ('/api/diagrams/preview/stats', 'http://127.0.0.1:3030'),
+    ('/api/diagrams/list', 'http://127.0.0.1:6060'),
+    ('/api/diagrams/previewer', 'http://127.0.0.1:6060'),
+    ('/api/ai/generate', 'http://127.0.0.1:6060'),
+    ('/api/chat/stream', 'http://127.0.0.1:7000'),
+    ('/api/chat', 'http://127.0.0.1:7000'),
+    ('/api/logs/tail', 'http://127.0.0.1:3030'),
+    ('/', 'http://127.0.0.1:3030'),
+])
+def test_routes_by_longest_prefix(gateway, path, upstream):
+    assert gateway.match(path).upstream == upstream
@@ -0,0 +1,48 @@
+import os
+
+from services.html_transforms import MANIFEST_NAME, TransformPipeline, registered
+
+PAGES = {
+    'index.html': '<html>\n<head><title>Home</title></head>\n<body>\n<h1>Home</h1>\n</body>\n</html>\n',
+    'pages/blog.html': '<html>\r\n<head></head>\r\n<body>\r\n<p>Blog</p>\r\n</body>\r\n</html>\r\n',
+}
+
+
+def _site(tmp_path):
+    for rel_path, content in PAGES.items():
+        path = tmp_path / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content.encode('utf-8'))
+    return tmp_path
+
+
+def _snapshot(root):
+    return {rel_path: (root / rel_path).read_bytes() for rel_path in PAGES}
+
+
+def test_rerun_without_manifest_is_byte_identical(tmp_path):
+    root = _site(tmp_path)
+    first = TransformPipeline(str(root), workers=1).run()
+    assert sorted(first['changed']) == sorted(PAGES)
+    transformed = _snapshot(root)
+
+    for _ in range(2):
+        os.unlink(root / MANIFEST_NAME)
+        result = TransformPipeline(str(root), workers=1).run()
+        assert result['changed'] == []
+        assert _snapshot(root) == transformed
+
+    for injection in registered():
+        assert transformed['index.html'].count(f'transform:{injection.name}:begin'.encode()) == 1
+
+
+def test_check_compares_against_out_dir(tmp_path):
+    root = _site(tmp_path / 'src')
+    out = tmp_path / 'out'
+    assert sorted(TransformPipeline(str(root), str(out)).run(check=True)['changed']) == sorted(PAGES)
+
+    TransformPipeline(str(root), str(out), workers=1).run()
+    os.unlink(out / MANIFEST_NAME)
+    assert TransformPipeline(str(root), str(out)).run(check=True)['changed'] == []
+    # Sources are untouched when writing elsewhere
+    assert _snapshot(root) == {rel_path: content.encode('utf-8') for rel_path, content in PAGES.items()}
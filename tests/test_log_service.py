@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import flask
+
+from services import log_service
+from services.log_service import LogIndex, parse_line
+
+
+def _burst(count, ts=1000.0):
+    return [parse_line('api', f'INFO burst line {i} rid=req{i % 7:04d}', ts) for i in range(count)]
+
+
+def test_burst_within_one_bucket_respects_max_lines():
+    index = LogIndex(bucket_seconds=300, max_lines=1000)
+    for _ in range(10):
+        index.add(_burst(500))
+
+    stats = index.stats()
+    assert stats['lines'] <= 1000
+    assert stats['lines'] >= 1000 - index.max_bucket_lines
+    assert len(index.search('burst', limit=5000)) == stats['lines']
+
+
+def test_newest_lines_survive_trimming():
+    index = LogIndex(bucket_seconds=300, max_lines=100)
+    index.add(_burst(1000))
+
+    newest = index.search(limit=1)[0]
+    assert newest['text'].startswith('INFO burst line 999 ')
+    assert index.search(request_id='req0006', limit=1000)
+
+
+def _tail(monkeypatch, lines):
+    monkeypatch.setattr(log_service, 'log_service', SimpleNamespace(recent=_burst(5)))
+    app = flask.Flask(__name__)
+    app.register_blueprint(log_service.logs_bp)
+    response = app.test_client().get(f'/api/logs/tail?lines={lines}')
+    return [entry['text'].split()[3] for entry in response.get_json()['lines']]
+
+
+def test_tail_returns_the_newest_lines(monkeypatch):
+    assert _tail(monkeypatch, 2) == ['3', '4']
+    assert _tail(monkeypatch, 50) == ['0', '1', '2', '3', '4']
+
+
+def test_tail_returns_nothing_for_zero_or_negative_counts(monkeypatch):
+    assert _tail(monkeypatch, 0) == []
+    assert _tail(monkeypatch, -2) == []
@@ -0,0 +1,36 @@
+from services.plantuml_canonical import canonical_hash, canonicalize
+
+UML = """@startuml
+' comment
+skinparam shadowing false
+Alice -> Bob: hello
+@enduml
+"""
+
+
+def test_cosmetic_uml_changes_share_a_hash():
+    cosmetic = "\ufeff@startuml\r\n\r\n    skinparam   shadowing false\r\nAlice  ->   Bob: hello   \r\n@enduml"
+    assert canonical_hash(cosmetic) == canonical_hash(UML)
+
+
+def test_uml_label_changes_change_the_hash():
+    assert canonical_hash(UML.replace('hello', 'hello  there')) != canonical_hash(UML)
+
+
+def test_yaml_indentation_is_significant():
+    nested = "@startyaml\nroot:\n  child: 1\n  other: 2\n@endyaml\n"
+    flat = "@startyaml\nroot:\n  child: 1\nother: 2\n@endyaml\n"
+    assert canonical_hash(nested) != canonical_hash(flat)
+    assert canonical_hash(nested.replace('\n', '\r\n')) == canonical_hash(nested)
+
+
+def test_non_uml_blocks_are_kept_verbatim():
+    for kind in ('json', 'ditaa', 'salt'):
+        source = f"@start{kind}\n  +---+   ' kept\n\n  |   |\n@end{kind}\n"
+        assert canonicalize(source) == source
+
+
+def test_uml_blocks_next_to_other_blocks_are_still_canonicalised():
+    mixed = UML + "@startyaml\na:\n  b: 1\n@endyaml\n"
+    spaced = UML.replace('Alice -> Bob', 'Alice   ->  Bob') + "\n@startyaml\na:\n  b: 1\n@endyaml\n"
+    assert canonical_hash(mixed) == canonical_hash(spaced)
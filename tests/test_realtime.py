@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('flask_socketio')
+pytest.importorskip('socketio')
+
+from services.realtime import ConnectionTracker, LocalQueueManager  # noqa: E402
+
+
+class _SocketIO:
+    """Records emits; ack callbacks are kept for the test to fire"""
+
+    def __init__(self):
+        self.emitted = []
+        self.callbacks = []
+
+    def emit(self, event, data, to=None, namespace=None, callback=None):
+        self.emitted.append((event, data, to))
+        if callback is not None:
+            self.callbacks.append(callback)
+
+
+def _subscribe(manager, received):
+    def listen():
+        for message in manager._listen():
+            received.put((manager, message))
+
+    threading.Thread(target=listen, daemon=True).start()
+
+
+def _wait_for_subscribers(channel, count):
+    deadline = time.monotonic() + 2
+    while len(LocalQueueManager._subscribers.get(channel, [])) < count:
+        assert time.monotonic() < deadline, 'subscribers did not start listening'
+        time.sleep(0.01)
+
+
+def test_local_queue_delivers_to_every_subscriber_of_the_channel():
+    LocalQueueManager.reset()
+    received = queue.Queue()
+    first, second = LocalQueueManager(), LocalQueueManager()
+    other = LocalQueueManager(channel='other')
+    for manager in (first, second, other):
+        _subscribe(manager, received)
+    _wait_for_subscribers('socketio', 2)
+    _wait_for_subscribers('other', 1)
+
+    LocalQueueManager(write_only=True).emit('chat', {'text': 'hi'}, namespace='/', room='r1')
+
+    deliveries = [received.get(timeout=2) for _ in range(2)]
+    assert {id(manager) for manager, _ in deliveries} == {id(first), id(second)}
+    for _, message in deliveries:
+        assert message['event'] == 'chat'
+        # python-socketio 5.x publishes the emit arguments as a list
+        assert message['data'] in ({'text': 'hi'}, [{'text': 'hi'}])
+        assert message['room'] == 'r1'
+    with pytest.raises(queue.Empty):
+        received.get(timeout=0.1)
+    LocalQueueManager.reset()
+
+
+def test_saturated_connection_drops_until_a_slot_is_released():
+    tracker = ConnectionTracker(max_pending=2, ack_timeout=60)
+    tracker.connected('a')
+    slots = [tracker.try_reserve('a'), tracker.try_reserve('a')]
+    assert None not in slots
+    assert tracker.try_reserve('a') is None
+    assert tracker.stats()['dropped_messages'] == 1
+    assert tracker.stats()['saturated_connections'] == 1
+
+    tracker.release('a', slots[0])
+    assert tracker.try_reserve('a') is not None
+    assert tracker.try_reserve('unknown') is None
+
+
+def test_ack_releases_the_slot():
+    tracker = ConnectionTracker(max_pending=1, ack_timeout=60)
+    socketio = _SocketIO()
+    tracker.connected('a')
+
+    assert tracker.emit_to(socketio, 'a', 'token', 1)
+    assert not tracker.emit_to(socketio, 'a', 'token', 2)
+    socketio.callbacks.pop()()
+    assert tracker.emit_to(socketio, 'a', 'token', 3)
+    assert [data for _, data, _ in socketio.emitted] == [1, 3]
+    assert tracker.stats()['pending_messages'] == 1
+
+
+def test_without_acks_slots_are_released_after_the_emit():
+    tracker = ConnectionTracker(max_pending=1, acks=False)
+    socketio = _SocketIO()
+    tracker.connected('a')
+    for i in range(3):
+        assert tracker.emit_to(socketio, 'a', 'token', i)
+    assert not socketio.callbacks
+    assert tracker.stats()['pending_messages'] == 0
+
+
+def test_unacknowledged_slots_expire():
+    tracker = ConnectionTracker(max_pending=1, ack_timeout=0.05)
+    tracker.connected('a')
+    assert tracker.try_reserve('a') is not None
+    assert tracker.try_reserve('a', wait=1) is not None
+    assert tracker.stats()['expired_slots'] == 1
+
+
+def test_waiting_reservation_wakes_on_release():
+    tracker = ConnectionTracker(max_pending=1, ack_timeout=60)
+    tracker.connected('a')
+    slot = tracker.try_reserve('a')
+    threading.Timer(0.05, tracker.release, ('a', slot)).start()
+    assert tracker.try_reserve('a', wait=2) is not None
+    assert tracker.stats()['dropped_messages'] == 0
+
+
+def test_disconnect_frees_pending_slots():
+    tracker = ConnectionTracker(max_pending=1, ack_timeout=60)
+    seen = []
+    tracker.on_disconnect(seen.append)
+    tracker.connected('a')
+    tracker.try_reserve('a')
+    tracker.disconnected('a')
+    assert seen == ['a']
+    assert tracker.stats()['pending_messages'] == 0
+    assert tracker.active_connections == 0
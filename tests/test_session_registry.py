@@ -0,0 +1,63 @@
+import time
+
+from services.session_registry import SessionRegistry, SpillStore
+
+
+def _registry(tmp_path, **kwargs):
+    spill = SpillStore(str(tmp_path / 'spill.db'))
+    return SessionRegistry('assistants', max_entries=1, spill=spill, **kwargs), spill
+
+
+def test_pop_removes_spilled_row(tmp_path):
+    registry, spill = _registry(tmp_path)
+    registry['alice'] = {'turns': 1}
+    registry['bob'] = {'turns': 2}  # evicts and spills alice
+    assert spill.count('assistants') == 1
+
+    assert registry.pop('alice') == {'turns': 1}
+    assert spill.count('assistants') == 0
+    assert registry.get('alice') is None
+
+
+def test_del_of_live_entry_drops_stale_spill_row(tmp_path):
+    registry, spill = _registry(tmp_path)
+    spill.save('assistants', 'bob', b'stale')
+    registry['bob'] = {'turns': 2}
+
+    del registry['bob']
+    assert spill.count('assistants') == 0
+    assert 'bob' not in registry
+
+
+def test_sweep_prunes_expired_spill_rows(tmp_path):
+    registry, spill = _registry(tmp_path, spill_ttl=60)
+    spill.save('assistants', 'old', b'x')
+    with spill._connection() as conn:
+        conn.execute('UPDATE session_spill SET spilled_at = ?', (time.time() - 120,))
+    spill.save('assistants', 'new', b'y')
+
+    registry.sweep()
+    assert spill.count('assistants') == 1
+    assert registry.stats()['spill_expired'] == 1
+
+
+def test_contains_sees_spilled_entries_without_rehydrating(tmp_path):
+    registry, spill = _registry(tmp_path)
+    registry['alice'] = {'turns': 1}
+    registry['bob'] = {'turns': 2}  # evicts and spills alice
+
+    assert 'alice' in registry
+    assert 'bob' in registry
+    assert 'carol' not in registry
+    assert spill.exists('assistants', 'alice')
+    assert registry.stats()['rehydrations'] == 0
+
+
+def test_contains_counts_idle_entries_that_will_spill(tmp_path):
+    registry, spill = _registry(tmp_path, idle_ttl=0.01)
+    registry['alice'] = {'turns': 1}
+    time.sleep(0.02)
+
+    assert 'alice' in registry
+    assert registry.get('alice') == {'turns': 1}
+    assert 'alice' not in SessionRegistry('plain', idle_ttl=0.01)
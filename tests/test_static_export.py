@@ -0,0 +1,35 @@
+import json
+import os
+
+from services.static_export import ROOT, StaticExporter
+
+
+class _App:
+    def __init__(self, build_dir):
+        self.config = {'STATIC_BUILD_DIR': str(build_dir)}
+
+
+def _asset_build(tmp_path):
+    build_dir = tmp_path / 'build'
+    (build_dir / 'assets').mkdir(parents=True)
+    (build_dir / 'asset-manifest.json').write_text(
+        json.dumps({'assets': {'style.css': 'style.0123456789.css'}}))
+    return build_dir
+
+
+def test_copied_pages_reference_fingerprinted_assets(tmp_path):
+    out = tmp_path / 'site'
+    exporter = StaticExporter(str(out), app=_App(_asset_build(tmp_path)), copy=['pages/blog.html'])
+    exporter.run()
+
+    page = (out / 'pages' / 'blog.html').read_text(encoding='utf-8')
+    assert 'href="../style.0123456789.css"' in page
+    assert 'href="../style.css"' not in page
+
+
+def test_pages_are_copied_verbatim_without_an_asset_build(tmp_path):
+    out = tmp_path / 'site'
+    exporter = StaticExporter(str(out), app=_App(tmp_path / 'missing'), copy=['pages/blog.html'])
+    exporter.run()
+
+    assert (out / 'pages' / 'blog.html').read_bytes() == open(os.path.join(ROOT, 'pages', 'blog.html'), 'rb').read()
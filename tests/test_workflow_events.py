@@ -0,0 +1,30 @@
+from datetime import datetime
+
+import flask
+import pytest
+
+from services.workflow_events import _parse_datetime, workflows_bp
+
+DEFAULT = datetime(2024, 1, 1)
+
+
+def test_aware_timestamps_become_naive_utc():
+    assert _parse_datetime('2024-05-01T12:00:00+05:00', DEFAULT) == datetime(2024, 5, 1, 7, 0)
+    assert _parse_datetime('2024-05-01T12:00:00Z', DEFAULT) == datetime(2024, 5, 1, 12, 0)
+    assert _parse_datetime('2024-05-01T12:00:00', DEFAULT) == datetime(2024, 5, 1, 12, 0)
+    assert _parse_datetime('0', DEFAULT) == datetime(1970, 1, 1)
+    assert _parse_datetime(None, DEFAULT) == DEFAULT
+
+
+@pytest.mark.parametrize('value', ['yesterday', '1e400', 'nan', '2024-13-01'])
+def test_invalid_timestamps_raise_value_error(value):
+    with pytest.raises(ValueError):
+        _parse_datetime(value, DEFAULT)
+
+
+@pytest.mark.parametrize('query', ['from=yesterday', 'to=2024-13-01', 'to=1e400'])
+def test_stats_rejects_invalid_range_with_400(query):
+    app = flask.Flask(__name__)
+    app.register_blueprint(workflows_bp)
+    response = app.test_client().get(f'/api/workflows/stats?{query}')
+    assert response.status_code == 400
@@ -12,8 +12,21 @@ import tempfile
 import base64
 import json
 import logging
+import re
+import sys
 import uuid
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+# Shared services live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.workflow_events import track_workflow
+from services.diagram_history import DiagramSourceStore, source_hash
+from services.diagram_routes import create_diagram_routes, source_key
+from services.plantuml_canonical import RenderCache, cache_key, canonical_hash
+from services.diagram_index import DiagramSymbolIndex
+from services.render_optimizer import RenderOptimizer
+from services.diagram_thumbnails import DiagramThumbnails, thumbnail_fields, thumbnail_response
+from services import fast_diagrams
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,9 +35,10 @@ logger = logging.getLogger(__name__)
 class AIDiagramGenerator:
     """AI-powered diagram generation from natural language descriptions"""
     
-    def __init__(self, workflow_diagrams_path: str):
+    def __init__(self, workflow_diagrams_path: str, symbol_index: Optional[DiagramSymbolIndex] = None):
         self.workflow_diagrams_path = workflow_diagrams_path
         self.custom_diagrams_dir = os.path.join(workflow_diagrams_path, "custom")
+        self.symbol_index = symbol_index
         os.makedirs(self.custom_diagrams_dir, exist_ok=True)
         logger.info(f"AIDiagramGenerator initialized with path: {workflow_diagrams_path}")
     
@@ -47,6 +61,8 @@ class AIDiagramGenerator:
             
             with open(filepath, 'w', encoding='utf-8') as f:
                 f.write(plantuml_code)
+            if self.symbol_index is not None:
+                self.symbol_index.index_file(filepath, plantuml_code)
             
             logger.info(f"Generated PlantUML code saved to: {filepath}")
             
@@ -256,6 +272,13 @@ class DiagramGenerator:
     def __init__(self, workflow_diagrams_path: str):
         self.workflow_diagrams_path = workflow_diagrams_path
         self.supported_formats = ['png', 'svg', 'pdf']
+        self.source_store = DiagramSourceStore(workflow_diagrams_path)
+        # Renders keyed by canonical source hash, so cosmetic edits reuse them;
+        # each new render is minified/recompressed once before it is cached
+        self.render_cache = RenderCache(os.path.join(workflow_diagrams_path, '.cache', 'renders'),
+                                        optimizer=RenderOptimizer())
+        self.thumbnails = DiagramThumbnails(self.render_cache)
+        self.symbol_index = DiagramSymbolIndex(workflow_diagrams_path)
         logger.info(f"DiagramGenerator initialized with path: {workflow_diagrams_path}")
         
     def generate_plantuml_diagram(self, 
@@ -277,6 +300,21 @@ class DiagramGenerator:
                     'message': error_msg
                 }
             
+            with open(source_file, 'r', encoding='utf-8') as f:
+                key = cache_key(f.read())
+            cached = self.render_cache.get(key, output_format)
+            if cached is not None:
+                file_data = base64.b64encode(cached).decode('utf-8')
+                logger.info(f"Serving cached {diagram_type} diagram ({key[:12]})")
+                return {
+                    'status': 'success',
+                    'file_data': file_data,
+                    'format': output_format,
+                    'diagram_type': diagram_type,
+                    'file_size': len(file_data),
+                    'cached': True
+                }
+            
             with tempfile.TemporaryDirectory() as temp_dir:
                 logger.info(f"Using temporary directory: {temp_dir}")
                 
@@ -313,7 +351,11 @@ class DiagramGenerator:
                     }
                 
                 with open(output_file, 'rb') as f:
-                    file_data = base64.b64encode(f.read()).decode('utf-8')
+                    output_data = f.read()
+                output_data = self.render_cache.put(key, output_format, output_data)
+                if output_format == 'png':
+                    self.thumbnails.schedule(key, output_data)
+                file_data = base64.b64encode(output_data).decode('utf-8')
                 
                 logger.info(f"Successfully generated {diagram_type} diagram, size: {len(file_data)} bytes")
                 
@@ -322,7 +364,8 @@ class DiagramGenerator:
                     'file_data': file_data,
                     'format': output_format,
                     'diagram_type': diagram_type,
-                    'file_size': len(file_data)
+                    'file_size': len(file_data),
+                    'cached': False
                 }
                 
         except Exception as e:
@@ -371,6 +414,20 @@ class DiagramGenerator:
             logger.warning(f"Source file not found: {source_file}")
             return ""
     
+    def get_ai_thumbnail(self, filepath: str, width: int) -> Tuple[Optional[bytes], Optional[str]]:
+        """Derivative of an AI diagram's PNG render at ``width`` and the render's cache key"""
+        if not os.path.exists(filepath):
+            return None, None
+        with open(filepath, 'r', encoding='utf-8') as f:
+            key = cache_key(f.read())
+        data = self.thumbnails.get(key, width)
+        if data is None:
+            result = self.generate_ai_diagram(filepath, 'png')
+            if result['status'] != 'success':
+                raise RuntimeError(result['message'])
+            data = self.thumbnails.build(key, base64.b64decode(result['image_data']))[width]
+        return data, key
+    
     def generate_ai_diagram(self, filepath: str, output_format: str = 'png') -> Dict:
         """Generate diagram from AI-generated PlantUML file"""
         try:
@@ -384,6 +441,34 @@ class DiagramGenerator:
                     'message': error_msg
                 }
             
+            with open(filepath, 'r', encoding='utf-8') as f:
+                source = f.read()
+            key = cache_key(source)
+            cached = self.render_cache.get(key, output_format)
+            if cached is not None:
+                return {
+                    'status': 'success',
+                    'image_data': base64.b64encode(cached).decode('utf-8'),
+                    'format': output_format,
+                    'size': len(cached),
+                    'renderer': 'cache'
+                }
+            
+            # Simple generated diagrams are drawn natively; PlantUML handles the rest
+            image_data = fast_diagrams.render(source, output_format)
+            if image_data is not None:
+                image_data = self.render_cache.put(key, output_format, image_data)
+                if output_format == 'png':
+                    self.thumbnails.schedule(key, image_data)
+                logger.info(f"Rendered AI diagram natively, size: {len(image_data)} bytes")
+                return {
+                    'status': 'success',
+                    'image_data': base64.b64encode(image_data).decode('utf-8'),
+                    'format': output_format,
+                    'size': len(image_data),
+                    'renderer': 'native'
+                }
+            
             with tempfile.TemporaryDirectory() as temp_dir:
                 logger.info(f"Using temporary directory: {temp_dir}")
                 
@@ -421,6 +506,9 @@ class DiagramGenerator:
                 
                 with open(output_file, 'rb') as f:
                     image_data = f.read()
+                image_data = self.render_cache.put(key, output_format, image_data)
+                if output_format == 'png':
+                    self.thumbnails.schedule(key, image_data)
                 
                 encoded_image = base64.b64encode(image_data).decode('utf-8')
                 
@@ -429,7 +517,8 @@ class DiagramGenerator:
                     'status': 'success',
                     'image_data': encoded_image,
                     'format': output_format,
-                    'size': len(image_data)
+                    'size': len(image_data),
+                    'renderer': 'plantuml'
                 }
                 
         except Exception as e:
@@ -440,27 +529,24 @@ class DiagramGenerator:
             }
 
     def update_diagram_source(self, diagram_type: str, source_code: str) -> Dict:
-        """Update PlantUML source code for a diagram"""
-        source_file = f"{self.workflow_diagrams_path}/plantuml_{diagram_type}.puml"
-        
+        """Update PlantUML source code for a diagram (atomic write + new revision)"""
         try:
-            # Create backup of original file
-            backup_file = f"{source_file}.backup"
-            if os.path.exists(source_file):
-                import shutil
-                shutil.copy2(source_file, backup_file)
-                logger.info(f"Created backup: {backup_file}")
-            
-            # Write new source code
-            with open(source_file, 'w', encoding='utf-8') as f:
-                f.write(source_code)
-            
+            previous = self.source_store.read(diagram_type)
+            revision = self.source_store.write(diagram_type, source_code)
+            new_canonical = canonical_hash(source_code)
+            if revision['changed']:
+                self.symbol_index.index_file(self.source_store.source_path(diagram_type), source_code)
             logger.info(f"Updated source code for {diagram_type}, length: {len(source_code)}")
             return {
                 'status': 'success',
                 'message': f'Source code updated for {diagram_type}',
-                'file': source_file,
-                'backup': backup_file if os.path.exists(source_file) else None
+                'file': self.source_store.source_path(diagram_type),
+                'revision': revision['revision'],
+                'hash': revision['hash'],
+                'changed': revision['changed'],
+                'canonical_hash': new_canonical,
+                # Only whitespace/comments changed: existing renders stay valid
+                'rerender': previous is None or canonical_hash(previous) != new_canonical
             }
         except Exception as e:
             logger.error(f"Error updating source code for {diagram_type}: {str(e)}")
@@ -477,7 +563,9 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 WORKFLOW_DIAGRAMS_PATH = "/Users/ayush/AI_Projects/agenticchatbot/WorkflowDiagrams"
 # Initialize the diagram generators
 diagram_generator = DiagramGenerator(WORKFLOW_DIAGRAMS_PATH)
-ai_diagram_generator = AIDiagramGenerator(WORKFLOW_DIAGRAMS_PATH)
+ai_diagram_generator = AIDiagramGenerator(WORKFLOW_DIAGRAMS_PATH, symbol_index=diagram_generator.symbol_index)
+# Thumbnail, search, cache stats and history routes shared with the portal's diagram blueprint
+app.register_blueprint(create_diagram_routes(diagram_generator), url_prefix='/api/diagrams')
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -507,6 +595,11 @@ def list_diagrams():
     """Get list of available diagrams"""
     try:
         diagrams = diagram_generator.get_available_diagrams()
+        for diagram in diagrams:
+            diagram.update(thumbnail_fields(
+                diagram_generator.thumbnails,
+                f"/api/diagrams/thumbnail/{diagram['type']}",
+                source_key(diagram_generator, diagram['type'])))
         return jsonify({
             'status': 'success',
             'diagrams': diagrams
@@ -519,6 +612,7 @@ def list_diagrams():
         }), 500
 
 @app.route('/api/diagrams/generate', methods=['POST'])
+@track_workflow('diagram_generate')
 def generate_diagram():
     """Generate a diagram"""
     try:
@@ -553,7 +647,8 @@ def get_diagram_source(diagram_type: str):
         return jsonify({
             'status': 'success',
             'source': source,
-            'type': diagram_type
+            'type': diagram_type,
+            'hash': source_hash(source)
         })
     except Exception as e:
         logger.error(f"Error getting source code: {str(e)}")
@@ -563,6 +658,7 @@ def get_diagram_source(diagram_type: str):
         }), 500
 
 @app.route('/api/diagrams/update', methods=['POST'])
+@track_workflow('diagram_update')
 def update_diagram_source():
     """Update PlantUML source code"""
     try:
@@ -583,7 +679,11 @@ def update_diagram_source():
             return jsonify({
                 'status': 'success',
                 'message': f'Source code updated for {diagram_type}',
-                'type': diagram_type
+                'type': diagram_type,
+                'revision': result['revision'],
+                'hash': result['hash'],
+                'canonical_hash': result['canonical_hash'],
+                'rerender': result['rerender']
             })
         else:
             return jsonify({
@@ -599,6 +699,7 @@ def update_diagram_source():
         }), 500
 
 @app.route('/api/ai/generate', methods=['POST'])
+@track_workflow('ai_generate')
 def generate_ai_diagram():
     """Generate diagram from natural language description"""
     try:
@@ -639,7 +740,8 @@ def generate_ai_diagram():
             'diagram_id': ai_result['diagram_id'],
             'image_data': diagram_result['image_data'],
             'format': output_format,
-            'size': diagram_result['size']
+            'size': diagram_result['size'],
+            'renderer': diagram_result['renderer']
         })
         
     except Exception as e:
@@ -650,6 +752,7 @@ def generate_ai_diagram():
         }), 500
 
 @app.route('/api/ai/describe', methods=['POST'])
+@track_workflow('ai_describe')
 def describe_diagram_requirements():
     """Get PlantUML code from description without generating image"""
     try:
@@ -706,9 +809,11 @@ def list_ai_diagrams():
                 diagram_id = filename.replace('ai_generated_', '').replace('.puml', '')
                 
                 # Read the first few lines to get title
+                key = None
                 try:
                     with open(filepath, 'r', encoding='utf-8') as f:
                         content = f.read()
+                        key = cache_key(content)
                         title = "AI Generated Diagram"
                         if 'title' in content:
                             title_line = [line for line in content.split('\n') if 'title' in line.lower()]
@@ -722,7 +827,8 @@ def list_ai_diagrams():
                     'filename': filename,
                     'title': title,
                     'type': 'ai_generated',
-                    'created': os.path.getctime(filepath)
+                    'created': os.path.getctime(filepath),
+                    **thumbnail_fields(diagram_generator.thumbnails, f'/api/ai/thumbnail/{diagram_id}', key)
                 })
         
         # Sort by creation time (newest first)
@@ -741,6 +847,31 @@ def list_ai_diagrams():
             'message': f'Failed to list AI diagrams: {str(e)}'
         }), 500
 
+@app.route('/api/ai/thumbnail/<diagram_id>', methods=['GET'])
+def get_ai_thumbnail(diagram_id: str):
+    """Downscaled PNG render of an AI-generated diagram (?w=, ?v= from /api/ai/list)"""
+    try:
+        thumbnails = diagram_generator.thumbnails
+        if not thumbnails.available:
+            return jsonify({'status': 'error', 'message': 'Thumbnails require Pillow'}), 501
+        if not re.match(r'^[A-Za-z0-9_-]+$', diagram_id):
+            return jsonify({'status': 'error', 'message': 'Invalid diagram id'}), 400
+        width = thumbnails.width_for(request.args.get('w', type=int))
+        filepath = os.path.join(WORKFLOW_DIAGRAMS_PATH, "custom", f"ai_generated_{diagram_id}.puml")
+        data, key = diagram_generator.get_ai_thumbnail(filepath, width)
+        if data is None:
+            return jsonify({
+                'status': 'error',
+                'message': f'AI diagram {diagram_id} not found'
+            }), 404
+        return thumbnail_response(thumbnails, data, key, width)
+    except Exception as e:
+        logger.error(f"Error generating AI thumbnail for {diagram_id}: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to generate thumbnail: {str(e)}'
+        }), 500
+
 if __name__ == '__main__':
     print("🚀 Starting Workflow Diagrams API Server...")
     print(f"📁 Workflow Diagrams Path: {WORKFLOW_DIAGRAMS_PATH}")
@@ -749,12 +880,14 @@ if __name__ == '__main__':
     print("📋 Available Endpoints:")
     print("   - GET  /api/health")
     print("   - GET  /api/diagrams/list")
+    print("   - GET  /api/diagrams/thumbnail/<type>")
     print("   - POST /api/diagrams/generate")
     print("   - GET  /api/diagrams/source/<type>")
     print("   - POST /api/diagrams/update")
     print("   - POST /api/ai/generate")
     print("   - POST /api/ai/describe")
     print("   - GET  /api/ai/list")
+    print("   - GET  /api/ai/thumbnail/<id>")
     print("=" * 50)
     
     app.run(host='0.0.0.0', port=6060, debug=True, use_reloader=False)